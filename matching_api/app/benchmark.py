@@ -0,0 +1,65 @@
+"""
+Parité et débit des backends d'encodage sur CPU.
+
+Usage (depuis matching_api/) :
+    python -m app.benchmark --backends torch-fp32 torch-int8 onnx --n-texts 512
+
+Pour chaque backend : écart des scores cosinus par rapport à fp32 (parité)
+et nombre de textes encodés par seconde.
+"""
+import argparse
+import json
+import time
+
+from app.encoders import BACKENDS, DEFAULT_MODEL_NAME, check_parity, load_encoder
+
+SAMPLE_QUERIES = [
+    "We are looking for a Data Scientist with skills in Python and Machine Learning.",
+    "Nous recherchons un comptable confirmé maîtrisant la fiscalité et les logiciels ERP.",
+    "Ingénieur DevOps : Docker, Kubernetes, CI/CD, supervision et cloud public.",
+]
+
+SAMPLE_DOCUMENTS = [
+    "Alice has 5 years experience in Python, Deep Learning and data pipelines.",
+    "Bob is an engineer specialized in SQL and data visualization with Power BI.",
+    "Comptable, 8 ans d'expérience, clôtures mensuelles, déclarations fiscales, SAP.",
+    "Administrateur systèmes Linux, automatisation Ansible, conteneurs et Kubernetes.",
+    "Commerciale B2B, prospection, négociation grands comptes, CRM Odoo.",
+    "Développeur full-stack JavaScript, React, Node.js, API REST et PostgreSQL.",
+]
+
+
+def _benchmark(encoder, texts, batch_size):
+    encoder.encode(texts[:batch_size], batch_size=batch_size)  # échauffement
+    t0 = time.perf_counter()
+    encoder.encode(texts, batch_size=batch_size)
+    elapsed = time.perf_counter() - t0
+    return len(texts) / elapsed if elapsed else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--n-texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    args = parser.parse_args()
+
+    texts = (SAMPLE_DOCUMENTS * (args.n_texts // len(SAMPLE_DOCUMENTS) + 1))[:args.n_texts]
+    reference = load_encoder(args.model, "torch-fp32")
+
+    report = []
+    for backend in args.backends:
+        encoder = reference if backend == "torch-fp32" else load_encoder(args.model, backend)
+        parity = check_parity(encoder, reference, SAMPLE_QUERIES, SAMPLE_DOCUMENTS, args.tolerance)
+        parity["texts_per_sec"] = round(_benchmark(encoder, texts, args.batch_size), 1)
+        report.append(parity)
+        print(json.dumps(parity))
+
+    if not all(r["ok"] for r in report):
+        raise SystemExit("Parité hors tolérance pour au moins un backend.")
+
+
+if __name__ == "__main__":
+    main()
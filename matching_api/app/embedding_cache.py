@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Normalise un texte avant hachage : espaces multiples / retours à la ligne réduits à un espace."""
+    return " ".join((text or "").split())
+
+
+def text_checksum(text: str) -> str:
+    """Empreinte SHA-256 du texte normalisé (identique côté Odoo)."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache d'embeddings à deux niveaux, indexé par (nom du modèle, empreinte du texte) :
+      - mémoire : LRU borné (OrderedDict)
+      - disque (optionnel) : SQLite, les vecteurs float32 sont stockés en BLOB
+        et survivent aux redémarrages du conteneur.
+    """
+
+    def __init__(self, model_name: str, max_items: int = 20000, disk_path: Optional[str] = None):
+        self.model_name = model_name
+        self.max_items = max(int(max_items), 1)
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+            logging.info(f"Cache d'embeddings sur disque : {disk_path}")
+
+    def _key(self, checksum: str) -> str:
+        return f"{self.model_name}:{checksum}"
+
+    # ---------------------------
+    # Accès unitaire
+    # ---------------------------
+    def get(self, checksum: str) -> Optional[np.ndarray]:
+        """Retourne l'embedding en cache (mémoire puis disque), ou None."""
+        key = self._key(checksum)
+        with self._lock:
+            vec = self._memory.get(key)
+            if vec is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return vec
+            if self._db is not None:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    vec = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vec)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return vec
+            self.misses += 1
+            return None
+
+    def contains(self, checksum: str) -> bool:
+        """Indique si l'empreinte est connue, sans toucher aux compteurs."""
+        key = self._key(checksum)
+        with self._lock:
+            if key in self._memory:
+                return True
+            if self._db is not None:
+                return self._db.execute("SELECT 1 FROM embeddings WHERE key = ?", (key,)).fetchone() is not None
+            return False
+
+    def put(self, checksum: str, embedding: np.ndarray) -> None:
+        key = self._key(checksum)
+        vec = np.ascontiguousarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vec)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)",
+                    (key, int(vec.shape[0]), vec.tobytes()),
+                )
+                self._db.commit()
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        """Enregistre plusieurs embeddings : un seul executemany dans une seule transaction SQLite."""
+        if not items:
+            return
+        rows = []
+        with self._lock:
+            for checksum, embedding in items.items():
+                key = self._key(checksum)
+                vec = np.ascontiguousarray(embedding, dtype=np.float32)
+                self._remember(key, vec)
+                rows.append((key, int(vec.shape[0]), vec.tobytes()))
+            if self._db is not None:
+                with self._db:  # commit unique (rollback en cas d'erreur)
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)", rows
+                    )
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        # appelé avec le verrou
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    # ---------------------------
+    # Accès par lot
+    # ---------------------------
+    def get_or_encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Retourne la matrice d'embeddings des textes (même ordre).
+        Seuls les textes absents du cache (dédoublonnés) sont passés à encode_fn.
+        """
+        checksums = [text_checksum(t) for t in texts]
+        vectors: List[Optional[np.ndarray]] = [self.get(c) for c in checksums]
+
+        # Textes à encoder : un seul encodage par empreinte manquante
+        missing = OrderedDict()
+        for text, checksum, vec in zip(texts, checksums, vectors):
+            if vec is None and checksum not in missing:
+                missing[checksum] = text
+
+        if missing:
+            encoded = encode_fn(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), encoded))
+            self.put_many(new_vectors)
+            vectors = [v if v is not None else new_vectors[c] for c, v in zip(checksums, vectors)]
+
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack(vectors).astype(np.float32, copy=False)
+
+    # ---------------------------
+    # Statistiques
+    # ---------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            disk_items = None
+            if self._db is not None:
+                disk_items = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {
+                "model_name": self.model_name,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "memory_max_items": self.max_items,
+                "disk_items": disk_items,
+            }
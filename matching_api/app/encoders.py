@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+# Backends disponibles (variable d'environnement ENCODER_BACKEND)
+BACKENDS = ("torch-fp32", "torch-int8", "onnx")
+
+DEFAULT_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def model_source(model_name: str) -> str:
+    """
+    Chemin de chargement du modèle. Si MODEL_LOCAL_DIR est défini, le modèle y est enregistré
+    une fois (poids au format safetensors) puis relu depuis ce dossier : les poids sont mappés
+    en mémoire au lieu d'être désérialisés, sans résolution sur le Hub.
+    """
+    local_dir = os.getenv("MODEL_LOCAL_DIR")
+    if not local_dir:
+        return model_name
+    path = Path(local_dir)
+    if not (path / "modules.json").is_file():
+        from sentence_transformers import SentenceTransformer
+
+        SentenceTransformer(model_name, device="cpu").save(str(path), safe_serialization=True)
+        logging.info(f"Modèle {model_name} enregistré en safetensors dans {path}")
+    return str(path)
+
+
+class TorchEncoder:
+    """
+    Backend de référence : SentenceTransformer PyTorch fp32 sur CPU.
+    Expose la même interface que SentenceTransformer (encode, tokenizer, max_seq_length...).
+    """
+    backend = "torch-fp32"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_source(model_name), device="cpu")
+
+    @property
+    def cache_name(self) -> str:
+        # Les embeddings diffèrent légèrement d'un backend à l'autre : clé de cache distincte
+        return self.model_name if self.backend == "torch-fp32" else f"{self.model_name}@{self.backend}"
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.model.max_seq_length
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size: int = 32) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+
+class QuantizedTorchEncoder(TorchEncoder):
+    """
+    Quantification dynamique int8 des couches Linear (poids int8, activations quantifiées à la volée).
+    Pas de calibration nécessaire ; gain typique x1.5 à x2 sur CPU.
+    """
+    backend = "torch-int8"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        import torch
+
+        torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+class OnnxEncoder(TorchEncoder):
+    """
+    Export ONNX du transformer (une seule fois, dans ONNX_MODEL_DIR) puis inférence ONNX Runtime.
+    Le mean pooling de SentenceTransformer est reproduit en NumPy.
+    Le modèle PyTorch n'est chargé que pour l'export : le tokenizer, max_seq_length et la
+    dimension des embeddings sont enregistrés à côté du fichier .onnx et relus au démarrage.
+    """
+    backend = "onnx"
+
+    def __init__(self, model_name: str, onnx_dir: str = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        onnx_dir = Path(onnx_dir or os.getenv("ONNX_MODEL_DIR", "onnx_model"))
+        stem = model_name.replace('/', '__')
+        onnx_path = onnx_dir / f"{stem}.onnx"
+        meta_path = onnx_dir / f"{stem}.json"          # écrit en dernier : export complet
+        tokenizer_dir = onnx_dir / f"{stem}.tokenizer"
+        if not (onnx_path.exists() and meta_path.exists() and tokenizer_dir.is_dir()):
+            self._export(onnx_path, meta_path, tokenizer_dir)
+
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        self._tokenizer = AutoTokenizer.from_pretrained(str(tokenizer_dir))
+        self._max_seq_length = int(meta["max_seq_length"])
+        self._dimension = int(meta["dimension"])
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        intra_threads = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+        if intra_threads:
+            options.intra_op_num_threads = intra_threads
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    @property
+    def tokenizer(self):
+        return self._tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        return self._max_seq_length
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dimension
+
+    def _export(self, onnx_path: Path, meta_path: Path, tokenizer_dir: Path) -> None:
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        class _Transformer(torch.nn.Module):
+            # Ne renvoie que last_hidden_state (sortie tensorielle simple pour l'export)
+            def __init__(self, auto_model):
+                super().__init__()
+                self.auto_model = auto_model
+
+            def forward(self, input_ids, attention_mask):
+                return self.auto_model(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+        # Modèle PyTorch local à l'export : libéré au retour de la méthode
+        st_model = SentenceTransformer(model_source(self.model_name), device="cpu")
+        onnx_path.parent.mkdir(parents=True, exist_ok=True)
+        dummy = st_model.tokenizer(["export"], return_tensors="pt")
+        wrapper = _Transformer(st_model[0].auto_model).eval()
+        with torch.no_grad():
+            torch.onnx.export(
+                wrapper,
+                (dummy["input_ids"], dummy["attention_mask"]),
+                str(onnx_path),
+                input_names=["input_ids", "attention_mask"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "last_hidden_state": {0: "batch", 1: "sequence"},
+                },
+                opset_version=14,
+            )
+        st_model.tokenizer.save_pretrained(str(tokenizer_dir))
+        meta_path.write_text(json.dumps({
+            "model_name": self.model_name,
+            "max_seq_length": st_model.max_seq_length,
+            "dimension": st_model.get_sentence_embedding_dimension(),
+        }), encoding="utf-8")
+        logging.info(f"Modèle exporté en ONNX : {onnx_path}")
+
+    def encode(self, texts, batch_size: int = 32) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        # Tri par longueur (comme SentenceTransformer) pour limiter le padding
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        out = np.empty((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            enc = self.tokenizer(
+                [texts[i] for i in idx], padding=True, truncation=True,
+                max_length=self.max_seq_length, return_tensors="np",
+            )
+            feeds = {name: enc[name].astype(np.int64) for name in ("input_ids", "attention_mask")
+                     if name in self._input_names}
+            hidden = self.session.run(None, feeds)[0]
+            mask = enc["attention_mask"][..., None].astype(np.float32)
+            out[idx] = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return out
+
+
+def load_encoder(model_name: str, backend: str = None):
+    """Instancie le backend demandé (ENCODER_BACKEND par défaut, sinon torch-fp32)."""
+    backend = backend or os.getenv("ENCODER_BACKEND", "torch-fp32")
+    if backend == "torch-fp32":
+        return TorchEncoder(model_name)
+    if backend == "torch-int8":
+        return QuantizedTorchEncoder(model_name)
+    if backend == "onnx":
+        return OnnxEncoder(model_name)
+    raise ValueError(f"Backend d'encodage inconnu : {backend} (attendu : {', '.join(BACKENDS)})")
+
+
+def check_parity(encoder, reference, queries, documents, tolerance: float = 0.02) -> dict:
+    """
+    Compare les scores cosinus (requête x document) d'un backend à ceux de la référence fp32.
+    Retourne l'écart maximal et si la tolérance est respectée.
+    """
+    def scores(enc):
+        q = enc.encode(queries)
+        d = enc.encode(documents)
+        q = q / np.linalg.norm(q, axis=1, keepdims=True)
+        d = d / np.linalg.norm(d, axis=1, keepdims=True)
+        return q @ d.T
+
+    diff = np.abs(scores(encoder) - scores(reference))
+    return {
+        "backend": encoder.backend,
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+        "tolerance": tolerance,
+        "ok": bool(diff.max() <= tolerance),
+    }
@@ -0,0 +1,133 @@
+# Module commun (app/executor.py) : copie identique dans risk_api, recrutement_api, matching_api.
+# Chaque image Docker est construite depuis le dossier de son service : toute modification
+# doit être reportée dans chaque copie.
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+
+
+class ExecutorSaturated(Exception):
+    """File d'attente d'inférence pleine : la requête doit être rejetée (503 + Retry-After)."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Service d'inférence saturé")
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    Exécute le code d'inférence bloquant (pandas / XGBoost / sklearn / torch) hors de la boucle
+    d'événements, dans un pool borné :
+      - kind='thread'  : threads partageant les artefacts chargés dans le processus principal
+      - kind='process' : processus, chacun charge ses propres artefacts via `initializer`
+    Au-delà de max_workers tâches en cours + max_queue en attente, run() lève ExecutorSaturated.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: Optional[int] = None, max_queue: Optional[int] = None,
+                 retry_after: int = 1, initializer: Optional[Callable] = None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Type d'exécuteur inconnu : {kind} (attendu : thread, process)")
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = self.max_workers * 2 if max_queue is None else max_queue
+        self.retry_after = retry_after
+        self.initializer = initializer
+        self._pool = None
+        self._staged = None  # (pool, initializer) préparé par stage(), en attente de promote()
+        self._in_flight = 0  # modifié uniquement depuis la boucle d'événements : pas de verrou nécessaire
+        self.rejected = 0
+
+    def _new_pool(self, initializer: Optional[Callable] = None):
+        if self.kind == "process":
+            return ProcessPoolExecutor(max_workers=self.max_workers, initializer=initializer)
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+
+    def start(self) -> None:
+        if self._pool is not None:
+            return
+        self._pool = self._new_pool(self.initializer)
+        logging.info(f"Exécuteur d'inférence : {self.kind}, {self.max_workers} workers, file max {self.max_queue}")
+
+    def stage(self, initializer: Optional[Callable] = None, check: Optional[Callable] = None) -> None:
+        """
+        Prépare un nouveau pool sans le mettre en service (ex. nouvelle version du modèle en
+        mode 'process') : check() y est exécuté (chargement par l'initializer + prédiction de test).
+        En cas d'échec le pool préparé est arrêté et l'exception propagée ; le pool actif est inchangé.
+        """
+        self.discard_staged()
+        pool = self._new_pool(initializer)
+        if check is not None:
+            try:
+                pool.submit(check).result()
+            except Exception:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+        self._staged = (pool, initializer)
+
+    def promote(self) -> bool:
+        """
+        Met en service le pool préparé par stage() : les nouvelles tâches partent dans ce pool,
+        les tâches en cours se terminent dans l'ancien. False si aucun pool n'est préparé.
+        """
+        if self._staged is None:
+            return False
+        (pool, initializer), self._staged = self._staged, None
+        old, self._pool = self._pool, pool
+        self.initializer = initializer
+        if old is not None:
+            old.shutdown(wait=False)
+        return True
+
+    def discard_staged(self) -> None:
+        if self._staged is not None:
+            self._staged[0].shutdown(wait=False, cancel_futures=True)
+            self._staged = None
+
+    def shutdown(self) -> None:
+        self.discard_staged()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Soumet fn(*args, **kwargs) au pool et attend son résultat sans bloquer la boucle."""
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise ExecutorSaturated(self.retry_after)
+        self.start()
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, partial(fn, *args, **kwargs))
+        finally:
+            self._in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queued": max(self._in_flight - self.max_workers, 0),
+            "rejected": self.rejected,
+        }
+
+
+def executor_from_env(initializer: Optional[Callable] = None) -> InferenceExecutor:
+    """
+    Configuration par variables d'environnement :
+      INFERENCE_EXECUTOR (thread | process), INFERENCE_WORKERS,
+      INFERENCE_MAX_QUEUE, INFERENCE_RETRY_AFTER (secondes).
+    """
+    workers = os.getenv("INFERENCE_WORKERS")
+    max_queue = os.getenv("INFERENCE_MAX_QUEUE")
+    return InferenceExecutor(
+        kind=os.getenv("INFERENCE_EXECUTOR", "thread"),
+        max_workers=int(workers) if workers else None,
+        max_queue=int(max_queue) if max_queue else None,
+        retry_after=int(os.getenv("INFERENCE_RETRY_AFTER", "1")),
+        initializer=initializer,
+    )
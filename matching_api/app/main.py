@@ -1,17 +1,39 @@
+from app.startup import PROCESS_T0, ModelNotReady, startup_state  # en premier : référence de temps
+
 import logging
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
-from app.routes import match_multiple
+from app.executor import ExecutorSaturated
+from app import model as matching_model
+from app.model import inference_executor, load_model
+from app.routes import match_multiple, cache_stats, cv_index
 
 # Configuration du logger
 logging.basicConfig(level=logging.INFO)
 
+# Import de l'application (sans torch : chargé par le thread de démarrage)
+startup_state.timings["app_import"] = round(time.perf_counter() - PROCESS_T0, 3)
+
+# Démarrage : le modèle est chargé et chauffé en arrière-plan, le service répond aux sondes immédiatement
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    inference_executor.start()
+    startup_state.start_background(load_model)
+    logging.info(f"Application importée en {startup_state.timings['app_import']}s, chargement du modèle en cours")
+    yield
+    inference_executor.shutdown()
+    if matching_model.cv_index is not None:
+        matching_model.cv_index.flush()  # écritures différées de l'index vectoriel
+
 # Création de l'application FastAPI
 app = FastAPI(
     title="API Matching IA RH",
     description="Compare des CVs à des descriptions de poste pour aider au recrutement",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Gestion personnalisée des erreurs de validation
@@ -33,10 +55,50 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"detail": exc.errors()},
     )
 
+# File d'inférence pleine : 503 + Retry-After
+@app.exception_handler(ExecutorSaturated)
+async def saturated_exception_handler(request: Request, exc: ExecutorSaturated):
+    logging.warning(f"Service saturé, requête rejetée : {request.url}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Modèle pas encore prêt : 503 + Retry-After
+@app.exception_handler(ModelNotReady)
+async def not_ready_exception_handler(request: Request, exc: ModelNotReady):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "phase": exc.phase},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 # Inclusion des routes
 app.include_router(match_multiple.router)
+app.include_router(cache_stats.router)
+app.include_router(cv_index.router)
 
-# Endpoint de vérification de l'état de l'API
+# Sonde de vivacité : le processus répond (même pendant le chargement du modèle)
+@app.get("/health/live")
+def liveness():
+    return {"status": "alive", "phase": startup_state.phase}
+
+# Sonde de disponibilité : 200 seulement quand le modèle est chargé et chauffé
+@app.get("/health/ready")
+def readiness():
+    if not startup_state.ready:
+        return JSONResponse(status_code=503, content=startup_state.stats())
+    return {"status": "ready", **startup_state.stats()}
+
+# Endpoint de vérification de l'état de l'API (= disponibilité)
 @app.get("/healthcheck")
 def healthcheck():
+    if not startup_state.ready:
+        return JSONResponse(status_code=503, content={"status": "Modèle en cours de chargement", **startup_state.stats()})
     return {"status": "API opérationnelle "}
+
+# État du pool d'inférence
+@app.get("/metrics/executor")
+def executor_metrics():
+    return inference_executor.stats()
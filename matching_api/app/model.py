@@ -1,37 +1,269 @@
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import logging
+import os
+import time
+from collections import defaultdict
+
 import numpy as np
 
-# Chargement du modèle multilingue pour générer des embeddings de phrases
-model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+from app.embedding_cache import EmbeddingCache, text_checksum
+from app.encoders import DEFAULT_MODEL_NAME, check_parity, load_encoder
+from app.executor import executor_from_env
+from app.passages import split_passages, pool_scores
+from app.vector_index import VectorIndex
 
+# Nom du modèle multilingue utilisé pour générer des embeddings de phrases
+MODEL_NAME = os.getenv("MODEL_NAME", DEFAULT_MODEL_NAME)
 
-# Compare une description de poste à plusieurs CVs
-def compute_similarity_multiple(job_description: str, cvs: list[dict]) -> list[dict]:
+# Découpage des CVs longs en passages (le modèle tronque au-delà de max_seq_length tokens)
+# PASSAGE_POOLING : max | mean | topk_mean | none (none = un seul embedding par CV, tronqué)
+PASSAGE_POOLING = os.getenv("PASSAGE_POOLING", "max")
+PASSAGE_OVERLAP = int(os.getenv("PASSAGE_OVERLAP", "32"))
+PASSAGE_TOP_K = int(os.getenv("PASSAGE_TOP_K", "3"))
+PASSAGE_BATCH_SIZE = int(os.getenv("PASSAGE_BATCH_SIZE", "64"))
+
+# Objets liés au modèle : créés par load_model() (thread de démarrage, ou initializer
+# des workers en mode 'process'), pas à l'import du module
+model = None
+embedding_cache = None
+passage_cache = None
+cv_index = None
+PASSAGE_WINDOW = None
+
+WARMUP_TEXTS = [
+    "Data Scientist Python Machine Learning",
+    "Comptable confirmé, clôtures mensuelles, fiscalité et SAP.",
+]
+
+
+def load_model(state=None, with_index: bool = True):
     """
-    Compare une description de poste à une liste de CVs (textes),
-    en utilisant la similarité cosinus sur des embeddings de phrases.
+    Charge l'encodeur (ENCODER_BACKEND, contrôle de parité), crée les caches et l'index vectoriel,
+    puis exécute un encodage de chauffe. state (StartupState) reçoit la durée de chaque étape.
+    """
+    global model, embedding_cache, passage_cache, cv_index, PASSAGE_WINDOW
+    started = time.perf_counter()
+    import sentence_transformers  # noqa: F401  (torch + transformers : import le plus coûteux)
+    if state is not None:
+        state.mark("torch_import", started)
+    started = time.perf_counter()
+
+    # Chargement du modèle via le backend configuré (ENCODER_BACKEND : torch-fp32 | torch-int8 | onnx)
+    encoder = load_encoder(MODEL_NAME)
+
+    # Contrôle de parité optionnel au démarrage : repli sur fp32 si les scores divergent
+    if encoder.backend != "torch-fp32" and os.getenv("ENCODER_PARITY_CHECK", "1") == "1":
+        reference = load_encoder(MODEL_NAME, "torch-fp32")
+        parity = check_parity(
+            encoder, reference,
+            queries=["Data Scientist Python Machine Learning", "Comptable confirmé, fiscalité"],
+            documents=["5 ans d'expérience en Python et Deep Learning", "Comptable, clôtures, SAP"],
+            tolerance=float(os.getenv("ENCODER_PARITY_TOLERANCE", "0.02")),
+        )
+        logging.info(f"Parité du backend {encoder.backend} : {parity}")
+        if not parity["ok"]:
+            logging.error(f"Backend {encoder.backend} hors tolérance, repli sur torch-fp32")
+            encoder = reference
+        del reference
+    if state is not None:
+        state.mark("model_load", started)
+
+    # Cache d'embeddings : LRU en mémoire + SQLite optionnel (EMBEDDING_CACHE_PATH)
+    embedding_cache = EmbeddingCache(
+        model_name=encoder.cache_name,
+        max_items=int(os.getenv("EMBEDDING_CACHE_SIZE", "20000")),
+        disk_path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+    )
+
+    PASSAGE_WINDOW = encoder.max_seq_length - 2  # place pour les tokens spéciaux [CLS] / [SEP]
+
+    # Cache des passages : matrice (n_passages, dim) aplatie, indexée par l'empreinte du CV entier
+    passage_cache = EmbeddingCache(
+        model_name=f"{encoder.cache_name}#passages-{PASSAGE_WINDOW}-{PASSAGE_OVERLAP}",
+        max_items=int(os.getenv("EMBEDDING_CACHE_SIZE", "20000")),
+        disk_path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+    )
+
+    if with_index and not delta_mode_supported():
+        logging.warning("Exécuteur 'process' sans EMBEDDING_CACHE_PATH : mode delta désactivé "
+                        "(les CVs envoyés par empreinte seule reçoivent un 409)")
 
+    # Index vectoriel de tout le vivier de CVs (persistant si VECTOR_INDEX_DIR est défini) :
+    # il vit dans le processus principal, les workers 'process' n'en ont pas besoin
+    if with_index:
+        step = time.perf_counter()
+        cv_index = VectorIndex(
+            dim=encoder.get_sentence_embedding_dimension(),
+            index_dir=os.getenv("VECTOR_INDEX_DIR") or None,
+            n_probe=int(os.getenv("VECTOR_INDEX_N_PROBE", "8")),
+            save_delay=float(os.getenv("VECTOR_INDEX_SAVE_DELAY", "2")),
+        )
+        if state is not None:
+            state.mark("index_load", step)
 
+    # Encodage de chauffe (allocation des buffers, premiers appels lents) hors cache
+    step = time.perf_counter()
+    encoder.encode(WARMUP_TEXTS)
+    split_passages(WARMUP_TEXTS[1], encoder.tokenizer, PASSAGE_WINDOW, PASSAGE_OVERLAP)
+    if state is not None:
+        state.mark("warmup", step)
+
+    model = encoder  # publié en dernier : les routes ne voient qu'un modèle chauffé
+    return model
+
+
+def load_worker_model():
+    """Initializer des workers 'process' : modèle et caches, sans l'index vectoriel."""
+    load_model(with_index=False)
+
+
+# Pool d'inférence borné : model.encode est exécuté hors de la boucle d'événements
+inference_executor = executor_from_env(initializer=load_worker_model)
+
+
+def delta_mode_supported() -> bool:
     """
+    Le mode delta (CV envoyé par sa seule empreinte) suppose un cache partagé par tous les
+    encodages : en mode 'process', chaque worker a son propre cache mémoire, seul le cache
+    disque (EMBEDDING_CACHE_PATH) est commun.
+    """
+    return inference_executor.kind == "thread" or bool(os.getenv("EMBEDDING_CACHE_PATH"))
+
+
+def cosine_scores(query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """Similarité cosinus d'un vecteur avec chaque ligne d'une matrice (0 pour un vecteur nul)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    query = np.asarray(query, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    return np.divide(matrix @ query, norms, out=np.zeros(len(matrix), dtype=np.float32), where=norms > 0)
+
+
+class UnknownChecksumError(Exception):
+    """Des CVs ont été envoyés sans texte avec une empreinte absente du cache."""
+
+    def __init__(self, checksums: list[str]):
+        super().__init__(f"{len(checksums)} empreinte(s) inconnue(s)")
+        self.checksums = checksums
+
 
-    # Initialisation des listes de noms et de textes
-    texts = []
-    names = []
+def reject_unshared_checksums(cvs: list[dict]) -> None:
+    """
+    Appelé dans le processus principal avant l'envoi au pool : sans cache partagé entre
+    workers (delta_mode_supported), une empreinte connue d'un worker est inconnue du suivant.
+    Le texte de tous les CVs envoyés par empreinte est alors redemandé (409 déterministe).
+    """
+    if not delta_mode_supported():
+        missing = [cv["checksum"] for cv in cvs if cv.get("text") is None]
+        if missing:
+            raise UnknownChecksumError(missing)
+
+
+def encode_texts(texts: list[str]) -> np.ndarray:
+    """
+    Encode une liste de textes en passant par le cache :
+    seuls les textes nouveaux ou modifiés sont réellement encodés.
+    """
+    return embedding_cache.get_or_encode(texts, model.encode)
+
+
+def encode_cvs(cvs: list[dict]) -> np.ndarray:
+    """
+    Encode des CVs fournis soit par leur texte, soit par leur seule empreinte
+    (mode delta). Lève UnknownChecksumError si une empreinte est inconnue.
+    """
+    # Empreintes seules : l'embedding doit déjà être en cache
+    by_row, missing = {}, []
+    for i, cv in enumerate(cvs):
+        if cv.get("text") is None:
+            vec = embedding_cache.get(cv["checksum"])
+            if vec is None:
+                missing.append(cv["checksum"])
+            by_row[i] = vec
+    if missing:
+        raise UnknownChecksumError(missing)
+
+    # Textes fournis : encodés (ou relus) via le cache, en un seul lot
+    text_rows = [i for i, cv in enumerate(cvs) if cv.get("text") is not None]
+    if text_rows:
+        by_row.update(zip(text_rows, encode_texts([cvs[i]["text"] for i in text_rows])))
+
+    return np.vstack([by_row[i] for i in range(len(cvs))])
+
+
+def encode_cv_passages(cvs: list[dict]) -> list[np.ndarray]:
+    """
+    Encode chaque CV en passages qui se chevauchent et retourne, par CV,
+    la matrice (n_passages, dim) de ses embeddings.
+    Les passages de tous les CVs à encoder sont triés par longueur puis encodés
+    ensemble par lots homogènes ; le résultat est mis en cache par empreinte de CV.
+    """
+    dim = model.get_sentence_embedding_dimension()
+    per_cv: list = [None] * len(cvs)
+    missing, to_split = [], {}
+
+    # 1) CVs déjà découpés et encodés (par texte ou par empreinte seule)
+    for i, cv in enumerate(cvs):
+        checksum = cv["checksum"] if cv.get("text") is None else text_checksum(cv["text"])
+        cached = passage_cache.get(checksum)
+        if cached is not None:
+            per_cv[i] = cached.reshape(-1, dim)
+        elif cv.get("text") is None:
+            missing.append(checksum)
+        else:
+            to_split[i] = (checksum, cv["text"])
+    if missing:
+        raise UnknownChecksumError(missing)
+
+    # 2) Découpage en fenêtres de tokens de tous les nouveaux CVs
+    passages = []  # (indice CV, texte du passage, nb tokens)
+    for i, (_checksum, text) in to_split.items():
+        for passage, n_tokens in split_passages(text, model.tokenizer, PASSAGE_WINDOW, PASSAGE_OVERLAP):
+            passages.append((i, passage, n_tokens))
+
+    # 3) Encodage groupé, trié par longueur pour limiter le padding
+    if passages:
+        order = sorted(range(len(passages)), key=lambda j: passages[j][2])
+        encoded = model.encode([passages[j][1] for j in order], batch_size=PASSAGE_BATCH_SIZE)
+        embeddings = np.empty((len(passages), encoded.shape[1]), dtype=np.float32)
+        embeddings[order] = encoded
+
+        rows_by_cv = defaultdict(list)
+        for j, (i, _passage, _n) in enumerate(passages):
+            rows_by_cv[i].append(j)
+        for i, rows in rows_by_cv.items():
+            per_cv[i] = embeddings[rows]
+        passage_cache.put_many({to_split[i][0]: per_cv[i].ravel() for i in rows_by_cv})
+
+    return per_cv
+
+
+# Compare une description de poste à plusieurs CVs
+def compute_similarity_multiple(job_description: str, cvs: list[dict], pooling: str = None) -> list[dict]:
+    """
+    Compare une description de poste à une liste de CVs (textes),
+    en utilisant la similarité cosinus sur des embeddings de phrases.
+    pooling (max | mean | topk_mean) : chaque CV est découpé en passages et
+    les scores des passages sont agrégés ; 'none' : un embedding par CV.
+    """
+    pooling = pooling or PASSAGE_POOLING
 
-    # Extraction des textes et noms des CVs
-    for cv in cvs:
-        texts.append(cv["text"])
-        names.append(cv["name"])
+    # Extraction des noms des CVs
+    names = [cv["name"] for cv in cvs]
 
     # Encodage de la description du poste
-    job_embedding = model.encode([job_description])[0]
+    job_embedding = encode_texts([job_description])[0]
 
-    # Encodage des CVs
-    cv_embeddings = model.encode(texts)
+    if pooling == "none":
+        # Encodage des CVs (texte ou empreinte déjà connue)
+        cv_embeddings = encode_cvs(cvs)
 
-    # Calcul des similarités cosinus entre la description du poste et chaque CV
-    similarities = cosine_similarity([job_embedding], cv_embeddings)[0]
+        # Calcul des similarités cosinus entre la description du poste et chaque CV
+        similarities = cosine_scores(job_embedding, cv_embeddings)
+    else:
+        # Score par passage puis agrégation au niveau du CV
+        similarities = [
+            pool_scores(cosine_scores(job_embedding, passage_embeddings), pooling, PASSAGE_TOP_K)
+            for passage_embeddings in encode_cv_passages(cvs)
+        ]
 
     # Construction des résultats avec score
     results = []
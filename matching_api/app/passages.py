@@ -0,0 +1,47 @@
+from typing import List, Tuple
+
+import numpy as np
+
+POOLING_MODES = ("max", "mean", "topk_mean")
+
+
+def split_passages(text: str, tokenizer, window: int, overlap: int) -> List[Tuple[str, int]]:
+    """
+    Découpe un texte en fenêtres de `window` tokens qui se chevauchent de `overlap` tokens.
+    Retourne [(passage, nb_tokens)] ; un texte court donne un seul passage (le texte lui-même).
+    Les passages sont des extraits du texte original (offsets), pas du texte re-décodé.
+    """
+    text = text or ""
+    encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+    offsets = encoding["offset_mapping"]
+    n_tokens = len(offsets)
+    if n_tokens <= window:
+        return [(text, n_tokens)]
+
+    stride = max(window - overlap, 1)
+    passages = []
+    for start in range(0, n_tokens, stride):
+        end = min(start + window, n_tokens)
+        passages.append((text[offsets[start][0]:offsets[end - 1][1]], end - start))
+        if end == n_tokens:
+            break
+    return passages
+
+
+def pool_scores(scores: np.ndarray, pooling: str, top_k: int = 3) -> float:
+    """
+    Agrège les scores cosinus des passages d'un CV en un score document :
+      - max       : meilleur passage
+      - mean      : moyenne de tous les passages
+      - topk_mean : moyenne des top_k meilleurs passages
+    """
+    if scores.size == 0:
+        return 0.0
+    if pooling == "max":
+        return float(scores.max())
+    if pooling == "mean":
+        return float(scores.mean())
+    if pooling == "topk_mean":
+        k = min(max(top_k, 1), scores.size)
+        return float(np.sort(scores)[-k:].mean())
+    raise ValueError(f"Pooling inconnu : {pooling} (attendu : {', '.join(POOLING_MODES)})")
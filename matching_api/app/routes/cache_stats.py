@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+from app import model as matching_model
+from app.startup import require_ready
+
+router = APIRouter(dependencies=[Depends(require_ready)])
+
+@router.get("/cache/stats")
+def cache_stats():
+    """
+    Statistiques du cache d'embeddings (hits / misses, taille mémoire et disque).
+    En mode 'process', les encodages ont lieu dans les workers : les compteurs et le cache
+    mémoire du processus principal ne les reflètent pas, seul le cache disque partagé est compté.
+    """
+    stats = matching_model.embedding_cache.stats()
+    if matching_model.inference_executor.kind == "process":
+        return {
+            "model_name": stats["model_name"],
+            "scope": "disk",
+            "detail": "Exécuteur 'process' : chaque worker a son propre cache mémoire, "
+                      "seul le cache disque partagé est compté",
+            "disk_items": stats["disk_items"],
+        }
+    return dict(stats, scope="process")
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+from app import model as matching_model
+from app.schemas import IndexAddRequest, IndexRemoveRequest, IndexQueryRequest, IndexQueryResult
+from app.model import encode_cvs, encode_texts, inference_executor, reject_unshared_checksums, UnknownChecksumError
+from app.startup import require_ready
+
+# L'index est créé par le chargement du modèle : lu via le module, routes disponibles une fois prêt
+router = APIRouter(prefix="/index", tags=["CV Index"], dependencies=[Depends(require_ready)])
+
+@router.post("/add")
+async def index_add(request: IndexAddRequest):
+    """
+    Ajoute (ou met à jour) des CVs dans l'index vectoriel.
+    Les embeddings passent par le cache : un CV déjà encodé n'est pas ré-encodé.
+    """
+    cvs_data = [{"name": item.id, "text": item.text, "checksum": item.checksum} for item in request.items]
+    try:
+        reject_unshared_checksums(cvs_data)
+        embeddings = await inference_executor.run(encode_cvs, cvs_data)
+    except UnknownChecksumError as e:
+        raise HTTPException(status_code=409, detail={"missing_checksums": e.checksums})
+    # L'index vit dans le processus principal : mutations hors pool d'inférence
+    added = await run_in_threadpool(matching_model.cv_index.add, [item.id for item in request.items], embeddings)
+    return {"added": added, "updated": len(request.items) - added, "size": matching_model.cv_index.size}
+
+@router.post("/remove")
+async def index_remove(request: IndexRemoveRequest):
+    """
+    Retire des CVs de l'index.
+    """
+    removed = await run_in_threadpool(matching_model.cv_index.remove, request.ids)
+    return {"removed": removed, "size": matching_model.cv_index.size}
+
+@router.post("/query", response_model=list[IndexQueryResult])
+async def index_query(request: IndexQueryRequest):
+    """
+    Retourne les top_k CVs de l'index les plus proches de la description de poste.
+    backend='exact' parcourt tout le vivier ; backend='ivf' ne parcourt que les cellules les plus proches.
+    """
+    job_embedding = (await inference_executor.run(encode_texts, [request.job_description]))[0]
+    hits = await run_in_threadpool(
+        matching_model.cv_index.query, job_embedding, k=request.top_k, backend=request.backend, n_probe=request.n_probe
+    )
+    return [{"cv_id": cv_id, "score": score} for cv_id, score in hits]
+
+@router.get("/stats")
+def index_stats():
+    """
+    Taille de l'index, mémoire occupée et état de l'IVF.
+    """
+    return matching_model.cv_index.stats()
@@ -1,14 +1,17 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException
 from app.schemas import MatchMultipleRequest, MatchResult
-from app.model import compute_similarity_multiple
+from app.model import compute_similarity_multiple, inference_executor, reject_unshared_checksums, UnknownChecksumError
+from app.startup import require_ready
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(require_ready)])
 
 @router.post("/match/multiple", response_model=list[MatchResult])
-def match_multiple(request: MatchMultipleRequest):
+async def match_multiple(request: MatchMultipleRequest):
     """
     Compare une description de poste à une liste de CVs (texte déjà extrait),
     et retourne les scores de similarité triés.
+    Un CV peut être envoyé par sa seule empreinte s'il est déjà connu du service ;
+    sinon la réponse est un 409 listant les empreintes dont il faut renvoyer le texte.
     """
 
     # Construction de la liste des CVs au format attendu
@@ -16,13 +19,20 @@ def match_multiple(request: MatchMultipleRequest):
     for cv in request.cvs:
         cvs_data.append({
             "name": cv.name,
-            "text": cv.text
+            "text": cv.text,
+            "checksum": cv.checksum
         })
 
     # Calcul de la similarité
-    results = compute_similarity_multiple(
-        job_description=request.job_description,
-        cvs=cvs_data
-    )
+    try:
+        reject_unshared_checksums(cvs_data)
+        results = await inference_executor.run(
+            compute_similarity_multiple,
+            job_description=request.job_description,
+            cvs=cvs_data,
+            pooling=request.pooling
+        )
+    except UnknownChecksumError as e:
+        raise HTTPException(status_code=409, detail={"missing_checksums": e.checksums})
 
     return results
@@ -1,20 +1,58 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
 
 
 
 # Pour /match/multiple : plusieurs CVs
 class CVItem(BaseModel):
     name: str
-    text: str
+    text: Optional[str] = None      # texte du CV (obligatoire si le service ne connaît pas l'empreinte)
+    checksum: Optional[str] = None  # empreinte SHA-256 du texte normalisé (mode delta)
+
+    @model_validator(mode="after")
+    def check_text_or_checksum(self):
+        if self.text is None and not self.checksum:
+            raise ValueError("Chaque CV doit fournir 'text' ou 'checksum'.")
+        return self
 
 class MatchMultipleRequest(BaseModel):
 
     job_description: str #Le texte de la description du poste.
     cvs: List[CVItem] #Liste de dictionnaires contenant le nom et le texte de chaque CV.
+    # Agrégation des scores de passages ; None = valeur par défaut du service (PASSAGE_POOLING)
+    pooling: Optional[Literal["max", "mean", "topk_mean", "none"]] = None
 
 # Réponse standard
 class MatchResult(BaseModel):
     # Liste de dictionnaires avec le nom du CV et le score de similarité,triée par score décroissant
     cv_name: str
     score: float
+
+
+# Pour /index/* : index vectoriel persistant de tout le vivier de CVs
+class IndexItem(BaseModel):
+    id: str                         # identifiant stable du CV (ex. id Odoo)
+    text: Optional[str] = None
+    checksum: Optional[str] = None  # si le texte est déjà connu du cache d'embeddings
+
+    @model_validator(mode="after")
+    def check_text_or_checksum(self):
+        if self.text is None and not self.checksum:
+            raise ValueError("Chaque CV doit fournir 'text' ou 'checksum'.")
+        return self
+
+class IndexAddRequest(BaseModel):
+    items: List[IndexItem]
+
+class IndexRemoveRequest(BaseModel):
+    ids: List[str]
+
+class IndexQueryRequest(BaseModel):
+    job_description: str
+    top_k: int = Field(10, ge=1, le=1000)
+    backend: Literal["exact", "ivf"] = "ivf"
+    n_probe: Optional[int] = Field(None, ge=1)
+
+class IndexQueryResult(BaseModel):
+    cv_id: str
+    score: float
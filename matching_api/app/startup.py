@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# Référence de temps : import du premier module de l'application (voir app/main.py)
+PROCESS_T0 = time.perf_counter()
+
+
+class ModelNotReady(Exception):
+    """Le modèle est encore en cours de chargement (ou a échoué) : la requête reçoit un 503."""
+
+    def __init__(self, phase: str, retry_after: int = 5):
+        super().__init__(f"Modèle non prêt ({phase})")
+        self.phase = phase
+        self.retry_after = retry_after
+
+
+class StartupState:
+    """
+    Cycle de démarrage du service :
+      starting -> loading -> ready   (ou failed)
+    Le chargement (modèle + warm-up) tourne dans un thread : le processus répond tout de suite
+    à la sonde de vivacité, la sonde de disponibilité passe à 200 une fois le modèle utilisable.
+    """
+
+    def __init__(self):
+        self.phase = "starting"
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.phase == "ready"
+
+    def mark(self, name: str, started: float) -> float:
+        """Enregistre la durée d'une étape (secondes) depuis `started` (perf_counter)."""
+        elapsed = time.perf_counter() - started
+        self.timings[name] = round(elapsed, 3)
+        return elapsed
+
+    def start_background(self, load_fn: Callable[["StartupState"], None]) -> None:
+        """Lance load_fn(state) dans un thread ; l'état passe à ready ou failed à la fin."""
+        if self._thread is not None:
+            return
+
+        def _run():
+            self.phase = "loading"
+            try:
+                load_fn(self)
+            except Exception as e:
+                self.phase = "failed"
+                self.error = str(e)
+                logging.exception("Échec du chargement du modèle")
+                return
+            self.timings["ready_since_start"] = round(time.perf_counter() - PROCESS_T0, 3)
+            self.phase = "ready"
+            logging.info(f"Service prêt : {self.timings}")
+
+        self._thread = threading.Thread(target=_run, name="model-startup", daemon=True)
+        self._thread.start()
+
+    def require_ready(self) -> None:
+        """Dépendance des routes d'inférence : 503 + Retry-After tant que le modèle n'est pas prêt."""
+        if not self.ready:
+            raise ModelNotReady(self.phase)
+
+    def stats(self) -> dict:
+        return {"phase": self.phase, "error": self.error, "timings": dict(self.timings)}
+
+
+startup_state = StartupState()
+
+
+def require_ready() -> None:
+    startup_state.require_ready()
@@ -0,0 +1,296 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Normalise chaque ligne (norme L2 = 1) : le produit scalaire devient la similarité cosinus."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices des k meilleurs scores, triés par score décroissant (argpartition puis tri local)."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+class VectorIndex:
+    """
+    Index vectoriel persistant des CVs :
+      - embeddings normalisés stockés dans un tampon float32 contigu préalloué (capacité doublée
+        quand il est plein : ajout amorti en O(1)) ; lignes actives : vue [0, size)
+      - backend 'exact' : produit matrice-vecteur sur tout le pool
+      - backend 'ivf'   : k-means (NumPy pur) en n_lists cellules ; la requête ne parcourt
+                          que les n_probe cellules les plus proches (approximatif, beaucoup plus rapide)
+    Persistance (optionnelle) dans un répertoire : vectors.npy, ids.json, centroids.npy.
+    Les mutations sont écrites au plus tard save_delay secondes après la première modification
+    (une seule réécriture pour une rafale d'ajouts) ; flush() force l'écriture (arrêt du service).
+    """
+
+    BACKENDS = ("exact", "ivf")
+
+    def __init__(self, dim: int, index_dir: Optional[str] = None, n_probe: int = 8, save_delay: float = 2.0):
+        self.dim = int(dim)
+        self.index_dir = Path(index_dir) if index_dir else None
+        self.n_probe = max(int(n_probe), 1)
+        self.save_delay = max(float(save_delay), 0.0)
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        self.saves = 0
+
+        self._lock = threading.RLock()
+        self._buffer = np.zeros((0, self.dim), dtype=np.float32)   # capacité >= size
+        self._ids: List[str] = []
+        self._row_of: dict = {}
+
+        # IVF
+        self._centroids: Optional[np.ndarray] = None
+        self._assign_buffer = np.zeros(0, dtype=np.int32)   # cellule de chaque ligne
+        self._trained_size = 0
+
+        if self.index_dir:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            self._load()
+
+    @property
+    def size(self) -> int:
+        return len(self._ids)
+
+    @property
+    def capacity(self) -> int:
+        return self._buffer.shape[0]
+
+    @property
+    def _matrix(self) -> np.ndarray:
+        # vue sur les lignes actives, sans copie
+        return self._buffer[:self.size]
+
+    @property
+    def _assign(self) -> np.ndarray:
+        return self._assign_buffer[:self.size]
+
+    def _reserve(self, rows: int) -> None:
+        """Garantit une capacité d'au moins `rows` lignes (doublement : copies amorties)."""
+        if rows <= self.capacity:
+            return
+        capacity = max(rows, 2 * self.capacity, 64)
+        buffer = np.zeros((capacity, self.dim), dtype=np.float32)
+        buffer[:self.size] = self._matrix
+        assign = np.zeros(capacity, dtype=np.int32)
+        assign[:self.size] = self._assign
+        self._buffer, self._assign_buffer = buffer, assign
+
+    # ---------------------------
+    # Mutations
+    # ---------------------------
+    def add(self, ids: List[str], vectors: np.ndarray) -> int:
+        """Ajoute ou remplace des vecteurs (upsert par id). Retourne le nombre de nouveaux ids."""
+        vectors = _normalize_rows(vectors)
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"Dimensions attendues ({len(ids)}, {self.dim}), reçues {vectors.shape}")
+        # Ids en double dans la requête : seule la dernière occurrence est conservée
+        last_of = {cv_id: i for i, cv_id in enumerate(ids)}
+        if len(last_of) != len(ids):
+            keep = sorted(last_of.values())
+            ids, vectors = [ids[i] for i in keep], vectors[keep]
+        with self._lock:
+            new_ids, new_rows = [], []
+            for cv_id, vec in zip(ids, vectors):
+                row = self._row_of.get(cv_id)
+                if row is not None:
+                    self._buffer[row] = vec
+                    if self._centroids is not None:
+                        self._assign_buffer[row] = self._nearest_centroids(vec[None, :])[0]
+                else:
+                    new_ids.append(cv_id)
+                    new_rows.append(vec)
+            if new_rows:
+                block = np.vstack(new_rows)
+                start = self.size
+                end = start + len(new_rows)
+                self._reserve(end)
+                self._buffer[start:end] = block
+                self._assign_buffer[start:end] = self._nearest_centroids(block) \
+                    if self._centroids is not None else 0
+                for offset, cv_id in enumerate(new_ids):
+                    self._ids.append(cv_id)
+                    self._row_of[cv_id] = start + offset
+            self._schedule_save()
+            return len(new_ids)
+
+    def remove(self, ids: List[str]) -> int:
+        """Supprime des ids ; la dernière ligne vient combler le trou pour garder la matrice contiguë."""
+        with self._lock:
+            removed = 0
+            for cv_id in ids:
+                row = self._row_of.pop(cv_id, None)
+                if row is None:
+                    continue
+                last = self.size - 1
+                if row != last:
+                    last_id = self._ids[last]
+                    self._buffer[row] = self._buffer[last]
+                    self._assign_buffer[row] = self._assign_buffer[last]
+                    self._ids[row] = last_id
+                    self._row_of[last_id] = row
+                self._ids.pop()
+                removed += 1
+            if removed:
+                self._schedule_save()
+            return removed
+
+    # ---------------------------
+    # IVF
+    # ---------------------------
+    def train(self, n_lists: Optional[int] = None, n_iter: int = 10, seed: int = 0) -> None:
+        """Entraîne les centroïdes IVF (k-means sphérique) sur le pool courant."""
+        with self._lock:
+            n = self.size
+            if n == 0:
+                return
+            n_lists = n_lists or max(1, int(np.sqrt(n)))
+            n_lists = min(n_lists, n)
+            rng = np.random.default_rng(seed)
+            centroids = self._matrix[rng.choice(n, size=n_lists, replace=False)].copy()
+            for _ in range(n_iter):
+                assign = np.argmax(self._matrix @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, self._matrix)
+                counts = np.bincount(assign, minlength=n_lists)
+                filled = counts > 0
+                centroids[filled] = sums[filled]     # les cellules vides gardent leur centroïde
+                centroids = _normalize_rows(centroids)
+            self._centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+            self._assign_buffer[:n] = self._nearest_centroids(self._matrix)
+            self._trained_size = n
+            self._schedule_save()
+            logging.info(f"Index IVF entraîné : {n} vecteurs, {n_lists} cellules")
+
+    def _nearest_centroids(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def _ensure_trained(self) -> None:
+        # (ré)entraînement quand le pool a doublé depuis le dernier k-means
+        if self._centroids is None or self.size > 2 * self._trained_size:
+            self.train()
+
+    # ---------------------------
+    # Requête
+    # ---------------------------
+    def query(self, vector: np.ndarray, k: int = 10, backend: str = "exact",
+              n_probe: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Retourne les k (id, score cosinus) les plus proches, triés par score décroissant."""
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Backend inconnu : {backend} (attendu : {', '.join(self.BACKENDS)})")
+        q = _normalize_rows(vector)[0]
+        with self._lock:
+            if self.size == 0:
+                return []
+            if backend == "exact":
+                rows = None
+                scores = self._matrix @ q
+            else:
+                self._ensure_trained()
+                probes = _top_k(self._centroids @ q, n_probe or self.n_probe)
+                rows = np.flatnonzero(np.isin(self._assign, probes))
+                scores = self._matrix[rows] @ q
+            best = _top_k(scores, k)
+            if rows is not None:
+                return [(self._ids[rows[i]], float(scores[i])) for i in best]
+            return [(self._ids[i], float(scores[i])) for i in best]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "dim": self.dim,
+                "capacity": self.capacity,
+                "memory_bytes": int(self._buffer.nbytes),
+                "ivf_lists": 0 if self._centroids is None else int(self._centroids.shape[0]),
+                "ivf_trained_size": self._trained_size,
+                "n_probe": self.n_probe,
+                "persistent": self.index_dir is not None,
+                "pending_save": self._dirty,
+                "saves": self.saves,
+            }
+
+    # ---------------------------
+    # Persistance
+    # ---------------------------
+    def _schedule_save(self) -> None:
+        # appelé avec le verrou : une seule écriture différée pour toutes les mutations de la fenêtre
+        if not self.index_dir:
+            return
+        self._dirty = True
+        if self.save_delay <= 0:
+            self.flush()
+        elif self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self) -> None:
+        """Écrit l'index sur disque s'il a été modifié depuis la dernière écriture."""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if self._dirty:
+                self._save()
+                self._dirty = False
+                self.saves += 1
+
+    def _save(self) -> None:
+        if not self.index_dir:
+            return
+        # écriture dans des fichiers temporaires puis os.replace : jamais d'index à moitié écrit
+        self._atomic_save_npy("vectors.npy", self._matrix)
+        self._atomic_save_npy("assign.npy", self._assign)
+        if self._centroids is not None:
+            self._atomic_save_npy("centroids.npy", self._centroids)
+        tmp = self.index_dir / "ids.json.tmp"
+        tmp.write_text(json.dumps({"dim": self.dim, "ids": self._ids, "trained_size": self._trained_size}),
+                       encoding="utf-8")
+        os.replace(tmp, self.index_dir / "ids.json")
+
+    def _atomic_save_npy(self, name: str, array: np.ndarray) -> None:
+        tmp = self.index_dir / f"{name}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, self.index_dir / name)
+
+    def _load(self) -> None:
+        meta_path = self.index_dir / "ids.json"
+        if not meta_path.exists():
+            return
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("dim") != self.dim:
+            logging.warning(f"Index ignoré : dimension {meta.get('dim')} != {self.dim}")
+            return
+        # mmap en lecture puis copie contiguë : chargement rapide sans double passage disque
+        self._buffer = np.ascontiguousarray(np.load(self.index_dir / "vectors.npy", mmap_mode="r"),
+                                            dtype=np.float32)
+        self._ids = list(meta["ids"])
+        self._row_of = {cv_id: row for row, cv_id in enumerate(self._ids)}
+        self._trained_size = int(meta.get("trained_size", 0))
+        centroids_path = self.index_dir / "centroids.npy"
+        assign_path = self.index_dir / "assign.npy"
+        if centroids_path.exists() and assign_path.exists():
+            self._centroids = np.load(centroids_path)
+            self._assign_buffer = np.load(assign_path).astype(np.int32)
+        else:
+            self._assign_buffer = np.zeros(self.size, dtype=np.int32)
+        logging.info(f"Index vectoriel chargé : {self.size} CVs depuis {self.index_dir}")
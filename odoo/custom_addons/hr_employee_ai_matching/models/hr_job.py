@@ -1,7 +1,5 @@
 from odoo import models, fields, api
 from odoo.exceptions import UserError
-import base64
-import fitz
 import requests
 import logging
 from markupsafe import Markup
@@ -10,6 +8,11 @@ from bs4 import BeautifulSoup  # Assure-toi que `beautifulsoup4` est installé
 
 _logger = logging.getLogger(__name__)
 
+# Paramètres système
+MATCHING_API_URL_PARAM = "hr_employee_ai_matching.api_url"
+MATCHING_DELTA_MODE_PARAM = "hr_employee_ai_matching.delta_mode"
+DEFAULT_MATCHING_API_URL = "http://fastapicv:8045/match/multiple"
+
 class HrJob(models.Model):
     _inherit = 'hr.job'
 
@@ -40,46 +43,73 @@ class HrJob(models.Model):
         if not self.cv_upload_ids:
             raise UserError("Please upload at least one CV.")
 
-        extracted_cvs = []
-        for cv in self.cv_upload_ids:
-            if not cv.cv_pdf:
-                continue
-            try:
-                pdf_bytes = base64.b64decode(cv.cv_pdf)
-                with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-                    text = "\n".join(page.get_text() for page in doc)
-                extracted_cvs.append({
-                    "name": cv.name or "Unnamed CV",
-                    "text": text.strip()
-                })
-            except Exception as e:
-                _logger.exception("Error reading PDF: %s", cv.name)
-                raise UserError(f"Error reading PDF {cv.name}: {e}")
-
-        if not extracted_cvs:
+        # Le texte est extrait à l'upload (hr.matching.cv.cv_text) : plus de décodage PDF ici
+        valid_cvs = self.cv_upload_ids.filtered(lambda cv: cv.cv_pdf)
+        unreadable = valid_cvs.filtered(lambda cv: not cv.cv_checksum)
+        if unreadable:
+            raise UserError(f"Error reading PDF {unreadable[0].name}: {unreadable[0].cv_error}")
+
+        if not valid_cvs:
             raise UserError("No valid CVs with PDF content were found.")
 
         try:
-            api_url = "http://fastapicv:8045/match/multiple"
-            payload = {
-                "job_description": self.description.strip(),
-                "cvs": extracted_cvs
-            }
-            response = requests.post(api_url, json=payload, timeout=150)
+            api_url = self._get_matching_api_url()
+            delta_mode = self._is_matching_delta_mode()
+
+            # Mode delta : seules les empreintes sont envoyées, le service réutilise
+            # les embeddings déjà connus et signale (HTTP 409) les empreintes inconnues.
+            response = self._post_matching(api_url, valid_cvs, send_text=not delta_mode)
+            if delta_mode and response.status_code == 409:
+                missing = set(response.json().get("detail", {}).get("missing_checksums", []))
+                _logger.info("Matching: %s CV(s) unknown to the service, sending their text", len(missing))
+                response = self._post_matching(api_url, valid_cvs, send_text=missing)
+                if response.status_code == 409:
+                    # Entrées évincées du cache entre les deux appels : texte de tous les CVs
+                    _logger.info("Matching: checksums still unknown after retry, sending all texts")
+                    response = self._post_matching(api_url, valid_cvs, send_text=True)
             response.raise_for_status()
             results = response.json()
 
             self.matching_result_ids.unlink()
 
-            for res in results:
-                self.env["hr.matching.result"].create({
-                    "job_id": self.id,
-                    "cv_name": res.get("cv_name"),
-                    "score": res.get("score", 0.0) * 100
-                })
+            self.env["hr.matching.result"].create([{
+                "job_id": self.id,
+                "cv_name": res.get("cv_name"),
+                "score": res.get("score", 0.0) * 100
+            } for res in results])
 
             _logger.info("AI results successfully saved for job: %s", self.name)
 
+        except requests.HTTPError as e:
+            _logger.error("❌ FastAPI error: %s", str(e))
+            raise UserError(f"The matching service returned an error: {e}")
         except requests.RequestException as e:
             _logger.error("❌ FastAPI connection error: %s", str(e))
-            raise UserError("Failed to connect to the FastAPI service.")
\ No newline at end of file
+            raise UserError("Failed to connect to the FastAPI service.")
+
+    def _get_matching_api_url(self):
+        return self.env["ir.config_parameter"].sudo().get_param(
+            MATCHING_API_URL_PARAM, DEFAULT_MATCHING_API_URL)
+
+    def _is_matching_delta_mode(self):
+        # Désactivé par défaut : le mode delta suppose un cache d'embeddings partagé côté service
+        value = self.env["ir.config_parameter"].sudo().get_param(MATCHING_DELTA_MODE_PARAM, "0")
+        return str(value).strip().lower() not in ("0", "false", "no", "")
+
+    def _post_matching(self, api_url, cvs, send_text=True):
+        """
+        Envoie les CVs au service de matching.
+        send_text : True (texte de tous les CVs), False (empreintes seules)
+        ou un ensemble d'empreintes dont le texte doit être joint.
+        """
+        cv_items = []
+        for cv in cvs:
+            item = {"name": cv.name or "Unnamed CV", "checksum": cv.cv_checksum}
+            if send_text is True or (send_text and cv.cv_checksum in send_text):
+                item["text"] = cv.cv_text or ""
+            cv_items.append(item)
+        payload = {
+            "job_description": self.description.strip(),
+            "cvs": cv_items
+        }
+        return requests.post(api_url, json=payload, timeout=150)
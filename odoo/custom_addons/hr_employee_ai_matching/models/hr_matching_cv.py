@@ -1,4 +1,11 @@
-from odoo import models, fields
+import base64
+import hashlib
+import logging
+
+import fitz
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
 
 
 class HRMatchingCV(models.Model):
@@ -8,3 +15,35 @@ class HRMatchingCV(models.Model):
     job_id = fields.Many2one("hr.job", string="Job", required=True , ondelete="cascade")
     name = fields.Char("CV name", required=True)
     cv_pdf = fields.Binary("PDF File", required=True, attachment=True)
+
+    # Texte extrait et empreinte : recalculés uniquement quand le PDF change
+    cv_text = fields.Text("Extracted Text", compute="_compute_cv_text", store=True)
+    cv_checksum = fields.Char("Text Checksum", compute="_compute_cv_text", store=True, index=True)
+    cv_error = fields.Char("Extraction Error", compute="_compute_cv_text", store=True)
+
+    @staticmethod
+    def _text_checksum(text):
+        """
+        SHA-256 du texte normalisé (espaces réduits) : même empreinte que
+        app.embedding_cache.text_checksum côté matching_api.
+        """
+        return hashlib.sha256(" ".join((text or "").split()).encode("utf-8")).hexdigest()
+
+    @api.depends("cv_pdf")
+    def _compute_cv_text(self):
+        for cv in self:
+            cv.cv_text = False
+            cv.cv_checksum = False
+            cv.cv_error = False
+            if not cv.cv_pdf:
+                continue
+            try:
+                pdf_bytes = base64.b64decode(cv.cv_pdf)
+                with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+                    text = "\n".join(page.get_text() for page in doc).strip()
+            except Exception as e:
+                _logger.exception("Error reading PDF: %s", cv.name)
+                cv.cv_error = str(e)
+                continue
+            cv.cv_text = text
+            cv.cv_checksum = self._text_checksum(text)
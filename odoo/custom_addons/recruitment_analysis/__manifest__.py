@@ -3,9 +3,11 @@
     'version': '17.0.1.0.0',
     'summary': 'Predict and analyze recruitment needs by department',
     'category': 'Human Resources',
-    'depends': ['hr', 'hr_recruitment'],
+    'depends': ['hr', 'hr_contract', 'hr_recruitment'],
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_actions_server.xml',
+        'data/ir_cron.xml',
         'views/hr_recruit_views.xml',
         'views/menu.xml',
     ],
@@ -2,4 +2,5 @@
 # from . import department_analysis_history
 from . import recruit_history
 from . import recruit_pred
-
+from . import recruit_refresh
+from . import recruit_feature_store
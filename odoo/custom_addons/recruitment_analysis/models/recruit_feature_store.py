@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import logging
+
+import requests
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+# Schéma des features de prévision : même liste que recrutement_api/model/features.txt
+# (hors clés annee / quarter_num / department). Incrémenter la version à chaque changement.
+FEATURE_SCHEMA_VERSION = 1
+BASE_METRICS = [
+    'departs_confirmes',
+    'candidats_en_cours',
+    'postes_ouverts_actuels',
+    'effectif_actuel',
+    'turnover_month_pct',
+]
+FEATURE_NAMES = (
+    BASE_METRICS
+    + [f"{m}_rolling_mean" for m in BASE_METRICS]
+    + [f"{m}_lag_{i}" for m in BASE_METRICS for i in range(1, 5)]
+)
+
+API_BATCH_URL = "http://fastapirecrut:8050/predict/batch"
+TIMEOUT = 30  # seconds
+
+
+class HrRecruitFeatureStore(models.Model):
+    _name = "hr.recruit.feature_store"
+    _description = "Recruitment Forecast Feature Store"
+    _order = "annee desc, quarter_num desc, department_id"
+
+    department_id = fields.Many2one('hr.department', string="Department", required=True, index=True,
+                                    ondelete='cascade')
+    annee = fields.Integer(string="Year", required=True, index=True)
+    quarter_num = fields.Integer(string="Quarter", required=True, index=True)
+    schema_version = fields.Integer(string="Schema Version", required=True, default=FEATURE_SCHEMA_VERSION)
+    # Vecteur compact {feature: valeur} dans l'ordre de FEATURE_NAMES
+    features = fields.Json(string="Features", required=True)
+    computed_at = fields.Datetime(string="Computed At")
+
+    prediction = fields.Integer(string="Predicted Need (Q+1)")
+    predicted_at = fields.Datetime(string="Predicted At")
+
+    _sql_constraints = [
+        ('feature_key_uniq', 'unique(department_id, annee, quarter_num)',
+         'One feature row per department and quarter.'),
+    ]
+
+    # ---------------------------
+    # Écriture
+    # ---------------------------
+    @api.model
+    def _upsert(self, rows):
+        """
+        Upsert en bloc. rows : [{'department_id', 'annee', 'quarter_num', 'features'}].
+        Une recherche pour les clés existantes, un create() multi pour les nouvelles,
+        un write() uniquement pour les lignes dont le vecteur ou la version change.
+        """
+        if not rows:
+            return self.browse()
+        now = fields.Datetime.now()
+        keys = {(r['department_id'], r['annee'], r['quarter_num']) for r in rows}
+        existing = {
+            (rec.department_id.id, rec.annee, rec.quarter_num): rec
+            for rec in self.search([
+                ('department_id', 'in', list({k[0] for k in keys})),
+                ('annee', 'in', list({k[1] for k in keys})),
+            ])
+        }
+        to_create = []
+        result_ids = []
+        for row in rows:
+            key = (row['department_id'], row['annee'], row['quarter_num'])
+            rec = existing.get(key)
+            if rec is None:
+                to_create.append(dict(row, schema_version=FEATURE_SCHEMA_VERSION, computed_at=now))
+                continue
+            if rec.features != row['features'] or rec.schema_version != FEATURE_SCHEMA_VERSION:
+                rec.write({'features': row['features'], 'schema_version': FEATURE_SCHEMA_VERSION, 'computed_at': now})
+            result_ids.append(rec.id)
+        if to_create:
+            result_ids += self.create(to_create).ids
+        return self.browse(result_ids)
+
+    @api.model
+    def upsert_from_quarters(self, quarters):
+        """Matérialise les features de hr.recruit.quarter_history (une ligne par département × trimestre)."""
+        rows = [{
+            'department_id': q.department_id.id,
+            'annee': q.annee,
+            'quarter_num': q.quarter_num,
+            'features': {name: float(q[name] or 0.0) for name in FEATURE_NAMES},
+        } for q in quarters if q.department_id and q.quarter_num in (1, 2, 3, 4)]
+        return self._upsert(rows)
+
+    # ---------------------------
+    # Lecture / export
+    # ---------------------------
+    def _to_payloads(self):
+        """Lignes prêtes pour /predict/batch (colonnes de features.txt), dans l'ordre du recordset."""
+        stale = self.filtered(lambda r: r.schema_version != FEATURE_SCHEMA_VERSION)
+        if stale:
+            raise UserError(_("%s feature row(s) use an outdated schema: recompute the quarters first.") % len(stale))
+        payloads = []
+        for rec in self:
+            payload = {
+                'annee': rec.annee,
+                'quarter_num': rec.quarter_num,
+                'department': rec.department_id.name or '',
+            }
+            features = rec.features or {}
+            for name in FEATURE_NAMES:
+                payload[name] = features.get(name, 0.0)
+            payloads.append(payload)
+        return payloads
+
+    @api.model
+    def _find(self, keys):
+        """Lignes du store (schéma courant) pour des clés (department_id, annee, quarter_num) : une seule lecture."""
+        if not keys:
+            return {}
+        return {
+            (rec.department_id.id, rec.annee, rec.quarter_num): rec
+            for rec in self.search([
+                ('department_id', 'in', list({k[0] for k in keys})),
+                ('annee', 'in', list({k[1] for k in keys})),
+                ('schema_version', '=', FEATURE_SCHEMA_VERSION),
+            ])
+            if (rec.department_id.id, rec.annee, rec.quarter_num) in keys
+        }
+
+    def _predict_batch(self):
+        """Un seul POST /predict/batch pour tout le recordset ; retourne {id: prédiction}."""
+        if not self:
+            return {}
+        resp = requests.post(API_BATCH_URL, json={'rows': self._to_payloads()}, timeout=TIMEOUT)
+        resp.raise_for_status()
+        results = resp.json().get('results') or []
+        if len(results) != len(self):
+            raise ValueError("Nombre de prédictions inattendu")
+        records = list(self)
+        return {records[item['index']].id: item.get('prediction') or 0 for item in results}
+
+    def action_predict(self):
+        """Prédit toutes les lignes sélectionnées en un appel et écrit les résultats groupés par valeur."""
+        try:
+            predictions = self._predict_batch()
+        except Exception:
+            _logger.exception("Feature store batch prediction failed")
+            raise UserError(_("La prédiction a échoué."))
+        now = fields.Datetime.now()
+        by_value = {}
+        for rec_id, pred in predictions.items():
+            by_value.setdefault(pred, []).append(rec_id)
+        for pred, ids in by_value.items():
+            self.browse(ids).write({'prediction': pred, 'predicted_at': now})
+        return True
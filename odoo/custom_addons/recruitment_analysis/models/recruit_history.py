@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 import calendar
-from datetime import date
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time
 
-from odoo import models, fields, api
+from odoo import models, fields, api, _
+from odoo.osv import expression
+
+_logger = logging.getLogger(__name__)
 
 
 class HrRecruitMonthHistory(models.Model):
@@ -45,6 +50,8 @@ class HrRecruitMonthHistory(models.Model):
     )
 
     computed_at = fields.Datetime(string="Computed At")
+    # Cellule à recalculer (contrats / candidats / postes modifiés depuis le dernier calcul)
+    needs_refresh = fields.Boolean(string="Needs Refresh", default=False, index=True, copy=False)
 
     # ----------------------------
     # Période (bornes du mois)
@@ -81,61 +88,224 @@ class HrRecruitMonthHistory(models.Model):
     # ----------------------------
     # KPI mensuels (compute unique)
     # ----------------------------
+    MONTH_METRIC_FIELDS = [
+        'headcount_start',
+        'headcount_end',
+        'departures_month',
+        'applicants_in_progress_month',
+        'postes_ouverts_actuels',
+    ]
+
     @api.depends('department_id', 'date_start', 'date_end')
     def _compute_month_metrics(self):
+        # Calcul ensembliste : quelques requêtes pour tout le recordset (départements × mois)
+        metrics = self._bulk_month_metrics()
+        now = fields.Datetime.now()
+        for rec in self:
+            for fname, value in metrics[rec.id].items():
+                rec[fname] = value
+            rec.computed_at = now
+
+    def _month_metrics_per_record(self):
+        """Chemin de référence (un enregistrement) : mêmes KPI avec search_count, utilisé pour la vérification."""
+        self.ensure_one()
         Contract = self.env['hr.contract']
         Applicant = self.env['hr.applicant']
         Job = self.env['hr.job']
-
-        for rec in self:
-            dep = rec.department_id
+        dep = self.department_id
+        ds, de = self.date_start, self.date_end
+        if not (dep and ds and de):
+            return dict.fromkeys(self.MONTH_METRIC_FIELDS, 0)
+
+        # 1) Effectif début & fin de mois
+        ## Compte des contrats du département actifs le jour `ds` (début de mois) :
+        headcount_start = Contract.search_count([
+            ('employee_id.department_id', '=', dep.id),
+            ('date_start', '<=', ds),
+            '|', ('date_end', '=', False), ('date_end', '>=', ds),
+        ])
+        # Compte des contrats du département actifs le jour `de` (fin de mois) :
+        headcount_end = Contract.search_count([
+            ('employee_id.department_id', '=', dep.id),
+            ('date_start', '<=', de),
+            '|', ('date_end', '=', False), ('date_end', '>=', de),
+        ])
+
+        # 2) Départs du mois = nb de contrats dont date_end ∈ [ds, de]
+        departures = Contract.search_count([
+            ('employee_id.department_id', '=', dep.id),
+            ('date_end', '>=', ds),
+            ('date_end', '<=', de),
+        ])
+
+        # 3) Candidats "en cours"
+        # commencé avant fin de mois et pas encore clôturé  ou clôturé après début de mois
+        applicants = Applicant.search_count([
+            ('job_id.department_id', '=', dep.id),
+            ('create_date', '<', de),
+            '|', ('date_closed', '=', False),
+                 ('date_closed', '>=', ds),
+        ])
+
+        # 4) Postes ouverts
+        jobs = Job.search([('department_id', '=', dep.id), ('active', '=', True)])
+        return {
+            'headcount_start': headcount_start,
+            'headcount_end': headcount_end,
+            'departures_month': departures,
+            'applicants_in_progress_month': applicants,
+            'postes_ouverts_actuels': sum((job.no_of_recruitment or 0) for job in jobs),
+        }
+
+    def _bulk_month_metrics(self):
+        """
+        KPI de tout le recordset en une requête par table (contrats, candidats, postes),
+        puis comptage en mémoire par (département, mois).
+        Mêmes règles que _month_metrics_per_record (domaines ORM : règles d'accès et archivage respectés) ;
+        les bornes date des champs datetime sont converties à 00:00:00 comme le fait l'ORM.
+        Retourne {id: {champ: valeur}}.
+        """
+        result = {rec.id: dict.fromkeys(self.MONTH_METRIC_FIELDS, 0) for rec in self}
+        valid = self.filtered(lambda r: r.department_id and r.date_start and r.date_end)
+        if not valid:
+            return result
+
+        dep_ids = valid.department_id.ids
+        min_ds = min(valid.mapped('date_start'))
+        max_de = max(valid.mapped('date_end'))
+
+        # Contrats : (département, début, fin) pour tous les départements concernés
+        contracts_by_dep = defaultdict(list)
+        contracts = self.env['hr.contract'].search([
+            ('employee_id.department_id', 'in', dep_ids),
+            '|', ('date_end', '=', False), ('date_end', '>=', min_ds),
+        ])
+        for c in contracts:
+            contracts_by_dep[c.employee_id.department_id.id].append((c.date_start, c.date_end))
+
+        # Candidats : (département, création, clôture)
+        applicants_by_dep = defaultdict(list)
+        applicants = self.env['hr.applicant'].search([
+            ('job_id.department_id', 'in', dep_ids),
+            ('create_date', '<', max_de),
+            '|', ('date_closed', '=', False), ('date_closed', '>=', min_ds),
+        ])
+        for a in applicants:
+            applicants_by_dep[a.job_id.department_id.id].append((a.create_date, a.date_closed))
+
+        # Postes ouverts : somme par département (ne dépend pas du mois)
+        open_positions = {
+            dep.id: int(total or 0)
+            for dep, total in self.env['hr.job']._read_group(
+                [('department_id', 'in', dep_ids), ('active', '=', True)],
+                ['department_id'], ['no_of_recruitment:sum'],
+            )
+        }
+
+        for rec in valid:
+            dep_id = rec.department_id.id
             ds, de = rec.date_start, rec.date_end
+            ds_dt, de_dt = datetime.combine(ds, time.min), datetime.combine(de, time.min)
+            vals = result[rec.id]
+            for start, end in contracts_by_dep.get(dep_id, ()):
+                if start and start <= ds and (not end or end >= ds):
+                    vals['headcount_start'] += 1
+                if start and start <= de and (not end or end >= de):
+                    vals['headcount_end'] += 1
+                if end and ds <= end <= de:
+                    vals['departures_month'] += 1
+            for created, closed in applicants_by_dep.get(dep_id, ()):
+                if created and created < de_dt and (not closed or closed >= ds_dt):
+                    vals['applicants_in_progress_month'] += 1
+            vals['postes_ouverts_actuels'] = open_positions.get(dep_id, 0)
+        return result
+
+    def action_recompute_metrics(self):
+        """Recalcule en bloc les KPI stockés du recordset (ex. reconstruction de l'historique)."""
+        for fname in self.MONTH_METRIC_FIELDS:
+            self.env.add_to_compute(self._fields[fname], self)
+        self.flush_recordset()
+        self.filtered('needs_refresh').write({'needs_refresh': False})
+        return True
 
-            # initialisation
-            rec.headcount_start = 0
-            rec.headcount_end = 0
-            rec.departures_month = 0
-            rec.applicants_in_progress_month = 0
-            rec.postes_ouverts_actuels = 0
-
-
-
-            # 1) Effectif début & fin de mois
-            ## Compte des contrats du département actifs le jour `ds` (début de mois) :
-            rec.headcount_start = Contract.search_count([
-                ('employee_id.department_id', '=', dep.id),
-                ('date_start', '<=', ds),
-                '|', ('date_end', '=', False), ('date_end', '>=', ds),
-            ])
-            # Compte des contrats du département actifs le jour `de` (fin de mois) :
-            rec.headcount_end = Contract.search_count([
-                ('employee_id.department_id', '=', dep.id),
-                ('date_start', '<=', de),
-                '|', ('date_end', '=', False), ('date_end', '>=', de),
-            ])
-
-            # 2) Départs du mois = nb de contrats dont date_end ∈ [ds, de]
-            rec.departures_month = Contract.search_count([
-                ('employee_id.department_id', '=', dep.id),
-                ('date_end', '>=', ds),
-                ('date_end', '<=', de),
-            ])
-
-            # 3) Candidats "en cours"
-            # commencé avant fin de mois et pas encore clôturé  ou clôturé après début de mois
-
-            rec.applicants_in_progress_month = Applicant.search_count([
-                ('job_id.department_id', '=', dep.id),
-                ('create_date', '<', de),
-                '|', ('date_closed', '=', False),
-                     ('date_closed', '>=', ds),
-            ])
-
-            # 4) Postes ouverts
-            jobs = Job.search([('department_id', '=', dep.id), ('active', '=', True)])
-            rec.postes_ouverts_actuels = sum((job.no_of_recruitment or 0) for job in jobs)
-
-            rec.computed_at = fields.Datetime.now()
+    # ----------------------------
+    # Rafraîchissement incrémental
+    # ----------------------------
+    @api.model
+    def _mark_dirty(self, spans):
+        """
+        Marque à recalculer les mois des départements touchés.
+        spans : [(department_id, date_from, date_to)] ; None = borne ouverte.
+        Les intervalles d'un même département sont fusionnés (une seule condition par département).
+        """
+        merged = {}
+        for dep_id, date_from, date_to in spans:
+            if not dep_id:
+                continue
+            if dep_id not in merged:
+                merged[dep_id] = [date_from, date_to]
+                continue
+            cur = merged[dep_id]
+            cur[0] = None if cur[0] is None or date_from is None else min(cur[0], date_from)
+            cur[1] = None if cur[1] is None or date_to is None else max(cur[1], date_to)
+        if not merged:
+            return
+        domains = []
+        for dep_id, (date_from, date_to) in merged.items():
+            domain = [('department_id', '=', dep_id)]
+            if date_from:
+                domain.append(('date_end', '>=', date_from))
+            if date_to:
+                domain.append(('date_start', '<=', date_to))
+            domains.append(domain)
+        cells = self.sudo().search(expression.AND([
+            [('needs_refresh', '=', False)], expression.OR(domains),
+        ]))
+        if cells:
+            cells.write({'needs_refresh': True})
+
+    @api.model
+    def _cron_refresh_dirty_months(self):
+        """Recalcule en bloc les cellules marquées, par lots avec commit par lot."""
+        batch_size = int(self.env['ir.config_parameter'].sudo().get_param(
+            'recruitment_analysis.refresh_batch_size', 2000))
+        while True:
+            cells = self.search([('needs_refresh', '=', True)], limit=batch_size)
+            if not cells:
+                break
+            cells.action_recompute_metrics()
+            self.env.cr.commit()
+            _logger.info("Month history: %s dirty cell(s) recomputed", len(cells))
+
+    def _check_bulk_month_metrics(self):
+        """
+        Vérification de non-régression : compare le calcul ensembliste au chemin par enregistrement.
+        Retourne la liste des écarts [(id, champ, bulk, per_record)] (vide si identiques).
+        """
+        bulk = self._bulk_month_metrics()
+        mismatches = []
+        for rec in self:
+            reference = rec._month_metrics_per_record()
+            for fname in self.MONTH_METRIC_FIELDS:
+                if bulk[rec.id][fname] != reference[fname]:
+                    mismatches.append((rec.id, fname, bulk[rec.id][fname], reference[fname]))
+        if mismatches:
+            _logger.warning("Month history bulk KPIs differ from per-record path: %s", mismatches[:20])
+        return mismatches
+
+    def action_check_month_metrics(self):
+        """Action serveur : lance la vérification et affiche le résultat."""
+        mismatches = self._check_bulk_month_metrics()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("KPI check"),
+                'message': _("%(n)s month(s) checked, %(m)s difference(s).", n=len(self), m=len(mismatches)),
+                'type': 'warning' if mismatches else 'success',
+                'sticky': bool(mismatches),
+            },
+        }
 
 
 class HrRecruitQuarterHistory(models.Model):
@@ -251,48 +421,78 @@ class HrRecruitQuarterHistory(models.Model):
         """Moyenne trimestrielle simple : somme / 3 mois."""
         return self._sum_months(months_recs, field_name) / 3.0
 
+    # métriques trimestrielles "base"
+    BASE_METRICS = [
+        'departs_confirmes',
+        'candidats_en_cours',
+        'postes_ouverts_actuels',
+        'effectif_actuel',
+        'turnover_month_pct',
+    ]
+
     def action_compute_quarter(self):
         """
         Cumule les 3 mois de hr.recruit.month_history :
           - Base Q : départs = total ; autres indicateurs = moyenne des 3 mois
           - Lags Q-1..Q-4 : valeurs des 4 trimestres précédents
           - Rolling means : moyenne calculée sur les 4 trimestres existants
+
+        Calcul ensembliste : une requête pour les mois et une pour les trimestres précédents de tout
+        le recordset, calcul en mémoire, puis un seul write() par enregistrement.
+        Les trimestres précédents présents dans le recordset utilisent leurs valeurs fraîchement calculées.
         """
+        if not self:
+            return True
         Month = self.env['hr.recruit.month_history']
         QHist = self.env['hr.recruit.quarter_history']
+        base_metrics = self.BASE_METRICS
+
+        dep_ids = self.department_id.ids
+        years = set(self.mapped('annee'))
+
+        # 1) Tous les mois utiles en une requête, regroupés par (département, année, trimestre)
+        months_by_quarter = defaultdict(list)
+        month_fields = ['department_id', 'year', 'month', 'departures_month', 'applicants_in_progress_month',
+                        'postes_ouverts_actuels', 'headcount_mean', 'turnover_month_pct']
+        for m in Month.search_fetch([
+            ('department_id', 'in', dep_ids),
+            ('year', 'in', list(years)),
+        ], month_fields, order="year, month"):
+            if 1 <= m.month <= 12:
+                months_by_quarter[(m.department_id.id, m.year, (m.month - 1) // 3 + 1)].append(m)
+
+        # 2) Base Q de chaque enregistrement (valeurs converties comme à l'écriture : Integer tronqué)
+        base_vals = {}
+        for rec in self:
+            months_recs = months_by_quarter.get((rec.department_id.id, rec.annee, rec.quarter_num), [])
+            raw = {
+                'departs_confirmes': self._sum_months(months_recs, 'departures_month'),
+                'candidats_en_cours': self._avg_months(months_recs, 'applicants_in_progress_month'),
+                'postes_ouverts_actuels': self._avg_months(months_recs, 'postes_ouverts_actuels'),
+                'effectif_actuel': self._avg_months(months_recs, 'headcount_mean'),
+                'turnover_month_pct': self._avg_months(months_recs, 'turnover_month_pct'),
+            }
+            base_vals[rec.id] = {m: self._fields[m].convert_to_cache(v, rec) for m, v in raw.items()}
+
+        # 3) Trimestres existants (année courante et précédente) en une requête ;
+        #    le recordset courant prime avec ses valeurs fraîches
+        quarter_values = {}
+        for h in QHist.search_fetch([
+            ('department_id', 'in', dep_ids),
+            ('annee', 'in', list(years | {y - 1 for y in years})),
+        ], ['department_id', 'annee', 'quarter_num'] + base_metrics):
+            quarter_values.setdefault(
+                (h.department_id.id, h.annee, h.quarter_num),
+                {m: float(h[m] or 0.0) for m in base_metrics},
+            )
+        for rec in self:
+            quarter_values[(rec.department_id.id, rec.annee, rec.quarter_num)] = {
+                m: float(v or 0.0) for m, v in base_vals[rec.id].items()
+            }
 
-        # métriques trimestrielles "base"
-        base_metrics = [
-            'departs_confirmes',
-            'candidats_en_cours',
-            'postes_ouverts_actuels',
-            'effectif_actuel',
-            'turnover_month_pct',
-        ]
-
+        # 4) Lags Q-1..Q-4 et moyennes glissantes en mémoire, un write() par enregistrement
+        now = fields.Datetime.now()
         for rec in self:
-            # ==========
-            # 1) les mois du trimestre  # exple months =(1, 2, 3)
-            # ==========
-            months = self.QUARTER_MONTHS[rec.quarter_num]
-
-            # 2) chercher les lignes mensuelles du trimestre
-            months_recs = Month.search([
-                ('department_id', '=', rec.department_id.id),
-                ('year', '=', rec.annee),
-                ('month', 'in', months),
-            ], order="year, month")
-
-            # 3) Base Q
-            rec.departs_confirmes = self._sum_months(months_recs, 'departures_month')
-            rec.candidats_en_cours = self._avg_months(months_recs, 'applicants_in_progress_month')
-            rec.postes_ouverts_actuels = self._avg_months(months_recs, 'postes_ouverts_actuels')
-            rec.effectif_actuel = self._avg_months(months_recs, 'headcount_mean')
-            rec.turnover_month_pct = self._avg_months(months_recs, 'turnover_month_pct')
-            # ==========
-            # 4) Lags Q-1..Q-4 :construire la liste (quarter,year) contiendra les 4 trimestres précédents
-
-            # ==========
             # si (q,y)=(3, 2025) alors prev_list: [(2, 2025), (1, 2025), (4, 2024), (3, 2024)]
             prev_list = []
             q = int(rec.quarter_num)
@@ -304,45 +504,19 @@ class HrRecruitQuarterHistory(models.Model):
                     q = 4
                     y -= 1
                 prev_list.append((q, y))
+            prev_vals = [quarter_values.get((rec.department_id.id, py, pq)) for pq, py in prev_list]
 
-            # Récupérer les lignes correspondantes depuis hr.recruit.quarter_history
-            prev_recs = []
-            for pq, py in prev_list:
-                h = QHist.search([
-                    ('department_id', '=', rec.department_id.id),
-                    ('annee', '=', py),
-                    ('quarter_num', '=', pq),
-                ], limit=1)
-                prev_recs.append(h if h else None)
-
-            # Remplir les lags via boucles
-            # enumerate(prev_recs, start=1) parcourt la liste prev_recs en donnant à la fois l’index (1,2,3,4)et l’élément.
-
-            for idx, h in enumerate(prev_recs, start=1):
-
+            vals = dict(base_vals[rec.id])
+            for idx, h in enumerate(prev_vals, start=1):
                 for mname in base_metrics:
-                    if h and h.id:
-                        val = float(getattr(h, mname, 0.0) or 0.0)
-                    else:
-                        val = 0.0
-                    setattr(rec, f"{mname}_lag_{idx}", val)
-            # donc _lag_1 à _lag_4), et h pour lire la valeur de la métrique sur l’enregistrement trouvé.
-
-            # 5) Rolling means = moyenne des Q existants parmi Q-1..Q-4
+                    vals[f"{mname}_lag_{idx}"] = h[mname] if h else 0.0
+            # Rolling means = moyenne des Q existants parmi Q-1..Q-4
             for mname in base_metrics:
-                vals = []
-                for h in prev_recs:
-                    if h and h.id:
-                        vals.append(float(getattr(h, mname, 0.0) or 0.0))
-                if vals:
-                    avg_val = sum(vals) / float(len(vals))
-                else:
-                    avg_val = 0.0
-                setattr(rec, f"{mname}_rolling_mean", avg_val)
-                #On écrit sur rec le champ de moyenne glissante de la métrique (ex. headcount_end_rolling_mean) avec la moyenne calculée.
-
-            # 6) Timestamp
-            rec.computed_at = fields.Datetime.now()
+                existing = [h[mname] for h in prev_vals if h]
+                vals[f"{mname}_rolling_mean"] = sum(existing) / float(len(existing)) if existing else 0.0
+            vals['computed_at'] = now
+            rec.write(vals)
 
+        # Matérialise les vecteurs de features (upsert en bloc)
+        self.env['hr.recruit.feature_store'].upsert_from_quarters(self)
         return True
-         #recs = “records” enregistrements ,prev "previous" précédent.
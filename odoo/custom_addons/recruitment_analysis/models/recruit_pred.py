@@ -7,6 +7,8 @@ import requests
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
 
+from .recruit_feature_store import API_BATCH_URL, FEATURE_NAMES
+
 _logger = logging.getLogger(__name__)
 
 API_URL = "http://fastapirecrut:8050/predict"
@@ -130,6 +132,7 @@ class HrRecruitAnalysis(models.Model):
         2) copie les features ici "_copy_from_quarter"
         3) passe en 'computed'."""
         QHist = self.env['hr.recruit.quarter_history']
+        quarter_by_rec = {}
         for r in self:
             if not (r.department_id and r.annee and r.quarter_num in (1, 2, 3, 4)):
                 raise UserError(_("Please fill Department, Year and Quarter."))
@@ -145,19 +148,29 @@ class HrRecruitAnalysis(models.Model):
                     'annee': r.annee,
                     'quarter_num': r.quarter_num,
                 })
+            quarter_by_rec[r.id] = q
 
-            # Agrège depuis le mensuel vers le trimestriel
-            q.action_compute_quarter()
-
-            # Copie les features du trimestriel vers l'analyse
-            r._copy_from_quarter(q)
+        # Agrège depuis le mensuel vers le trimestriel (un seul calcul ensembliste)
+        QHist.browse([q.id for q in quarter_by_rec.values()]).action_compute_quarter()
 
-            # Écritures groupées
-            r.write({
+        # Features lues en une fois depuis le feature store (alimenté par action_compute_quarter)
+        store = self.env['hr.recruit.feature_store']._find(
+            {(q.department_id.id, q.annee, q.quarter_num) for q in quarter_by_rec.values()})
+        now = fields.Datetime.now()
+        for r in self:
+            q = quarter_by_rec[r.id]
+            row = store.get((q.department_id.id, q.annee, q.quarter_num))
+            vals = {
                 'history_q_id': q.id,
-                'computed_at': fields.Datetime.now(),
+                'computed_at': now,
                 'state': 'computed',
-            })
+            }
+            if row:
+                vals.update({name: (row.features or {}).get(name, 0.0) for name in FEATURE_NAMES})
+            else:
+                # Copie les features du trimestriel vers l'analyse
+                r._copy_from_quarter(q)
+            r.write(vals)
         return True
 
     def _build_payload(self):
@@ -178,18 +191,57 @@ class HrRecruitAnalysis(models.Model):
                 payload[f"{m}_lag_{i}"] = getattr(self, f"{m}_lag_{i}") or 0.0
         return payload
 
+    def _features_match_store(self):
+        """
+        Vrai si les features de l'analyse sont celles écrites par action_compute_quarter :
+        état 'computed', trimestre lié de même clé et aucune modification depuis le calcul
+        (write_date, horodatage de transaction, n'est pas postérieur à computed_at).
+        """
+        self.ensure_one()
+        q = self.history_q_id
+        return bool(
+            self.state == 'computed' and q and self.computed_at and self.write_date
+            and (q.department_id, q.annee, q.quarter_num) == (self.department_id, self.annee, self.quarter_num)
+            and self.write_date <= self.computed_at
+        )
+
     def action_predict(self):
-        """Appel API -> prediction_value ; passe en 'predicted' ou 'error' (simple)."""
-        for r in self:
-            try:
-                resp = requests.post(API_URL, json=r._build_payload(), timeout=TIMEOUT)
-                pred = (resp.json().get('prediction') if resp else 0) or 0.0
-                r.prediction_value = pred
-                r.predicted_at = fields.Datetime.now()
-                r.state = 'predicted'
-            except Exception:
-                r.state = 'error'
-                raise UserError(_("La prédiction a échoué."))
+        """Appel API batch (un seul POST pour tout le recordset) -> prediction_value ;
+        passe en 'predicted' ou 'error' (simple)."""
+        if not self:
+            return True
+        records = list(self)
+        # Le feature store n'est utilisé que pour une analyse encore identique à son calcul :
+        # sinon les champs affichés (modifiés, copiés...) sont la seule source de vérité
+        from_store = [r for r in records if r._features_match_store()]
+        store = self.env['hr.recruit.feature_store']._find(
+            {(r.department_id.id, r.annee, r.quarter_num) for r in from_store})
+        rows = []
+        for r in records:
+            row = store.get((r.department_id.id, r.annee, r.quarter_num)) if r in from_store else None
+            rows.append(row._to_payloads()[0] if row else r._build_payload())
+        try:
+            resp = requests.post(API_BATCH_URL, json={'rows': rows}, timeout=TIMEOUT)
+            resp.raise_for_status()
+            results = resp.json().get('results') or []
+            if len(results) != len(records):
+                raise ValueError("Nombre de prédictions inattendu")
+        except Exception:
+            _logger.exception("Recruitment batch prediction failed")
+            self.write({'state': 'error'})
+            raise UserError(_("La prédiction a échoué."))
+
+        # Écritures groupées par valeur prédite
+        now = fields.Datetime.now()
+        by_value = {}
+        for item in results:
+            by_value.setdefault(item.get('prediction') or 0, []).append(records[item['index']].id)
+        for pred, ids in by_value.items():
+            self.browse(ids).write({
+                'prediction_value': pred,
+                'predicted_at': now,
+                'state': 'predicted',
+            })
         return True
 
     def action_save(self):
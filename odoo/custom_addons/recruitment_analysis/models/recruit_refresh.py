@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Rafraîchissement incrémental de hr.recruit.month_history :
+les écritures sur les contrats, employés (mutations), candidats et postes marquent « à recalculer » uniquement
+les cellules (département, mois) concernées ; le cron recalcule ces cellules en bloc.
+"""
+from odoo import models, api
+
+
+def _to_date(value):
+    # create_date / date_closed sont des Datetime : seule la date compte pour le mois
+    return value.date() if hasattr(value, 'date') else value
+
+
+class HrContract(models.Model):
+    _inherit = 'hr.contract'
+
+    # Champs qui influencent effectifs et départs
+    _RECRUIT_HISTORY_FIELDS = {'employee_id', 'date_start', 'date_end', 'active'}
+
+    def _recruit_history_spans(self):
+        # Un contrat compte dans les mois qui chevauchent [date_start, date_end]
+        return [
+            (c.employee_id.department_id.id, c.date_start, c.date_end)
+            for c in self.with_context(active_test=False)
+            if c.employee_id.department_id and c.date_start
+        ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['hr.recruit.month_history']._mark_dirty(records._recruit_history_spans())
+        return records
+
+    def write(self, vals):
+        if not self._RECRUIT_HISTORY_FIELDS.intersection(vals):
+            return super().write(vals)
+        spans = self._recruit_history_spans()
+        res = super().write(vals)
+        self.env['hr.recruit.month_history']._mark_dirty(spans + self._recruit_history_spans())
+        return res
+
+    def unlink(self):
+        spans = self._recruit_history_spans()
+        res = super().unlink()
+        self.env['hr.recruit.month_history']._mark_dirty(spans)
+        return res
+
+
+class HrEmployee(models.Model):
+    _inherit = 'hr.employee'
+
+    # Une mutation déplace les contrats de l'employé vers un autre département
+    _RECRUIT_HISTORY_FIELDS = {'department_id'}
+
+    def _recruit_history_spans(self):
+        return self.with_context(active_test=False).contract_ids._recruit_history_spans()
+
+    def write(self, vals):
+        if not self._RECRUIT_HISTORY_FIELDS.intersection(vals):
+            return super().write(vals)
+        spans = self._recruit_history_spans()
+        res = super().write(vals)
+        self.env['hr.recruit.month_history']._mark_dirty(spans + self._recruit_history_spans())
+        return res
+
+
+class HrApplicant(models.Model):
+    _inherit = 'hr.applicant'
+
+    # Champs qui influencent les candidats « en cours » (date_closed est recalculé depuis
+    # stage_id sans passer par write() : le changement d'étape doit aussi marquer les cellules)
+    _RECRUIT_HISTORY_FIELDS = {'job_id', 'stage_id', 'date_closed', 'active'}
+
+    def _recruit_history_spans(self):
+        # Un candidat est « en cours » de sa création à sa clôture
+        return [
+            (a.job_id.department_id.id, _to_date(a.create_date), _to_date(a.date_closed) or None)
+            for a in self.with_context(active_test=False)
+            if a.job_id.department_id and a.create_date
+        ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['hr.recruit.month_history']._mark_dirty(records._recruit_history_spans())
+        return records
+
+    def write(self, vals):
+        if not self._RECRUIT_HISTORY_FIELDS.intersection(vals):
+            return super().write(vals)
+        spans = self._recruit_history_spans()
+        res = super().write(vals)
+        self.env['hr.recruit.month_history']._mark_dirty(spans + self._recruit_history_spans())
+        return res
+
+    def unlink(self):
+        spans = self._recruit_history_spans()
+        res = super().unlink()
+        self.env['hr.recruit.month_history']._mark_dirty(spans)
+        return res
+
+
+class HrJob(models.Model):
+    _inherit = 'hr.job'
+
+    # Champs qui influencent les postes ouverts
+    _RECRUIT_HISTORY_FIELDS = {'department_id', 'no_of_recruitment', 'active'}
+
+    def _recruit_history_spans(self):
+        # Les postes ouverts ne dépendent pas du mois : tous les mois du département
+        return [
+            (j.department_id.id, None, None)
+            for j in self.with_context(active_test=False)
+            if j.department_id
+        ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['hr.recruit.month_history']._mark_dirty(records._recruit_history_spans())
+        return records
+
+    def write(self, vals):
+        if not self._RECRUIT_HISTORY_FIELDS.intersection(vals):
+            return super().write(vals)
+        spans = self._recruit_history_spans()
+        res = super().write(vals)
+        self.env['hr.recruit.month_history']._mark_dirty(spans + self._recruit_history_spans())
+        return res
+
+    def unlink(self):
+        spans = self._recruit_history_spans()
+        res = super().unlink()
+        self.env['hr.recruit.month_history']._mark_dirty(spans)
+        return res
@@ -13,12 +13,17 @@
         'security/groups.xml',
         'security/record_rules.xml',
         'security/ir.model.access.csv',
+        'data/ir_config_parameter.xml',
         'data/ir_actions_server.xml',
+        'data/ir_cron.xml',
         'data/hr_demo_employees.xml',
         'data/survey_question_category_data.xml',
         'data/employee_satisfaction_survey.xml',
         'views/hr_employee_views.xml',
         'views/survey_question_views.xml',
+        'views/risk_prediction_job_views.xml',
+        'views/risk_evaluation_rollup_views.xml',
+        'views/risk_feature_snapshot_views.xml',
     ],
     'installable': True,
     'application': False,
@@ -5,3 +5,7 @@ from . import survey_question_category
 from . import survey_user_input
 from . import historique_evaluation
 
+from . import risk_prediction_job
+from . import risk_rescore_triggers
+from . import risk_evaluation_event
+from . import risk_feature_snapshot
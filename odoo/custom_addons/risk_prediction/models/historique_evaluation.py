@@ -1,9 +1,14 @@
 
-from odoo import models, fields
+from odoo import models, fields, tools
+
+from .risk_evaluation_event import MOTIF_CODES, RISK_CODES, SELECTION_CODES
 
-class HistoricEvaluation(models.Model):
-    _name = 'historique.evaluation'
-    _description = 'Evaluation History'
+
+class HistoricEvaluationLegacy(models.Model):
+    """Lignes écrites avant risk.evaluation.event (table historique d'origine, purgée par la rétention)."""
+    _name = 'historique.evaluation.legacy'
+    _description = 'Evaluation History (legacy rows)'
+    _table = 'historique_evaluation'
 
     name = fields.Char(string="Référence")
     date = fields.Datetime(string="Response Date", readonly=True)
@@ -52,3 +57,59 @@ class HistoricEvaluation(models.Model):
     )
     employee_id = fields.Many2one('hr.employee', string="Employee")
 
+
+# Colonnes décodées depuis risk.evaluation.event : {champ de l'historique: champ codé}
+_EVENT_SELECTIONS = {
+    'job_satis': 'job_satisfaction',
+    'work_life': 'work_life_balance',
+    'performance': 'performance_rating',
+    'leadership_opport': 'leadership_opportunities',
+    'innovation_opport': 'innovation_opportunities',
+    'company_reput': 'company_reputation',
+    'employee_recog': 'employee_recognition',
+}
+
+
+def _sql_array(values):
+    # constantes du module uniquement (pas de saisie utilisateur)
+    return "ARRAY[%s]" % ", ".join("'%s'" % v.replace("'", "''") for v in values)
+
+
+class HistoricEvaluation(models.Model):
+    """
+    Historique des évaluations en lecture seule (vue SQL) : lignes historiques + événements
+    compacts décodés. Les lecteurs de historique.evaluation continuent de recevoir chaque scoring.
+    """
+    _name = 'historique.evaluation'
+    _inherit = 'historique.evaluation.legacy'
+    _description = 'Evaluation History'
+    _table = 'historique_evaluation_all'
+    _auto = False
+    _order = 'date desc, id desc'
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        risks = [r for r, _code in sorted(RISK_CODES.items(), key=lambda item: item[1]) if r != 'undefined']
+        motifs = [m for m, _code in sorted(MOTIF_CODES.items(), key=lambda item: item[1]) if m]
+        decoded = ",\n".join(
+            f"{_sql_array(SELECTION_CODES[source])}[NULLIF(e.{source}_code, 0)] AS {name}"
+            for name, source in _EVENT_SELECTIONS.items())
+        legacy = ", ".join(_EVENT_SELECTIONS)
+        # ids disjoints : pairs pour l'historique, impairs pour les événements
+        self.env.cr.execute(f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                SELECT l.id * 2 AS id, l.name, l.date, l.employee_id, l.pred_risk, {legacy},
+                       l.create_uid, l.create_date, l.write_uid, l.write_date
+                  FROM historique_evaluation l
+                UNION ALL
+                SELECT e.id * 2 + 1 AS id,
+                       'Évaluation IA - ' || to_char(e.date, 'YYYY-MM-DD HH24:MI')
+                           || COALESCE(' | Motif: ' || {_sql_array(motifs)}[NULLIF(e.motif_code, 0)], '') AS name,
+                       e.date, e.employee_id,
+                       COALESCE({_sql_array(risks)}[NULLIF(e.risk_code, 0)], 'undefined') AS pred_risk,
+                       {decoded},
+                       NULL::integer AS create_uid, e.date AS create_date,
+                       NULL::integer AS write_uid, e.date AS write_date
+                  FROM risk_evaluation_event e
+            )
+        """)
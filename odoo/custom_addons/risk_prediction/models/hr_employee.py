@@ -127,6 +127,11 @@ class HrEmployee(models.Model):
     prediction_reason = fields.Char(string="Raison de non-prédiction", readonly=True)
 
     historic_detaill = fields.One2many('historique.evaluation', 'employee_id', string='Historic', invisible="1")
+    risk_event_ids = fields.One2many('risk.evaluation.event', 'employee_id', string='Evaluation Events')
+
+    # File de re-scoring automatique (opt-in) : date du dernier changement d'une donnée d'entrée
+    risk_rescore_requested_at = fields.Datetime(string="Risk Re-scoring Requested", readonly=True,
+                                                index=True, copy=False)
 
     # ==================================================================
     @api.depends('birthday')
@@ -144,33 +149,98 @@ class HrEmployee(models.Model):
             end = rec.contract_id.date_end or today
             rec.years_at_company = relativedelta(end, start).years if start else 0
 
+    # ------------------------------------------------------------------
+    #  Features calculées en bloc (cache par transaction)
+    # ------------------------------------------------------------------
+    RISK_FEATURE_CACHE_KEY = 'risk_prediction.features'
+
+    def _risk_feature_cache(self, name, day):
+        """
+        Cache par transaction : {(nom, jour) -> {clé: valeur}}, vidé par les déclencheurs.
+        cr.cache survit aux commits du curseur (crons committés par lot) : le cache est donc
+        retiré à la fin de la transaction (postcommit / postrollback).
+        """
+        cr = self.env.cr
+        features = cr.cache.get(self.RISK_FEATURE_CACHE_KEY)
+        if features is None:
+            features = cr.cache[self.RISK_FEATURE_CACHE_KEY] = {}
+            cr.postcommit.add(self._invalidate_risk_feature_cache)
+            cr.postrollback.add(self._invalidate_risk_feature_cache)
+        return features.setdefault((name, day), {})
+
+    @api.model
+    def _invalidate_risk_feature_cache(self):
+        self.env.cr.cache.pop(self.RISK_FEATURE_CACHE_KEY, None)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self._invalidate_risk_feature_cache()  # effectif des sociétés
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if 'company_id' in vals or 'active' in vals:
+            self._invalidate_risk_feature_cache()
+        return super().write(vals)
+
+    def unlink(self):
+        self._invalidate_risk_feature_cache()  # effectif des sociétés
+        return super().unlink()
+
+    def _get_company_sizes(self):
+        """{company_id: nb d'employés} pour les sociétés du recordset (un _read_group)."""
+        cache = self._risk_feature_cache('company_size', date.today())
+        missing = [cid for cid in set(self.company_id.ids) if cid not in cache]
+        if missing:
+            cache.update(dict.fromkeys(missing, 0))
+            for company, count in self.env['hr.employee']._read_group(
+                    [('company_id', 'in', missing)], ['company_id'], ['__count']):
+                cache[company.id] = count
+        return cache
+
+    def _get_week_hours(self):
+        """{employee_id: heures de la semaine courante} (une lecture des présences du recordset)."""
+        today = date.today()
+        start_week = datetime.combine(today - timedelta(days=today.weekday()), datetime.min.time())
+        end_week = start_week + timedelta(days=7)
+        cache = self._risk_feature_cache('work_hours_week', start_week.date())
+        missing = [eid for eid in self.ids if eid and eid not in cache]
+        if missing:
+            hrs = dict.fromkeys(missing, 0.0)
+            for att in self.env['hr.attendance'].search_fetch([
+                ('employee_id', 'in', missing),
+                ('check_in', '>=', start_week),
+                ('check_out', '<=', end_week),
+            ], ['employee_id', 'check_in', 'check_out']):
+                hrs[att.employee_id.id] += (att.check_out - att.check_in).total_seconds() / 3600
+            cache.update(hrs)
+        return cache
+
+    def _get_promotion_counts(self):
+        """{employee_id: nb de postes distincts - 1} sur les contrats (un _read_group)."""
+        cache = self._risk_feature_cache('number_of_promotions', date.today())
+        missing = [eid for eid in self.ids if eid and eid not in cache]
+        if missing:
+            jobs = defaultdict(int)
+            for employee, _job, _count in self.env['hr.contract']._read_group(
+                    [('employee_id', 'in', missing), ('job_id', '!=', False)],
+                    ['employee_id', 'job_id'], ['__count']):
+                jobs[employee.id] += 1
+            cache.update({eid: max(jobs[eid] - 1, 0) for eid in missing})
+        return cache
+
     # ------------------------------------------------------------------
     @api.depends('company_id')
     def _compute_company_size(self):
+        sizes = self._get_company_sizes()
         for rec in self:
-            rec.company_size = self.env['hr.employee'].search_count([
-                ('company_id', '=', rec.company_id.id)
-            ]) if rec.company_id else 0
+            rec.company_size = sizes.get(rec.company_id.id, 0) if rec.company_id else 0
 
     # ------------------------------------------------------------------
     @api.depends('attendance_ids.check_in', 'attendance_ids.check_out')
     def _compute_work_hours_week(self):
-        today = date.today()
-        start_week = datetime.combine(today - timedelta(days=today.weekday()), datetime.min.time())
-        end_week = start_week + timedelta(days=7)
-
-        attendances = self.env['hr.attendance'].search([
-            ('check_in', '>=', start_week),
-            ('check_out', '<=', end_week),
-            #('check_out', '!=', False),
-        ])
-
-        hrs = defaultdict(float)
-        for att in attendances:
-            hrs[att.employee_id.id] += (att.check_out - att.check_in).total_seconds() / 3600
-
+        hours = self._get_week_hours()
         for rec in self:
-            h = round(hrs.get(rec.id, 0.0), 2)
+            h = round(hours.get(rec.id, 0.0), 2)
             rec.work_hours_week = h
             rec.overTime = 'yes' if h > 45.0 else 'no'
 
@@ -206,9 +276,14 @@ class HrEmployee(models.Model):
     # ------------------------------------------------------------------
     @api.depends('contract_ids')
     def _compute_number_of_promotions(self):
+        counts = self._get_promotion_counts()
         for rec in self:
-            jobs = [c.job_id.id for c in rec.contract_ids if c.job_id]
-            rec.number_of_promotions = max(len(set(jobs)) - 1, 0)
+            if rec.id:
+                rec.number_of_promotions = counts.get(rec.id, 0)
+            else:
+                # enregistrement non sauvegardé (formulaire) : calcul direct
+                jobs = [c.job_id.id for c in rec.contract_ids if c.job_id]
+                rec.number_of_promotions = max(len(set(jobs)) - 1, 0)
 
     # ------------------------------------------------------------------
     @api.depends('contract_id.wage')
@@ -220,149 +295,284 @@ class HrEmployee(models.Model):
     #  Endpoint FastAPI
     # ------------------------------------------------------------------
 
+    # Paramètres système (Paramètres > Technique > Paramètres système)
+    RISK_API_BATCH_URL_PARAM = 'risk_prediction.api_batch_url'
+    RISK_API_BATCH_SIZE_PARAM = 'risk_prediction.api_batch_size'
+    DEFAULT_RISK_API_BATCH_URL = "http://fastapirisk:8020/predict/batch"
+    DEFAULT_RISK_API_BATCH_SIZE = 500
+    RISK_API_TIMEOUT = 30  # secondes, par lot
+
     def predict_risk_for_employees(self):
         """
-        Appelle le service FastAPI 'http://fastapirisk:8020/predict'
-        et met à jour le champ predicted_risk.
+        Appelle le service FastAPI 'http://fastapirisk:8020/predict/batch'
+        et met à jour le champ predicted_risk de tout le recordset.
         Règle: si A incomplet ou B incomplet -> pas d'appel API, predicted_risk='undefined' + prediction_reason.
         """
-        url = "http://fastapirisk:8020/predict"
-        valid_keys = [k for k, _ in self._fields['predicted_risk'].selection]
+        self._predict_risk_batch()
+        return True
 
-        for rec in self:
-            # --- Groupe A : RH obligatoires ---
-            missing_A = []
-            job_role_val = (getattr(rec, 'job_id', False) and rec.job_id.name) or (
-                        rec.department_id and rec.department_id.name)
-
-            # Numériques/infos RH
-            if not rec.age or rec.age <= 0: missing_A.append('age')
-            if rec.years_at_company is None or rec.years_at_company < 0: missing_A.append('years_at_company')
-            if rec.monthly_income is None or rec.monthly_income <= 0: missing_A.append('monthly_income')
-            if getattr(rec, 'km_home_work', None) is None: missing_A.append('distance_from_home')  # 0 peut être valide
-            if rec.number_of_promotions is None: missing_A.append('number_of_promotions')
-            if rec.children is None: missing_A.append('number_of_dependents')
-
-            # Catégorielles RH
-            if not job_role_val: missing_A.append('job_role')
-            if not rec.job_level: missing_A.append('job_level')
-            if rec.company_size is None: missing_A.append('company_size')
-            if not rec.certificate: missing_A.append('education_level')
-            if not rec.marital: missing_A.append('marital_status')
-            if rec.overTime not in ('yes', 'no'): missing_A.append('overtime')
-            if rec.remote_work not in ('yes', 'no'): missing_A.append('remote_work')
-            if not rec.gender: missing_A.append('gender')
-            if not rec.performance_rating: missing_A.append('performance_rating')
-
-            if missing_A:
-                rec.predicted_risk = 'undefined'
-                rec.prediction_reason = "RH incomplet : " + ", ".join(missing_A)
-                self.env['historique.evaluation'].sudo().create({
-                    'name': f"Évaluation IA - {fields.Datetime.now().strftime('%Y-%m-%d %H:%M')} | Motif: RH incomplet",
-                    'date': fields.Datetime.now(),
-                    'employee_id': rec.id,
-                    'job_satis': rec.job_satisfaction,
-                    'work_life': rec.work_life_balance,
-                    'leadership_opport': rec.leadership_opportunities,
-                    'innovation_opport': rec.innovation_opportunities,
-                    'company_reput': rec.company_reputation,
-                    'employee_recog': rec.employee_recognition,
-                    'performance': rec.performance_rating,
-                    'pred_risk': 'undefined',
+    def _get_risk_api_config(self):
+        """Retourne (url, taille de lot) depuis les paramètres système."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        url = ICP.get_param(self.RISK_API_BATCH_URL_PARAM, self.DEFAULT_RISK_API_BATCH_URL)
+        try:
+            batch_size = int(ICP.get_param(self.RISK_API_BATCH_SIZE_PARAM, self.DEFAULT_RISK_API_BATCH_SIZE))
+        except (TypeError, ValueError):
+            batch_size = self.DEFAULT_RISK_API_BATCH_SIZE
+        return url, max(batch_size, 1)
+
+    def _check_risk_inputs(self):
+        """
+        Vérifie les champs requis pour la prédiction.
+        Retourne (motif, champs manquants) ; motif=False si tout est complet.
+        """
+        self.ensure_one()
+        rec = self
+
+        # --- Groupe A : RH obligatoires ---
+        missing_A = []
+        job_role_val = rec._get_job_role_label()
+
+        # Numériques/infos RH
+        if not rec.age or rec.age <= 0: missing_A.append('age')
+        if rec.years_at_company is None or rec.years_at_company < 0: missing_A.append('years_at_company')
+        if rec.monthly_income is None or rec.monthly_income <= 0: missing_A.append('monthly_income')
+        if getattr(rec, 'km_home_work', None) is None: missing_A.append('distance_from_home')  # 0 peut être valide
+        if rec.number_of_promotions is None: missing_A.append('number_of_promotions')
+        if rec.children is None: missing_A.append('number_of_dependents')
+
+        # Catégorielles RH
+        if not job_role_val: missing_A.append('job_role')
+        if not rec.job_level: missing_A.append('job_level')
+        if rec.company_size is None: missing_A.append('company_size')
+        if not rec.certificate: missing_A.append('education_level')
+        if not rec.marital: missing_A.append('marital_status')
+        if rec.overTime not in ('yes', 'no'): missing_A.append('overtime')
+        if rec.remote_work not in ('yes', 'no'): missing_A.append('remote_work')
+        if not rec.gender: missing_A.append('gender')
+        if not rec.performance_rating: missing_A.append('performance_rating')
+
+        if missing_A:
+            return "RH incomplet", missing_A
+
+        # --- Groupe B : Employé 6/6 requis ---
+        missing_B = []
+        for f in [
+            'job_satisfaction', 'work_life_balance', 'employee_recognition',
+            'leadership_opportunities', 'innovation_opportunities', 'company_reputation'
+        ]:
+            if not getattr(rec, f):
+                missing_B.append(f)
+
+        if missing_B:
+            return "Sondage incomplet", missing_B
+
+        return False, []
+
+    def _get_job_role_label(self):
+        self.ensure_one()
+        return (getattr(self, 'job_id', False) and self.job_id.name) or (
+                self.department_id and self.department_id.name)
+
+    def _build_risk_payload(self):
+        """Payload strict : aucune valeur par défaut n'est injectée."""
+        self.ensure_one()
+        rec = self
+        return {
+            "age": int(rec.age),
+            "years_at_company": int(rec.years_at_company),
+            "job_role": rec._get_job_role_label(),
+            "monthly_income": int(rec.monthly_income),
+            "number_of_promotions": int(rec.number_of_promotions),  # 0 possible mais valeur réelle
+            "distance_from_home": int(rec.km_home_work),  # 0 possible mais valeur réelle
+            "number_of_dependents": int(rec.children),  # 0 possible mais valeur réelle
+            "job_level": rec.job_level.capitalize(),
+            "company_size": self._get_company_size_label(rec.company_size),
+            "education_level": self._map_certificate_to_level(rec.certificate),
+            "marital_status": rec.marital.capitalize(),
+            "overtime": "Yes" if rec.overTime == "yes" else "No",
+            "remote_work": "Yes" if rec.remote_work == "yes" else "No",
+            "gender": self._label(rec.gender),
+
+            # Ordinales (toutes présentes, pas de fallback)
+            "performance_rating": self._label(rec.performance_rating),
+            "leadership_opportunities": "Yes" if rec.leadership_opportunities == "yes" else "No",
+            "innovation_opportunities": "Yes" if rec.innovation_opportunities == "yes" else "No",
+            "company_reputation": self._label(rec.company_reputation),
+            "employee_recognition": self._label(rec.employee_recognition),
+            "work_life_balance": self._label(rec.work_life_balance),
+            "job_satisfaction": self._label(rec.job_satisfaction),
+        }
+
+    def _call_risk_api_batch(self, url, payloads):
+        """
+        Envoie un lot de payloads à /predict/batch.
+        Retourne une liste (risk, reason) dans l'ordre des payloads.
+        """
+        valid_keys = [k for k, _ in self._fields['predicted_risk'].selection]
+        try:
+            resp = requests.post(url, json={"employees": payloads}, timeout=self.RISK_API_TIMEOUT)
+        except Exception as e:
+            _logger.error("API Error for batch of %s employees: %s", len(payloads), e)
+            return [('undefined', f"Erreur API : {e}")] * len(payloads)
+        if resp.status_code != 200:
+            _logger.error("API Error for batch of %s employees: HTTP %s", len(payloads), resp.status_code)
+            return [('undefined', f"Erreur API: HTTP {resp.status_code}")] * len(payloads)
+
+        outcomes = [('undefined', "Réponse API invalide")] * len(payloads)
+        for item in resp.json().get("results", []):
+            idx = item.get("index")
+            if not isinstance(idx, int) or not 0 <= idx < len(payloads):
+                continue
+            if item.get("errors"):
+                fields_in_error = sorted({
+                    str(err.get('loc', ['?'])[-1]) for err in item["errors"]
                 })
-                continue  # pas d'appel API
+                outcomes[idx] = ('undefined', "Réponse API invalide : " + ", ".join(fields_in_error))
+                continue
+            raw = (item.get("prediction") or "undefined").lower()
+            if raw in valid_keys and raw != 'undefined':
+                outcomes[idx] = (raw, False)  # on efface la raison si tout est OK
+        return outcomes
+
+    def _prepare_risk_inputs(self):
+        """
+        Validation + payload de chaque employé (sans appel API).
+        Retourne {employee_id: (motif, champs manquants, payload ou None)}.
+        """
+        prepared = {}
+        for rec in self:
+            motif, missing = rec._check_risk_inputs()
+            prepared[rec.id] = (motif or False, missing, None if motif else rec._build_risk_payload())
+        return prepared
 
-            # --- Groupe B : Employé 6/6 requis ---
-            missing_B = []
-            for f in [
-                'job_satisfaction', 'work_life_balance', 'employee_recognition',
-                'leadership_opportunities', 'innovation_opportunities', 'company_reputation'
-            ]:
-                if not getattr(rec, f):
-                    missing_B.append(f)
-
-            if missing_B:
-                rec.predicted_risk = 'undefined'
-                rec.prediction_reason = "Sondage incomplet : " + ", ".join(missing_B)
-                self.env['historique.evaluation'].sudo().create({
-                    'name': f"Évaluation IA - {fields.Datetime.now().strftime('%Y-%m-%d %H:%M')} | Motif: Sondage incomplet",
-                    'date': fields.Datetime.now(),
-                    'employee_id': rec.id,
-                    'job_satis': rec.job_satisfaction,
-                    'work_life': rec.work_life_balance,
-                    'leadership_opport': rec.leadership_opportunities,
-                    'innovation_opport': rec.innovation_opportunities,
-                    'company_reput': rec.company_reputation,
-                    'employee_recog': rec.employee_recognition,
-                    'performance': rec.performance_rating,
-                    'pred_risk': 'undefined',
-                })
+    def _predict_risk_batch(self, prepared=None):
+        """
+        Pipeline de prédiction pour tout le recordset :
+          1) validation de tous les employés (sans appel API), ou entrées déjà préparées
+             (ex. lues dans risk.feature.snapshot)
+          2) envoi des payloads valides par lots configurables à /predict/batch
+          3) un seul create() multi-lignes pour l'historique
+          4) un write() groupé par (risque, raison)
+          5) snapshot des features prédites (hash) pour ignorer les employés inchangés
+        Retourne un résumé {'total', 'scored', 'incomplete', 'api_errors', 'api_error_ids'}.
+        """
+        url, batch_size = self._get_risk_api_config()
+        now = fields.Datetime.now()
+        if prepared is None:
+            prepared = self._prepare_risk_inputs()
+
+        outcomes = {}   # employee_id -> (risk, reason)
+        motifs = {}     # employee_id -> motif de non-prédiction (historique)
+        score_ids = []
+        payloads = []
+
+        # 1) Validation
+        for rec in self:
+            motif, missing, payload = prepared[rec.id]
+            if motif:
+                outcomes[rec.id] = ('undefined', f"{motif} : " + ", ".join(missing))
+                motifs[rec.id] = motif
                 continue  # pas d'appel API
+            score_ids.append(rec.id)
+            payloads.append(payload)
+
+        # 2) Appels API par lots
+        to_score = self.browse(score_ids)
+        api_errors = 0
+        for start in range(0, len(payloads), batch_size):
+            chunk_recs = to_score[start:start + batch_size]
+            chunk_payloads = payloads[start:start + batch_size]
+            _logger.info("Sending batch of %s employees to FastAPI (%s)", len(chunk_payloads), url)
+            for rec, outcome in zip(chunk_recs, self._call_risk_api_batch(url, chunk_payloads)):
+                outcomes[rec.id] = outcome
+                if outcome[0] == 'undefined':
+                    api_errors += 1
+
+        # 3) Historisation compacte en un seul create()
+        Event = self.env['risk.evaluation.event'].sudo()
+        Event.create([
+            Event._event_vals(rec, outcomes[rec.id][0], now, motifs.get(rec.id))
+            for rec in self
+        ])
 
-            # --- Payload strict : aucune valeur par défaut n'est injectée ---
-            payload = {
-                "age": int(rec.age),
-                "years_at_company": int(rec.years_at_company),
-                "job_role": job_role_val,
-                "monthly_income": int(rec.monthly_income),
-                "number_of_promotions": int(rec.number_of_promotions),  # 0 possible mais valeur réelle
-                "distance_from_home": int(rec.km_home_work),  # 0 possible mais valeur réelle
-                "number_of_dependents": int(rec.children),  # 0 possible mais valeur réelle
-                "job_level": rec.job_level.capitalize(),
-                "company_size": self._get_company_size_label(rec.company_size),
-                "education_level": self._map_certificate_to_level(rec.certificate),
-                "marital_status": rec.marital.capitalize(),
-                "overtime": "Yes" if rec.overTime == "yes" else "No",
-                "remote_work": "Yes" if rec.remote_work == "yes" else "No",
-                "gender": self._label(rec.gender),
-
-                # Ordinales (toutes présentes, pas de fallback)
-                "performance_rating": self._label(rec.performance_rating),
-                "leadership_opportunities": "Yes" if rec.leadership_opportunities == "yes" else "No",
-                "innovation_opportunities": "Yes" if rec.innovation_opportunities == "yes" else "No",
-                "company_reputation": self._label(rec.company_reputation),
-                "employee_recognition": self._label(rec.employee_recognition),
-                "work_life_balance": self._label(rec.work_life_balance),
-                "job_satisfaction": self._label(rec.job_satisfaction),
-            }
-
-            # --- Appel API ---
-            try:
-                _logger.info("Payload sent to FastAPI for %s: %s", rec.name, payload)
-                resp = requests.post(url, json=payload, timeout=30)
-                if resp.status_code == 200:
-                    raw = (resp.json().get("prediction", "undefined") or "undefined").lower()
-                    risk = raw if raw in valid_keys else 'undefined'
-                    if risk == 'undefined':
-                        rec.prediction_reason = rec.prediction_reason or "Réponse API invalide"
-                else:
-                    risk = 'undefined'
-                    rec.prediction_reason = f"Erreur API: HTTP {resp.status_code}"
-            except Exception as e:
-                _logger.error("API Error for %s: %s", rec.name, e)
-                risk = 'undefined'
-                rec.prediction_reason = f"Erreur API : {e}"
-
-            # --- Mise à jour + Historisation ---
-            rec.predicted_risk = risk
-            if risk != 'undefined':
-                rec.prediction_reason = False  # on efface la raison si tout est OK
-
-            self.env['historique.evaluation'].sudo().create({
-                'name': f"Évaluation IA - {fields.Datetime.now().strftime('%Y-%m-%d %H:%M')}",
-                'date': fields.Datetime.now(),
-                'employee_id': rec.id,
-                'job_satis': rec.job_satisfaction,
-                'work_life': rec.work_life_balance,
-                'leadership_opport': rec.leadership_opportunities,
-                'innovation_opport': rec.innovation_opportunities,
-                'company_reput': rec.company_reputation,
-                'employee_recog': rec.employee_recognition,
-                'performance': rec.performance_rating,
-                'pred_risk': risk,
+        # 4) Mise à jour groupée par (risque, raison)
+        groups = defaultdict(list)
+        for emp_id, outcome in outcomes.items():
+            groups[outcome].append(emp_id)
+        for (risk, reason), emp_ids in groups.items():
+            self.browse(emp_ids).write({
+                'predicted_risk': risk,
+                'prediction_reason': reason,
             })
 
-        return True
+        # 5) Features effectivement prédites : seuls les employés avec un résultat réel
+        #    (prédiction valide ou entrées incomplètes) ; une erreur API sera re-scorée
+        error_ids = [emp_id for emp_id in score_ids if outcomes[emp_id][0] == 'undefined']
+        failed = set(error_ids)
+        Snapshot = self.env['risk.feature.snapshot'].sudo()
+        Snapshot._store({emp_id: inputs for emp_id, inputs in prepared.items()
+                         if emp_id in outcomes and emp_id not in failed}, now, predicted=True)
+        Snapshot._store({emp_id: prepared[emp_id] for emp_id in error_ids}, now)
+
+        return {
+            'total': len(self),
+            'scored': len(to_score) - api_errors,
+            'incomplete': len(motifs),
+            'api_errors': api_errors,
+            'api_error_ids': error_ids,
+        }
+
+    # ------------------------------------------------------------------
+    #  Re-scoring automatique (opt-in, anti-rebond, par lots)
+    # ------------------------------------------------------------------
+    RISK_AUTO_RESCORE_PARAM = 'risk_prediction.auto_rescore'
+    RISK_RESCORE_DEBOUNCE_PARAM = 'risk_prediction.rescore_debounce'
+    RISK_RESCORE_BATCH_SIZE_PARAM = 'risk_prediction.rescore_batch_size'
+    DEFAULT_RISK_RESCORE_DEBOUNCE = 300   # secondes sans nouveau changement avant scoring
+    DEFAULT_RISK_RESCORE_BATCH_SIZE = 500
+
+    def _is_risk_auto_rescore_enabled(self):
+        return self.env['ir.config_parameter'].sudo().get_param(self.RISK_AUTO_RESCORE_PARAM, '0') == '1'
+
+    def _enqueue_risk_rescore(self):
+        """
+        Met les employés en file de re-scoring (si le mode automatique est activé).
+        Chaque nouveau changement repousse la date : seuls les employés stables depuis
+        le délai d'anti-rebond sont scorés par le cron.
+        """
+        employees = self.filtered('id')
+        if not employees or not self._is_risk_auto_rescore_enabled():
+            return
+        employees.sudo().write({'risk_rescore_requested_at': fields.Datetime.now()})
+
+    @api.model
+    def _cron_rescore_risk_queue(self):
+        """Score la file par lots (un appel API batch par lot, commit par lot)."""
+        if not self._is_risk_auto_rescore_enabled():
+            return
+        ICP = self.env['ir.config_parameter'].sudo()
+        try:
+            debounce = int(ICP.get_param(self.RISK_RESCORE_DEBOUNCE_PARAM, self.DEFAULT_RISK_RESCORE_DEBOUNCE))
+            batch_size = int(ICP.get_param(self.RISK_RESCORE_BATCH_SIZE_PARAM, self.DEFAULT_RISK_RESCORE_BATCH_SIZE))
+        except (TypeError, ValueError):
+            debounce, batch_size = self.DEFAULT_RISK_RESCORE_DEBOUNCE, self.DEFAULT_RISK_RESCORE_BATCH_SIZE
+        cutoff = fields.Datetime.now() - timedelta(seconds=debounce)
+        domain = [('risk_rescore_requested_at', '!=', False), ('risk_rescore_requested_at', '<=', cutoff)]
+        failed_ids = []   # erreurs API : laissés dans la file pour le prochain passage du cron
+        while True:
+            batch = self.sudo().search(domain + [('id', 'not in', failed_ids)],
+                                       limit=max(batch_size, 1), order='risk_rescore_requested_at')
+            if not batch:
+                break
+            summary = batch._predict_risk_batch()
+            failed_ids += summary['api_error_ids']
+            # Ne retire de la file que les employés scorés et non re-demandés depuis le cutoff
+            done = batch - self.browse(summary['api_error_ids'])
+            self.sudo().search(domain + [('id', 'in', done.ids)]).write({'risk_rescore_requested_at': False})
+            self.env.cr.commit()
+            _logger.info("Risk re-scoring queue: %s scored, %s incomplete, %s API errors",
+                         summary['scored'], summary['incomplete'], summary['api_errors'])
 
     # ==================================================================
     # mapping
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Stockage compact de l'historique des évaluations de risque :
+  - risk.evaluation.event  : un événement par scoring, sélections codées en entiers, sans texte,
+                             index (employee_id, date)
+  - risk.evaluation.rollup : agrégats mensuels par employé et par département (vues de tendance)
+Une politique de rétention supprime les événements bruts (et l'ancien historique) une fois agrégés.
+historique.evaluation reste lisible : c'est une vue SQL sur les événements décodés et l'ancien historique.
+"""
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api, tools
+
+_logger = logging.getLogger(__name__)
+
+# Codes des sélections : 0 = vide, puis position + 1 dans la liste
+SELECTION_CODES = {
+    'job_satisfaction': ['low', 'medium', 'high', 'very_high'],
+    'work_life_balance': ['poor', 'fair', 'good', 'excellent'],
+    'performance_rating': ['low', 'below_average', 'average', 'high'],
+    'leadership_opportunities': ['no', 'yes'],
+    'innovation_opportunities': ['no', 'yes'],
+    'company_reputation': ['poor', 'fair', 'good', 'excellent'],
+    'employee_recognition': ['low', 'medium', 'high', 'very_high'],
+}
+# Risque : 0 = undefined, 1 = low, 2 = medium, 3 = high
+RISK_CODES = {'undefined': 0, 'low': 1, 'medium': 2, 'high': 3}
+RISK_LABELS = {code: value for value, code in RISK_CODES.items()}
+# Motif de non-prédiction (voir hr.employee._check_risk_inputs)
+MOTIF_CODES = {None: 0, 'RH incomplet': 1, 'Sondage incomplet': 2}
+
+
+def encode_selection(fname, value):
+    values = SELECTION_CODES[fname]
+    return values.index(value) + 1 if value in values else 0
+
+
+def decode_selection(fname, code):
+    values = SELECTION_CODES[fname]
+    return values[code - 1] if 0 < code <= len(values) else False
+
+
+class RiskEvaluationEvent(models.Model):
+    _name = 'risk.evaluation.event'
+    _description = 'Risk Evaluation Event (compact)'
+    _order = 'date desc, id desc'
+    _log_access = False  # pas de create_uid / write_date : lignes immuables
+
+    employee_id = fields.Many2one('hr.employee', string="Employee", required=True, ondelete='cascade')
+    department_id = fields.Many2one('hr.department', string="Department", ondelete='set null')
+    date = fields.Datetime(string="Date", required=True)
+    risk_code = fields.Integer(string="Risk Code", required=True, default=0)
+    motif_code = fields.Integer(string="Motif Code", default=0)
+    job_satisfaction_code = fields.Integer(default=0)
+    work_life_balance_code = fields.Integer(default=0)
+    performance_rating_code = fields.Integer(default=0)
+    leadership_opportunities_code = fields.Integer(default=0)
+    innovation_opportunities_code = fields.Integer(default=0)
+    company_reputation_code = fields.Integer(default=0)
+    employee_recognition_code = fields.Integer(default=0)
+
+    # Décodage pour l'affichage (non stocké)
+    pred_risk = fields.Selection(
+        [('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('undefined', 'Undefined')],
+        string="Predicted Risk", compute='_compute_labels',
+    )
+    job_satis = fields.Selection(
+        [('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('very_high', 'Very High')],
+        string="Job Satisfaction", compute='_compute_labels',
+    )
+    work_life = fields.Selection(
+        [('poor', 'Poor'), ('fair', 'Fair'), ('good', 'Good'), ('excellent', 'Excellent')],
+        string="Work-Life Balance", compute='_compute_labels',
+    )
+    performance = fields.Selection(
+        [('low', 'Low'), ('below_average', 'Below Average'), ('average', 'Average'), ('high', 'High')],
+        string="Performance Rating", compute='_compute_labels',
+    )
+
+    def init(self):
+        tools.create_index(self._cr, 'risk_evaluation_event_employee_date_idx',
+                           self._table, ['employee_id', 'date'])
+        tools.create_index(self._cr, 'risk_evaluation_event_date_idx', self._table, ['date'])
+
+    @api.depends('risk_code', 'job_satisfaction_code', 'work_life_balance_code', 'performance_rating_code')
+    def _compute_labels(self):
+        for rec in self:
+            rec.pred_risk = RISK_LABELS.get(rec.risk_code, 'undefined')
+            rec.job_satis = decode_selection('job_satisfaction', rec.job_satisfaction_code)
+            rec.work_life = decode_selection('work_life_balance', rec.work_life_balance_code)
+            rec.performance = decode_selection('performance_rating', rec.performance_rating_code)
+
+    @api.model
+    def _event_vals(self, employee, risk, now, motif=None):
+        """Valeurs compactes d'un événement de scoring pour un employé."""
+        vals = {
+            'employee_id': employee.id,
+            'department_id': employee.department_id.id,
+            'date': now,
+            'risk_code': RISK_CODES.get(risk, 0),
+            'motif_code': MOTIF_CODES.get(motif, 0),
+        }
+        for fname in SELECTION_CODES:
+            vals[f"{fname}_code"] = encode_selection(fname, employee[fname])
+        return vals
+
+    # ------------------------------------------------------------
+    # Agrégats mensuels + rétention
+    # ------------------------------------------------------------
+    RETENTION_DAYS_PARAM = 'risk_prediction.history_retention_days'
+    DEFAULT_RETENTION_DAYS = 730
+
+    @api.model
+    def _cron_rollup_and_purge(self):
+        """Recalcule les agrégats des mois récents, puis purge les événements hors rétention."""
+        Rollup = self.env['risk.evaluation.rollup']
+        # Mois à (re)calculer : du plus ancien événement non agrégé au mois courant
+        last = Rollup.search([], order='month desc', limit=1).month
+        first_event = self.search([], order='date asc', limit=1).date
+        if not first_event:
+            return
+        # Jamais avant le mois du plus ancien événement restant : les agrégats des mois
+        # déjà purgés ne peuvent plus être recalculés et doivent être conservés
+        first_month = first_event.date().replace(day=1)
+        start = max(last, first_month) if last else first_month
+        Rollup._rebuild_months(start)
+
+        try:
+            retention = int(self.env['ir.config_parameter'].sudo().get_param(
+                self.RETENTION_DAYS_PARAM, self.DEFAULT_RETENTION_DAYS))
+        except (TypeError, ValueError):
+            retention = self.DEFAULT_RETENTION_DAYS
+        if retention <= 0:
+            return
+        # On ne purge que des mois complets, déjà agrégés
+        cutoff = (fields.Datetime.now() - timedelta(days=retention)).replace(day=1, hour=0, minute=0,
+                                                                             second=0, microsecond=0)
+        old_events = self.search([('date', '<', cutoff)])
+        old_history = self.env['historique.evaluation.legacy'].sudo().search([('date', '<', cutoff)])
+        if old_events or old_history:
+            _logger.info("Risk history retention: purging %s event(s) and %s legacy row(s) before %s",
+                         len(old_events), len(old_history), cutoff)
+            old_events.unlink()
+            old_history.unlink()
+
+
+class RiskEvaluationRollup(models.Model):
+    _name = 'risk.evaluation.rollup'
+    _description = 'Risk Evaluation Monthly Rollup'
+    _order = 'month desc, department_id, employee_id'
+
+    scope = fields.Selection([('employee', 'Employee'), ('department', 'Department')],
+                             required=True, index=True)
+    month = fields.Date(string="Month", required=True, index=True)
+    employee_id = fields.Many2one('hr.employee', string="Employee", index=True, ondelete='cascade')
+    department_id = fields.Many2one('hr.department', string="Department", index=True, ondelete='cascade')
+
+    n_evaluations = fields.Integer(string="Evaluations")
+    n_low = fields.Integer(string="Low")
+    n_medium = fields.Integer(string="Medium")
+    n_high = fields.Integer(string="High")
+    n_undefined = fields.Integer(string="Undefined")
+    # Score moyen des prédictions définies (low=1, medium=2, high=3)
+    avg_risk_score = fields.Float(string="Average Risk Score", group_operator='avg')
+    high_risk_pct = fields.Float(string="High Risk (%)", group_operator='avg')
+
+    @api.model
+    def _rebuild_months(self, start):
+        """Recalcule les agrégats de tous les mois >= start (une requête groupée, un create() multi)."""
+        start = start.replace(day=1)
+        Event = self.env['risk.evaluation.event']
+        grouped = Event._read_group(
+            [('date', '>=', fields.Datetime.to_datetime(start))],
+            ['date:month', 'employee_id', 'department_id', 'risk_code'],
+            ['__count'],
+        )
+        buckets = {}
+        for month, employee, department, risk_code, count in grouped:
+            month = month.date() if hasattr(month, 'date') else month
+            for key in (('employee', month, employee.id, department.id),
+                        ('department', month, False, department.id)):
+                if key[0] == 'department' and not department:
+                    continue
+                counts = buckets.setdefault(key, dict.fromkeys(RISK_CODES.values(), 0))
+                counts[risk_code] += count
+
+        vals_list = []
+        for (scope, month, employee_id, department_id), counts in buckets.items():
+            total = sum(counts.values())
+            defined = total - counts[0]
+            vals_list.append({
+                'scope': scope,
+                'month': month,
+                'employee_id': employee_id,
+                'department_id': department_id,
+                'n_evaluations': total,
+                'n_low': counts[1],
+                'n_medium': counts[2],
+                'n_high': counts[3],
+                'n_undefined': counts[0],
+                'avg_risk_score': (counts[1] + 2 * counts[2] + 3 * counts[3]) / defined if defined else 0.0,
+                'high_risk_pct': 100.0 * counts[3] / defined if defined else 0.0,
+            })
+        self.search([('month', '>=', start)]).unlink()
+        self.create(vals_list)
+        _logger.info("Risk rollups rebuilt from %s: %s row(s)", start, len(vals_list))
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Snapshot des features de risque : une ligne par employé avec le vecteur encodé
+(valeurs du payload /predict dans l'ordre de RISK_FEATURE_NAMES) et son hash.
+  - le cron périodique rafraîchit les vecteurs et (option) re-score uniquement les
+    employés dont le hash a changé depuis la dernière prédiction ;
+  - re-scoring, simulations et changements de modèle relisent les vecteurs en bloc
+    sans recalculer les champs ORM.
+"""
+import hashlib
+import json
+import logging
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+# Ordre des colonnes du vecteur (= clés de hr.employee._build_risk_payload).
+# Incrémenter la version à chaque changement : les hash précédents deviennent invalides.
+RISK_FEATURE_SCHEMA_VERSION = 1
+RISK_FEATURE_NAMES = [
+    'age', 'years_at_company', 'job_role', 'monthly_income', 'number_of_promotions',
+    'distance_from_home', 'number_of_dependents', 'job_level', 'company_size',
+    'education_level', 'marital_status', 'overtime', 'remote_work', 'gender',
+    'performance_rating', 'leadership_opportunities', 'innovation_opportunities',
+    'company_reputation', 'employee_recognition', 'work_life_balance', 'job_satisfaction',
+]
+
+
+def feature_hash(motif, missing, vector):
+    """Hash stable des entrées de scoring (vecteur, ou motif + champs manquants)."""
+    raw = json.dumps([RISK_FEATURE_SCHEMA_VERSION, motif or False, list(missing or []), vector],
+                     ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class RiskFeatureSnapshot(models.Model):
+    _name = 'risk.feature.snapshot'
+    _description = 'Risk Feature Snapshot'
+    _order = 'employee_id'
+
+    employee_id = fields.Many2one('hr.employee', string="Employee", required=True, ondelete='cascade')
+    department_id = fields.Many2one(related='employee_id.department_id', string="Department")
+    schema_version = fields.Integer(string="Schema Version", required=True, default=RISK_FEATURE_SCHEMA_VERSION)
+    # Liste compacte des valeurs (None si entrées incomplètes)
+    vector = fields.Json(string="Feature Vector")
+    motif = fields.Char(string="Motif")
+    missing_fields = fields.Char(string="Missing Fields")
+    feature_hash = fields.Char(string="Feature Hash", required=True, index=True)
+    snapshot_at = fields.Datetime(string="Snapshot At")
+    predicted_hash = fields.Char(string="Predicted Hash")
+    predicted_at = fields.Datetime(string="Predicted At")
+
+    _sql_constraints = [
+        ('employee_uniq', 'unique(employee_id)', 'One feature snapshot per employee.'),
+    ]
+
+    # ---------------------------
+    # Écriture
+    # ---------------------------
+    @api.model
+    def _store(self, prepared, now, predicted=False):
+        """
+        Upsert en bloc depuis hr.employee._prepare_risk_inputs() :
+        {employee_id: (motif, champs manquants, payload)}. Si predicted, le hash
+        courant devient aussi le hash de la dernière prédiction.
+        Retourne {employee_id: snapshot}.
+        """
+        if not prepared:
+            return {}
+        existing = {rec.employee_id.id: rec for rec in self.search([('employee_id', 'in', list(prepared))])}
+        to_create = []
+        for emp_id, (motif, missing, payload) in prepared.items():
+            vector = [payload[name] for name in RISK_FEATURE_NAMES] if payload else None
+            vals = {
+                'schema_version': RISK_FEATURE_SCHEMA_VERSION,
+                'vector': vector,
+                'motif': motif or False,
+                'missing_fields': ", ".join(missing) if motif else False,
+                'feature_hash': feature_hash(motif, missing, vector),
+                'snapshot_at': now,
+            }
+            if predicted:
+                vals.update(predicted_hash=vals['feature_hash'], predicted_at=now)
+            rec = existing.get(emp_id)
+            if rec is None:
+                to_create.append(dict(vals, employee_id=emp_id))
+            elif predicted or rec.feature_hash != vals['feature_hash'] or rec.schema_version != RISK_FEATURE_SCHEMA_VERSION:
+                rec.write(vals)
+        if to_create:
+            for rec in self.create(to_create):
+                existing[rec.employee_id.id] = rec
+        return existing
+
+    # ---------------------------
+    # Lecture
+    # ---------------------------
+    def _to_prepared(self):
+        """Entrées de scoring relues depuis les snapshots : {employee_id: (motif, manquants, payload)}."""
+        prepared = {}
+        for rec in self:
+            payload = dict(zip(RISK_FEATURE_NAMES, rec.vector)) if rec.vector else None
+            missing = rec.missing_fields.split(", ") if rec.missing_fields else []
+            prepared[rec.employee_id.id] = (rec.motif or False, missing, payload)
+        return prepared
+
+    def _filter_changed(self):
+        """Snapshots (schéma courant) dont le hash diffère de celui de la dernière prédiction."""
+        return self.filtered(lambda r: r.schema_version == RISK_FEATURE_SCHEMA_VERSION
+                             and r.feature_hash != r.predicted_hash)
+
+    def action_predict_from_snapshot(self):
+        """Re-score les employés sélectionnés à partir des vecteurs stockés (ex. après un changement de modèle)."""
+        current = self.filtered(lambda r: r.schema_version == RISK_FEATURE_SCHEMA_VERSION)
+        if current:
+            summary = current.employee_id._predict_risk_batch(prepared=current._to_prepared())
+            _logger.info("Risk re-scoring from snapshots: %s", summary)
+        return True
+
+    # ---------------------------
+    # Cron
+    # ---------------------------
+    SNAPSHOT_BATCH_SIZE_PARAM = 'risk_prediction.snapshot_batch_size'
+    SNAPSHOT_RESCORE_PARAM = 'risk_prediction.snapshot_rescore'
+    DEFAULT_SNAPSHOT_BATCH_SIZE = 1000
+
+    @api.model
+    def _cron_snapshot_features(self):
+        """
+        Rafraîchit les snapshots de tous les employés actifs par lots (commit par lot).
+        Si risk_prediction.snapshot_rescore = 1, seuls les employés dont le hash a changé
+        depuis leur dernière prédiction sont re-scorés, à partir du vecteur déjà calculé.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        try:
+            batch_size = max(int(ICP.get_param(self.SNAPSHOT_BATCH_SIZE_PARAM, self.DEFAULT_SNAPSHOT_BATCH_SIZE)), 1)
+        except (TypeError, ValueError):
+            batch_size = self.DEFAULT_SNAPSHOT_BATCH_SIZE
+        rescore = ICP.get_param(self.SNAPSHOT_RESCORE_PARAM, '0') == '1'
+
+        Employee = self.env['hr.employee'].sudo()
+        last_id, stored, rescored = 0, 0, 0
+        while True:
+            batch = Employee.search([('id', '>', last_id)], order='id', limit=batch_size)
+            if not batch:
+                break
+            last_id = batch[-1].id
+            snapshots = self.sudo()._store(batch._prepare_risk_inputs(), fields.Datetime.now())
+            stored += len(snapshots)
+            if rescore:
+                changed = self.browse([s.id for s in snapshots.values()])._filter_changed()
+                if changed:
+                    changed.employee_id._predict_risk_batch(prepared=changed._to_prepared())
+                    rescored += len(changed)
+            self.env.cr.commit()
+        _logger.info("Risk feature snapshots: %s stored, %s re-scored (unchanged skipped)", stored, rescored)
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+
+class RiskPredictionJob(models.Model):
+    """
+    Job de scoring en arrière-plan : les employés en attente sont traités
+    par lots bornés par le cron, avec un commit après chaque lot.
+    Un run interrompu (limit_time_real, redémarrage) reprend là où il s'est arrêté.
+    """
+    _name = 'risk.prediction.job'
+    _description = 'Risk Prediction Background Job'
+    _order = 'create_date desc, id desc'
+
+    # Paramètres système
+    CHUNK_SIZE_PARAM = 'risk_prediction.job_chunk_size'
+    TIME_BUDGET_PARAM = 'risk_prediction.job_time_budget'
+    DEFAULT_CHUNK_SIZE = 200
+    # Secondes par exécution du cron. Le budget n'est vérifié qu'entre deux lots : un lot lancé
+    # juste avant l'échéance peut encore attendre l'API jusqu'à HrEmployee.RISK_API_TIMEOUT (30 s).
+    # Il faut donc budget + 30 s < limit_time_real_cron (180 s dans odoo/config/odoo.conf),
+    # sinon le worker est tué en plein lot.
+    DEFAULT_TIME_BUDGET = 120
+
+    name = fields.Char(string="Name", required=True, default=lambda self: "Risk scoring %s" % (
+        fields.Datetime.now().strftime('%Y-%m-%d %H:%M')))
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('cancelled', 'Cancelled'),
+    ], string="Status", default='draft', required=True, index=True)
+
+    employee_ids = fields.Many2many(
+        'hr.employee', 'risk_prediction_job_employee_rel', 'job_id', 'employee_id',
+        string="Employees")
+    pending_employee_ids = fields.Many2many(
+        'hr.employee', 'risk_prediction_job_pending_rel', 'job_id', 'employee_id',
+        string="Pending Employees", readonly=True)
+
+    chunk_size = fields.Integer(string="Chunk Size", default=lambda self: self._default_chunk_size())
+
+    # --- Progression ---
+    total_count = fields.Integer(string="Total", readonly=True)
+    processed_count = fields.Integer(string="Processed", readonly=True)
+    scored_count = fields.Integer(string="Scored", readonly=True)
+    incomplete_count = fields.Integer(string="Incomplete Data", readonly=True)
+    failed_count = fields.Integer(string="Failed", readonly=True)
+    progress = fields.Float(string="Progress (%)", compute='_compute_progress')
+
+    # --- Débit ---
+    started_at = fields.Datetime(string="Started At", readonly=True)
+    finished_at = fields.Datetime(string="Finished At", readonly=True)
+    processing_seconds = fields.Float(string="Processing Time (s)", readonly=True)
+    throughput = fields.Float(string="Throughput (employees/s)", compute='_compute_progress')
+    last_error = fields.Text(string="Last Error", readonly=True)
+
+    # ==================================================================
+    @api.depends('total_count', 'processed_count', 'processing_seconds')
+    def _compute_progress(self):
+        for job in self:
+            job.progress = 100.0 * job.processed_count / job.total_count if job.total_count else 0.0
+            job.throughput = job.processed_count / job.processing_seconds if job.processing_seconds else 0.0
+
+    def _default_chunk_size(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        try:
+            return int(ICP.get_param(self.CHUNK_SIZE_PARAM, self.DEFAULT_CHUNK_SIZE))
+        except (TypeError, ValueError):
+            return self.DEFAULT_CHUNK_SIZE
+
+    def _get_time_budget(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        try:
+            return float(ICP.get_param(self.TIME_BUDGET_PARAM, self.DEFAULT_TIME_BUDGET))
+        except (TypeError, ValueError):
+            return float(self.DEFAULT_TIME_BUDGET)
+
+    # ==================================================================
+    # Actions
+    # ------------------------------------------------------------------
+    @api.model
+    def action_create_for_employees(self, employees):
+        """Crée et lance un job pour les employés donnés, puis ouvre sa fiche."""
+        if not employees:
+            raise UserError(_("Please select at least one employee."))
+        job = self.create({'employee_ids': [(6, 0, employees.ids)]})
+        job.action_start()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': job.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
+
+    def action_load_all_employees(self):
+        """Cible tous les employés actifs de la société (run à l'échelle de l'entreprise)."""
+        for job in self:
+            if job.state != 'draft':
+                raise UserError(_("Only draft jobs can be modified."))
+            employees = self.env['hr.employee'].search([('company_id', 'in', self.env.companies.ids)])
+            job.employee_ids = [(6, 0, employees.ids)]
+        return True
+
+    def action_start(self):
+        for job in self:
+            if job.state not in ('draft', 'cancelled', 'done'):
+                continue
+            if not job.employee_ids:
+                raise UserError(_("Job %s has no employee to score.", job.name))
+            job.write({
+                'state': 'pending',
+                'pending_employee_ids': [(6, 0, job.employee_ids.ids)],
+                'total_count': len(job.employee_ids),
+                'processed_count': 0,
+                'scored_count': 0,
+                'incomplete_count': 0,
+                'failed_count': 0,
+                'processing_seconds': 0.0,
+                'started_at': False,
+                'finished_at': False,
+                'last_error': False,
+            })
+        # Démarrage immédiat du cron plutôt que d'attendre le prochain intervalle
+        cron = self.env.ref('risk_prediction.ir_cron_risk_prediction_jobs', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+        return True
+
+    def action_cancel(self):
+        self.filtered(lambda j: j.state in ('draft', 'pending', 'running')).write({
+            'state': 'cancelled',
+            'finished_at': fields.Datetime.now(),
+        })
+        return True
+
+    # ==================================================================
+    # Cron
+    # ------------------------------------------------------------------
+    @api.model
+    def _cron_process_jobs(self):
+        """
+        Traite les jobs en attente par lots, dans la limite du budget de temps.
+        Chaque lot est committé : la progression est conservée si le worker est tué.
+        """
+        deadline = time.monotonic() + self._get_time_budget()
+        jobs = self.search([('state', 'in', ('pending', 'running'))], order='create_date, id')
+        for job in jobs:
+            if not job._process_chunks(deadline):
+                break  # budget épuisé : le cron reprendra au prochain passage
+        return True
+
+    def _process_chunks(self, deadline):
+        """Traite les lots de ce job jusqu'à la fin ou l'échéance. Retourne False si l'échéance est atteinte."""
+        self.ensure_one()
+        if self.state == 'pending':
+            self.write({'state': 'running', 'started_at': self.started_at or fields.Datetime.now()})
+            self.env.cr.commit()
+
+        chunk_size = max(self.chunk_size or self.DEFAULT_CHUNK_SIZE, 1)
+        while self.pending_employee_ids:
+            if time.monotonic() >= deadline:
+                return False
+            # Le job a pu être annulé depuis l'interface entre deux lots
+            self.invalidate_recordset(['state'])
+            if self.state != 'running':
+                return True
+
+            chunk = self.pending_employee_ids[:chunk_size]
+            t0 = time.monotonic()
+            try:
+                summary = chunk._predict_risk_batch()
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.exception("Risk job %s: chunk of %s employees failed", self.id, len(chunk))
+                summary = {'scored': 0, 'incomplete': 0, 'api_errors': len(chunk)}
+                self.last_error = str(e)
+            elapsed = time.monotonic() - t0
+
+            self.write({
+                'pending_employee_ids': [(3, emp_id) for emp_id in chunk.ids],
+                'processed_count': self.processed_count + len(chunk),
+                'scored_count': self.scored_count + summary['scored'],
+                'incomplete_count': self.incomplete_count + summary['incomplete'],
+                'failed_count': self.failed_count + summary['api_errors'],
+                'processing_seconds': self.processing_seconds + elapsed,
+            })
+            self.env.cr.commit()
+            _logger.info("Risk job %s: %s/%s employees processed (%.1f employees/s)",
+                         self.id, self.processed_count, self.total_count,
+                         len(chunk) / elapsed if elapsed else 0.0)
+
+        self.write({'state': 'done', 'finished_at': fields.Datetime.now()})
+        self.env.cr.commit()
+        return True
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Déclencheurs du re-scoring automatique : les changements de contrat (salaire, dates, état)
+et de présences mettent les employés concernés en file (voir hr.employee._enqueue_risk_rescore)
+et vident le cache de features de la transaction.
+"""
+from odoo import models, api
+
+
+class HrContract(models.Model):
+    _inherit = 'hr.contract'
+
+    # Champs qui alimentent les features de risque (revenu, ancienneté, statut, promotions)
+    _RISK_INPUT_FIELDS = {'employee_id', 'wage', 'date_start', 'date_end', 'state', 'job_id', 'active'}
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['hr.employee']._invalidate_risk_feature_cache()
+        records.employee_id._enqueue_risk_rescore()
+        return records
+
+    def write(self, vals):
+        if not self._RISK_INPUT_FIELDS.intersection(vals):
+            return super().write(vals)
+        employees = self.employee_id
+        res = super().write(vals)
+        self.env['hr.employee']._invalidate_risk_feature_cache()
+        (employees | self.employee_id)._enqueue_risk_rescore()
+        return res
+
+    def unlink(self):
+        employees = self.employee_id
+        res = super().unlink()
+        self.env['hr.employee']._invalidate_risk_feature_cache()
+        employees._enqueue_risk_rescore()
+        return res
+
+
+class HrAttendance(models.Model):
+    _inherit = 'hr.attendance'
+
+    # Heures travaillées / heures supplémentaires
+    _RISK_INPUT_FIELDS = {'employee_id', 'check_in', 'check_out'}
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['hr.employee']._invalidate_risk_feature_cache()
+        records.employee_id._enqueue_risk_rescore()
+        return records
+
+    def write(self, vals):
+        if not self._RISK_INPUT_FIELDS.intersection(vals):
+            return super().write(vals)
+        employees = self.employee_id
+        res = super().write(vals)
+        self.env['hr.employee']._invalidate_risk_feature_cache()
+        (employees | self.employee_id)._enqueue_risk_rescore()
+        return res
+
+    def unlink(self):
+        employees = self.employee_id
+        res = super().unlink()
+        self.env['hr.employee']._invalidate_risk_feature_cache()
+        employees._enqueue_risk_rescore()
+        return res
@@ -1,9 +1,49 @@
 # -*- coding: utf-8 -*-
 import logging
-from odoo import models, api, fields
+from collections import defaultdict
+
+from odoo import models, api, fields, tools
 
 _logger = logging.getLogger(__name__)
 
+# Mapping des labels (categorie) et champs
+LABEL_TO_FIELD = {
+    'Job Satisfaction': 'job_satisfaction',
+    'Work–Life Balance': 'work_life_balance',
+    'Leadership Opportunities': 'leadership_opportunities',
+    'Innovation Opportunities': 'innovation_opportunities',
+    'Company Reputation': 'company_reputation',
+    'Employee Recognition': 'employee_recognition',
+}
+
+# Niveaux qualitatifs
+LEVELS_MAP = {
+    'Job Satisfaction': ['low', 'medium', 'high', 'very_high'],
+    'Work–Life Balance': ['poor', 'fair', 'good', 'excellent'],
+    'Leadership Opportunities': ['no', 'yes'],
+    'Innovation Opportunities': ['no', 'yes'],
+    'Company Reputation': ['poor', 'fair', 'good', 'excellent'],
+    'Employee Recognition': ['low', 'medium', 'high', 'very_high'],
+}
+
+# Seuils => x<=25 idx=0 ; 25<x<=50 idx=1 ; 50<x<=75 ; x>75
+## si binaire : x <= 25 idx = 0 si nn idx=1
+THRESHOLDS = [25, 50, 75]
+
+
+def _score_to_level(label, pct):
+    """Niveau qualitatif d'une catégorie à partir du score moyen (0..100)."""
+    lvl_list = LEVELS_MAP[label]
+    # Déterminer l'index du niveau
+    idx = len(THRESHOLDS)
+    for i, threshold in enumerate(THRESHOLDS):
+        if pct <= threshold:
+            idx = i
+            break
+    # Choix du niveau si binaire (yes or no )
+    if len(lvl_list) == 2:
+        return lvl_list[1] if idx > 0 else lvl_list[0]
+    return lvl_list[idx]
 
 
 class SurveyUserInput(models.Model):
@@ -12,137 +52,144 @@ class SurveyUserInput(models.Model):
     def write(self, vals):
         # Appel à la méthode parente
         result = super(SurveyUserInput, self).write(vals)
-        # Vérification de la fin du questionnaire
+        # Vérification de la fin du questionnaire : toutes les réponses terminées sont scorées ensemble
         if 'state' in vals and vals['state'] == 'done':
-            for record in self:
-                if record.state == 'done':
-                    _logger.info("Survey %s done → compute category scores", record.id)
-                    record._push_scores_to_employee()
+            done = self.filtered(lambda r: r.state == 'done')
+            if done:
+                _logger.info("%s survey(s) done → compute category scores", len(done))
+                done._push_scores_batch()
         return result
 
-    def _push_scores_to_employee(self):
-        self.ensure_one()
-        _logger.info("Starting _push_scores_to_employee for survey_user_input %s", self.id)
-
-        # Mapping des labels (categorie) et champs
-        label_to_field = {
-            'Job Satisfaction': 'job_satisfaction',
-            'Work–Life Balance': 'work_life_balance',
-            'Leadership Opportunities': 'leadership_opportunities',
-            'Innovation Opportunities': 'innovation_opportunities',
-            'Company Reputation': 'company_reputation',
-            'Employee Recognition': 'employee_recognition',
-        }
-
-        # Niveaux qualitatifs
-        levels_map = {
-            'Job Satisfaction': ['low', 'medium', 'high', 'very_high'],
-            'Work–Life Balance': ['poor', 'fair', 'good', 'excellent'],
-            'Leadership Opportunities': ['no', 'yes'],
-            'Innovation Opportunities': ['no', 'yes'],
-            'Company Reputation': ['poor', 'fair', 'good', 'excellent'],
-            'Employee Recognition': ['low', 'medium', 'high', 'very_high'],
-        }
-
-        # Seuils => x<=25 idx=0 ; 25<x<=50 idx=1 ; 50<x<=75 ; x>75
-        ## si binaire : x <= 25 idx = 0 si nn idx=1
-        thresholds = [25, 50, 75]
-
-        # 1) Compter les questions par catégorie
-        question_counts = {}
-        for label in levels_map:
-            count = 0
-            # Parcours des questions du sondage
-            for question in self.survey_id.question_ids:
-                if not question.is_page:
-                    # Vérifie si la question a cette catégorie
-                    for category in question.category_ids:
-                        if category.name == label:
-                            count += 1
-                            break
-            question_counts[label] = count
-        _logger.info("Defined question counts per category: %s", question_counts)
-
-        # 2) Initialiser totaux et compteurs de réponses
-        totals = {} # somme des scores (50+75+..)
-        response_counts = {} # nbr de questions repondus
-        for label in levels_map:
-            totals[label] = 0.0
-            response_counts[label] = 0
-
-        # 3) Parcours des réponses
-        for line in self.user_input_line_ids:
-            # Récupère le label de la catégorie
-            cat_label = False
-            if line.question_id.category_ids:
-                cat_label = line.question_id.category_ids[0].name
-            if cat_label not in totals:
-                _logger.warning("No valid category for question %s", line.question_id.id)
+    # ------------------------------------------------------------
+    # Carte question → catégorie (mise en cache par sondage)
+    # ------------------------------------------------------------
+    @api.model
+    def _question_category_version(self, survey_id):
+        """
+        Version de la carte d'un sondage, lue en une requête : nombre et dernière modification
+        de ses questions (création, suppression, changement de catégories ou de type) et des
+        catégories (renommage, suppression). Sert de clé de cache : aucune invalidation globale.
+        """
+        self.env['survey.question'].flush_model(['survey_id', 'write_date'])
+        self.env['survey.question.category'].flush_model(['write_date'])
+        self.env.cr.execute("""
+            SELECT COUNT(q.id), MAX(q.write_date),
+                   (SELECT COUNT(*) FROM survey_question_category),
+                   (SELECT MAX(write_date) FROM survey_question_category)
+              FROM survey_question q
+             WHERE q.survey_id = %s
+        """, (survey_id,))
+        return tuple(str(value) for value in self.env.cr.fetchone())
+
+    @api.model
+    @tools.ormcache('survey_id', 'version')
+    def _get_question_category_map(self, survey_id, version):
+        """
+        Pour un sondage : (question_id -> label de sa première catégorie,
+        label -> nombre de questions (hors pages) portant ce label).
+        Mis en cache par (sondage, version) : voir _question_category_version().
+        """
+        survey = self.env['survey.survey'].sudo().browse(survey_id)
+        question_label = {}
+        question_counts = dict.fromkeys(LEVELS_MAP, 0)
+        for question in survey.question_ids:
+            names = question.category_ids.mapped('name')
+            if names:
+                question_label[question.id] = names[0]
+            if not question.is_page:
+                for label in set(names) & set(LEVELS_MAP):
+                    question_counts[label] += 1
+        return question_label, question_counts
+
+    # ------------------------------------------------------------
+    # Scoring par lots
+    # ------------------------------------------------------------
+    def _compute_category_scores(self):
+        """
+        Scores par catégorie de toutes les réponses du recordset :
+        une requête groupée (réponse, question) sur les lignes, puis agrégation en mémoire.
+        Retourne {user_input_id: {'question_counts', 'response_counts', 'results', 'updates'}}.
+        """
+        if not self:
+            return {}
+        # somme des scores et nombre de lignes par (réponse, question)
+        grouped = self.env['survey.user_input.line'].sudo()._read_group(
+            [('user_input_id', 'in', self.ids)],
+            ['user_input_id', 'question_id'],
+            ['answer_score:sum', '__count'],
+        )
+        totals = defaultdict(lambda: dict.fromkeys(LEVELS_MAP, 0.0))           # somme des scores (50+75+..)
+        response_counts = defaultdict(lambda: dict.fromkeys(LEVELS_MAP, 0))    # nbr de questions repondus
+        survey_of = {rec.id: rec.survey_id.id for rec in self}
+        maps = {survey_id: self._get_question_category_map(survey_id, self._question_category_version(survey_id))
+                for survey_id in set(survey_of.values())}
+        for user_input, question, score_sum, count in grouped:
+            question_label, _counts = maps[survey_of[user_input.id]]
+            cat_label = question_label.get(question.id)
+            if cat_label not in LEVELS_MAP:
+                _logger.warning("No valid category for question %s", question.id)
                 continue
-            # Récupère le score
-            val = line.answer_score or 0.0
-            totals[cat_label] += val
-            response_counts[cat_label] += 1
-            _logger.debug("Adding %s to category %s", val, cat_label)
-        _logger.info("Provided response counts per category: %s", response_counts)
-
-        # 4) Calcul des pourcentages et niveaux
-        results = {}
-        for label in levels_map:
-            total = totals[label]
-            cnt = response_counts[label]
-            pct = total / cnt if cnt > 0 else 0.0
-            # niveaux dans le categorie
-            lvl_list = levels_map[label]
-            # Déterminer l'index du niveau
-            idx = len(thresholds)
-            for i in range(len(thresholds)):
-                if pct <= thresholds[i]:
-                    idx = i
-                    break
-            # Choix du niveau si binaire (yes or no )
-
-            if len(lvl_list) == 2:
-                level = lvl_list[1] if idx > 0 else lvl_list[0]
-            else:
-                level = lvl_list[idx]
-            results[label] = {
-                'total': total,
-                'count': cnt,
-                'percentage': pct,
-                'level': level,
-            }
-            _logger.debug(
-                "Cat %s → total=%s count=%s pct=%.1f lvl=%s",
-                label, total, cnt, pct, level
-            )
-
-        # 5) Préparation des mises à jour pour hr.employee
-        updates = {} # Contient les champs à mettre à jour dans `hr.employee`.
-        for label, data in results.items():
-            field_key = label_to_field[label]
-            if question_counts[label] > 0:
-
-                updates[field_key] = data['level']
-
-        # 6) Mise à jour de l'employé et message
-        employees = self.partner_id.user_ids.mapped('employee_ids')
-        if not employees:
-            _logger.warning("No employee found for partner %s", self.partner_id.id)
-            return {
-                'question_counts': question_counts,
-                'response_counts': response_counts,
+            totals[user_input.id][cat_label] += score_sum or 0.0
+            response_counts[user_input.id][cat_label] += count
+
+        scores = {}
+        for rec in self:
+            _question_label, question_counts = maps[rec.survey_id.id]
+            results = {}
+            updates = {}  # Contient les champs à mettre à jour dans `hr.employee`.
+            for label in LEVELS_MAP:
+                total = totals[rec.id][label]
+                cnt = response_counts[rec.id][label]
+                pct = total / cnt if cnt > 0 else 0.0
+                level = _score_to_level(label, pct)
+                results[label] = {
+                    'total': total,
+                    'count': cnt,
+                    'percentage': pct,
+                    'level': level,
+                }
+                if question_counts[label] > 0:
+                    updates[LABEL_TO_FIELD[label]] = level
+            scores[rec.id] = {
+                'question_counts': dict(question_counts),
+                'response_counts': dict(response_counts[rec.id]),
                 'results': results,
-                'error': 'no_employee',
+                'updates': updates,
             }
-        emp = employees[0]
-        _logger.info("Updating employee %s with scores %s", emp.id, updates)
-        emp.sudo().write(updates)
-
+        return scores
+
+    def _push_scores_batch(self):
+        """
+        Score toutes les réponses du recordset et met à jour les employés en bloc :
+        les réponses d'un même employé sont appliquées dans l'ordre du recordset,
+        puis une écriture par groupe d'employés ayant les mêmes valeurs.
+        """
+        scores = self._compute_category_scores()
+        employee_updates = {}
+        for rec in self:
+            # Employé lié au partenaire du participant
+            employees = rec.partner_id.user_ids.mapped('employee_ids')
+            if not employees:
+                _logger.warning("No employee found for partner %s", rec.partner_id.id)
+                scores[rec.id]['error'] = 'no_employee'
+                continue
+            employee_updates.setdefault(employees[0].id, {}).update(scores[rec.id]['updates'])
+
+        by_values = defaultdict(list)
+        for emp_id, updates in employee_updates.items():
+            if updates:
+                by_values[tuple(sorted(updates.items()))].append(emp_id)
+        Employee = self.env['hr.employee'].sudo()
+        for values, emp_ids in by_values.items():
+            Employee.browse(emp_ids).write(dict(values))
+        # Re-scoring du risque (si le mode automatique est activé)
+        Employee.browse(list(employee_updates))._enqueue_risk_rescore()
+        _logger.info("Survey scores pushed to %s employee(s) in %s write(s)", len(employee_updates), len(by_values))
+        return scores
 
+    def _push_scores_to_employee(self):
+        self.ensure_one()
+        scores = self._push_scores_batch()[self.id]
         #  Retour debug
-        return {
-            'question_counts': question_counts,
-            'response_counts': response_counts,
-            'results': results,
-        }
\ No newline at end of file
+        scores.pop('updates')
+        return scores
@@ -0,0 +1,103 @@
+# Module commun (app/batcher.py) : copie identique dans risk_api, recrutement_api.
+# Chaque image Docker est construite depuis le dossier de son service : toute modification
+# doit être reportée dans chaque copie.
+import asyncio
+import os
+from collections import Counter
+from typing import Any, Awaitable, Callable, List
+
+
+class MicroBatcher:
+    """
+    Regroupe les requêtes unitaires concurrentes en un seul appel vectorisé :
+    les lignes sont accumulées pendant au plus max_wait_ms ou jusqu'à max_batch lignes,
+    puis predict_many(lignes) est exécuté une fois (via `run`, ex. executor.run)
+    et chaque requête en attente reçoit son propre résultat.
+    """
+
+    def __init__(self, predict_many: Callable[[List[Any]], List[Any]],
+                 run: Callable[..., Awaitable[Any]], max_wait_ms: float = 5.0, max_batch: int = 64):
+        self.predict_many = predict_many
+        self.run = run
+        self.max_wait = max(max_wait_ms, 0.0) / 1000.0
+        self.max_batch = max(int(max_batch), 1)
+        self._pending: List[tuple] = []   # (ligne, future)
+        self._timer = None
+        # Métriques
+        self.batches = 0
+        self.rows = 0
+        self.max_seen = 0
+        self._histogram = Counter()
+
+    async def submit(self, row: Any) -> Any:
+        """Ajoute une ligne au lot courant et attend son résultat."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_batch:
+            self._schedule(loop, 0.0)
+        elif self._timer is None:
+            self._schedule(loop, self.max_wait)
+        return await future
+
+    def _schedule(self, loop, delay: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_later(delay, lambda: asyncio.ensure_future(self._flush()))
+
+    async def _flush(self) -> None:
+        self._timer = None
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if self._pending:
+            # Reste des lignes : lot suivant sans attendre
+            self._schedule(asyncio.get_running_loop(), 0.0)
+        if not batch:
+            return
+        self._record(len(batch))
+        try:
+            results = await self.run(self.predict_many, [row for row, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _record(self, size: int) -> None:
+        self.batches += 1
+        self.rows += size
+        self.max_seen = max(self.max_seen, size)
+        bucket = 1
+        while bucket < size:
+            bucket *= 2
+        self._histogram[bucket] += 1
+
+    def stats(self) -> dict:
+        return {
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": (self.rows / self.batches) if self.batches else 0.0,
+            "max_batch_size": self.max_seen,
+            # distribution des tailles de lots : borne supérieure (puissance de 2) -> nombre de lots
+            "batch_size_histogram": {f"<={k}": v for k, v in sorted(self._histogram.items())},
+            "pending": len(self._pending),
+        }
+
+
+def batcher_from_env(predict_many: Callable[[List[Any]], List[Any]], run: Callable[..., Awaitable[Any]]):
+    """
+    Coalescence opt-in : MICROBATCH_ENABLED=1, MICROBATCH_MAX_WAIT_MS, MICROBATCH_MAX_BATCH.
+    Retourne None si désactivée.
+    """
+    if os.getenv("MICROBATCH_ENABLED", "0") != "1":
+        return None
+    return MicroBatcher(
+        predict_many,
+        run,
+        max_wait_ms=float(os.getenv("MICROBATCH_MAX_WAIT_MS", "5")),
+        max_batch=int(os.getenv("MICROBATCH_MAX_BATCH", "64")),
+    )
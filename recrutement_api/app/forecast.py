@@ -0,0 +1,109 @@
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Métriques trimestrielles de base (mêmes noms que hr.recruit.quarter_history)
+BASE_METRICS = [
+    "departs_confirmes",
+    "candidats_en_cours",
+    "postes_ouverts_actuels",
+    "effectif_actuel",
+    "turnover_month_pct",
+]
+N_LAGS = 4
+
+
+def _quarter_index(annee: int, quarter_num: int) -> int:
+    return int(annee) * 4 + int(quarter_num) - 1
+
+
+def _quarter_of(index: np.ndarray):
+    return index // 4, index % 4 + 1
+
+
+def build_windows(histories: List[Dict[str, Any]]):
+    """
+    Historique brut -> fenêtre (D départements, N_LAGS + 1 trimestres, M métriques),
+    alignée sur le dernier trimestre connu de chaque département (colonne -1 = trimestre courant Q,
+    colonne 0 = Q-4). Les trimestres absents valent NaN (lag 0 et exclus de la moyenne glissante,
+    comme action_compute_quarter).
+    """
+    n_dep = len(histories)
+    window = np.full((n_dep, N_LAGS + 1, len(BASE_METRICS)), np.nan)
+    current = np.empty(n_dep, dtype=np.int64)
+    for d, hist in enumerate(histories):
+        quarters = hist["history"]
+        current[d] = max(_quarter_index(q["annee"], q["quarter_num"]) for q in quarters)
+        for q in quarters:
+            offset = current[d] - _quarter_index(q["annee"], q["quarter_num"])
+            if offset <= N_LAGS:
+                window[d, N_LAGS - offset] = [float(q[m]) for m in BASE_METRICS]
+    return window, current
+
+
+def features_from_window(window: np.ndarray, current: np.ndarray, departments: List[str]) -> pd.DataFrame:
+    """Construit les colonnes de PredictionRequest (base, lags 1..4, rolling means) pour tous les départements."""
+    annee, quarter_num = _quarter_of(current)
+    data = {"annee": annee, "quarter_num": quarter_num, "department": departments}
+    previous = window[:, :N_LAGS]                    # Q-4 .. Q-1
+    seen = ~np.isnan(previous)
+    counts = seen.sum(axis=1)
+    rolling = np.where(counts > 0, np.nansum(previous, axis=1) / np.maximum(counts, 1), 0.0)
+    for j, m in enumerate(BASE_METRICS):
+        data[m] = np.nan_to_num(window[:, N_LAGS, j])
+        data[f"{m}_rolling_mean"] = rolling[:, j]
+        for i in range(1, N_LAGS + 1):
+            data[f"{m}_lag_{i}"] = np.nan_to_num(window[:, N_LAGS - i, j])
+    return pd.DataFrame(data)
+
+
+def project_next(window: np.ndarray, projection: str) -> np.ndarray:
+    """
+    Valeurs de base projetées pour le trimestre suivant (le modèle ne prédit que le besoin Q+1) :
+      - 'last'         : reconduction du dernier trimestre
+      - 'rolling_mean' : moyenne des 4 derniers trimestres connus (Q-3..Q)
+    """
+    if projection == "last":
+        nxt = window[:, N_LAGS].copy()
+    elif projection == "rolling_mean":
+        recent = window[:, 1:]
+        counts = (~np.isnan(recent)).sum(axis=1)
+        nxt = np.where(counts > 0, np.nansum(recent, axis=1) / np.maximum(counts, 1), np.nan)
+    else:
+        raise ValueError(f"Projection inconnue : {projection} (attendu : last, rolling_mean)")
+    return nxt
+
+
+def forecast_horizon(
+    histories: List[Dict[str, Any]],
+    horizon: int,
+    projection: str,
+    predict_raw,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Prévision récursive Q+1..Q+horizon, vectorisée sur les départements :
+    à chaque pas, un seul predict_raw(DataFrame) pour tous les départements, puis la fenêtre
+    glisse d'un trimestre avec les valeurs de base projetées.
+    Retourne, par département, la liste des pas {annee, quarter_num (trimestre prévu), raw_prediction}.
+    """
+    if not histories:
+        return []
+    departments = [h["department"] for h in histories]
+    window, current = build_windows(histories)
+    results: List[List[Dict[str, Any]]] = [[] for _ in histories]
+
+    for _step in range(horizon):
+        raw = np.asarray(predict_raw(features_from_window(window, current, departments)), dtype=float)
+        target_annee, target_quarter = _quarter_of(current + 1)
+        for d in range(len(histories)):
+            results[d].append({
+                "annee": int(target_annee[d]),
+                "quarter_num": int(target_quarter[d]),
+                "raw_prediction": float(raw[d]),
+            })
+        # Glissement de la fenêtre : Q+1 devient le trimestre courant
+        nxt = project_next(window, projection)
+        window = np.concatenate([window[:, 1:], nxt[:, None, :]], axis=1)
+        current = current + 1
+    return results
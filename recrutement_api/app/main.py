@@ -1,15 +1,32 @@
 import logging
-from typing import Dict
+import multiprocessing
+import os
+import secrets
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Dict, Optional, Union
 
-import pandas as pd
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
-from app.model import load_pipeline_and_features, predict_postes
-from app.schemas import PredictionRequest
+from app.batcher import batcher_from_env
+from app.executor import ExecutorSaturated, executor_from_env
+from app.model import check_loaded, forecast_records, load_artifacts, predict_records_raw, registry
+from app.result_cache import result_cache_from_env
+from app.schemas import (
+    BatchForecastItem, BatchForecastRequest, BatchForecastResponse, DepartmentForecast,
+    HorizonForecastRequest, HorizonForecastResponse, HorizonStep, PredictionRequest, ReloadRequest,
+)
+
+# Pool d'inférence borné (le code pandas / sklearn est bloquant)
+executor = executor_from_env(initializer=load_artifacts)
+
+# Coalescence opt-in des requêtes /predict concurrentes (MICROBATCH_ENABLED=1)
+batcher = batcher_from_env(predict_records_raw, executor.run)
 
-app = FastAPI(title="Recruitment Needs Forecast API")
+# Cache des prédictions brutes (empreinte du payload validé + version du pipeline), RESULT_CACHE_SIZE=0 pour désactiver
+result_cache = result_cache_from_env()
 
 # Setup du logger
 logging.basicConfig(
@@ -17,38 +34,79 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-# Handler pour renvoyer proprement les 422
-@app.exception_handler(RequestValidationError)
-async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    logging.error(f"Validation error: {exc.errors()}")
-    return JSONResponse(status_code=422, content={"detail": exc.errors()})
+# Workers 'process' d'une nouvelle version : démarrés et testés (chargement + prédiction de test)
+# avant le remplacement ; un échec annule le remplacement, la version précédente reste servie.
+# No-op hors du processus principal (l'initializer des workers appelle lui aussi registry.load).
+def prepare_model_swap(active):
+    if executor.kind != "process" or multiprocessing.parent_process() is not None:
+        return
+    executor.stage(initializer=partial(load_artifacts, active.version), check=partial(check_loaded, active.version))
+
+# Chaque nouvelle version active : cache vidé, pool préparé mis en service
+def on_model_swap(active):
+    if multiprocessing.parent_process() is not None:
+        return
+    result_cache.set_version(active.version)
+    executor.promote()
 
-# Variables globales pour le pipeline et les features
-pipeline, features = None, []
+registry.before_swap(prepare_model_swap)
+registry.on_swap(on_model_swap)
 
-@app.on_event("startup")
-def startup_event():
-    global pipeline, features
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     try:
-        pipeline, features = load_pipeline_and_features()
-        logging.info(f"Pipeline chargé avec succès, {len(features)} features attendues")
+        # En mode 'process', le processus principal vérifie la version, les workers la chargent
+        active = registry.load(load_artifacts=executor.kind == "thread")
+        if active.artifacts is not None:
+            logging.info(f"Pipeline chargé avec succès, {len(active.artifacts[1])} features attendues")
     except Exception as e:
         logging.critical(f"Échec du chargement des artefacts : {e}")
         raise RuntimeError(f"Impossible de démarrer sans artefacts : {e}")
+    executor.start()
+    yield
+    executor.shutdown()
+
+app = FastAPI(title="Recruitment Needs Forecast API", lifespan=lifespan)
+
+# Version du pipeline actif sur chaque réponse
+@app.middleware("http")
+async def model_version_header(request: Request, call_next):
+    response = await call_next(request)
+    if registry.version:
+        response.headers["X-Model-Version"] = registry.version
+    return response
 
-@app.post("/predict", response_model=Dict[str, int], tags=["Prediction"])
+# Handler pour renvoyer proprement les 422
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    logging.error(f"Validation error: {exc.errors()}")
+    return JSONResponse(status_code=422, content={"detail": exc.errors()})
+
+# Handler pour renvoyer un 503 + Retry-After quand la file d'inférence est pleine
+@app.exception_handler(ExecutorSaturated)
+async def saturated_exception_handler(request: Request, exc: ExecutorSaturated):
+    logging.warning(f"Service saturé, requête rejetée : {request.url}")
+    return JSONResponse(status_code=503, content={"detail": str(exc)},
+                        headers={"Retry-After": str(exc.retry_after)})
+
+@app.post("/predict", response_model=Dict[str, Union[int, str]], tags=["Prediction"])
 async def predict_endpoint(payload: PredictionRequest):
     """
     Reçoit un payload contenant toutes les colonnes brutes
-    construit un DataFrame, et renvoie la prédiction.
+    construit un DataFrame, et renvoie la prédiction (et la version du pipeline).
     """
-    # 1) On construit le DataFrame
-    df = pd.DataFrame([payload.dict()])
+    version = registry.version
+    # On prédit dans le pool d'inférence (DataFrame construit dans le worker)
+    async def compute(rows):
+        if batcher is not None:
+            return [await batcher.submit(rows[0])]
+        return await executor.run(predict_records_raw, rows)
 
-    # 2) On prédit
     try:
-        pred = predict_postes(df, pipeline, features)
-        return {"prediction": pred}
+        raw = (await result_cache.resolve([payload.dict()], compute))[0]
+        return {"prediction": int(round(raw)), "model_version": version}
+    except ExecutorSaturated:
+        raise
     except KeyError as e:
         logging.error(f"Feature manquante ou invalide : {e}")
         raise HTTPException(status_code=422, detail=f"Feature manquante : {e}")
@@ -56,4 +114,104 @@ async def predict_endpoint(payload: PredictionRequest):
         logging.error(f"Erreur pendant la prédiction : {e}")
         raise HTTPException(status_code=500, detail=f"Erreur interne : {e}")
 
+@app.post("/predict/batch", response_model=BatchForecastResponse, tags=["Prediction"])
+async def predict_batch_endpoint(payload: BatchForecastRequest):
+    """
+    Prévision de plusieurs lignes (départements × trimestres) en un seul pipeline.predict
+    (lignes déjà en cache exclues).
+    Les résultats sont renvoyés dans l'ordre de la requête, avec une clé département|année-Qn,
+    et la prédiction brute (float) si include_raw=true.
+    """
+    version = registry.version
+    rows = [row.dict() for row in payload.rows]
+    try:
+        raw = await result_cache.resolve(rows, lambda missing: executor.run(predict_records_raw, missing))
+    except ExecutorSaturated:
+        raise
+    except KeyError as e:
+        logging.error(f"Feature manquante ou invalide : {e}")
+        raise HTTPException(status_code=422, detail=f"Feature manquante : {e}")
+    except Exception as e:
+        logging.error(f"Erreur pendant la prédiction batch : {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur interne : {e}")
+
+    results = [
+        BatchForecastItem(
+            index=i,
+            key=f"{row['department']}|{row['annee']}-Q{row['quarter_num']}",
+            department=row['department'],
+            annee=row['annee'],
+            quarter_num=row['quarter_num'],
+            prediction=int(round(y)),
+            raw_prediction=y if payload.include_raw else None,
+        )
+        for i, (row, y) in enumerate(zip(rows, raw))
+    ]
+    return BatchForecastResponse(results=results, n_predicted=len(results), model_version=version)
+
+@app.post("/forecast/horizon", response_model=HorizonForecastResponse, tags=["Prediction"])
+async def forecast_horizon_endpoint(payload: HorizonForecastRequest):
+    """
+    Prévision récursive Q+1..Q+horizon à partir de l'historique trimestriel brut de chaque département :
+    le service construit lags et moyennes glissantes, prédit, fait glisser la fenêtre et recommence
+    (un pipeline.predict par pas pour tous les départements).
+    """
+    version = registry.version
+    histories = [dep.dict() for dep in payload.departments]
+    try:
+        steps = await executor.run(forecast_records, histories, payload.horizon, payload.projection)
+    except ExecutorSaturated:
+        raise
+    except KeyError as e:
+        logging.error(f"Feature manquante ou invalide : {e}")
+        raise HTTPException(status_code=422, detail=f"Feature manquante : {e}")
+    except Exception as e:
+        logging.error(f"Erreur pendant la prévision multi-horizon : {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur interne : {e}")
+
+    results = [
+        DepartmentForecast(
+            department=dep["department"],
+            forecast=[
+                HorizonStep(
+                    step=i,
+                    annee=s["annee"],
+                    quarter_num=s["quarter_num"],
+                    prediction=int(round(s["raw_prediction"])),
+                    raw_prediction=s["raw_prediction"] if payload.include_raw else None,
+                )
+                for i, s in enumerate(dep_steps, start=1)
+            ],
+        )
+        for dep, dep_steps in zip(histories, steps)
+    ]
+    return HorizonForecastResponse(results=results, horizon=payload.horizon, model_version=version)
+
+@app.get("/metrics/executor", tags=["Monitoring"])
+async def executor_metrics():
+    return executor.stats()
+
+@app.get("/metrics/batching", tags=["Monitoring"])
+async def batching_metrics():
+    return batcher.stats() if batcher is not None else {"enabled": False}
+
+@app.get("/metrics/cache", tags=["Monitoring"])
+async def cache_metrics():
+    return result_cache.stats()
+
+@app.get("/admin/model", tags=["Admin"])
+async def model_info():
+    return registry.stats()
 
+# Rechargement à chaud (ADMIN_TOKEN requis) : chargement + warm-up en arrière-plan, puis remplacement atomique
+@app.post("/admin/reload", status_code=202, tags=["Admin"])
+async def reload_model(request: ReloadRequest, x_admin_token: Optional[str] = Header(default=None)):
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=403, detail="Rechargement désactivé (ADMIN_TOKEN non défini)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, token):
+        raise HTTPException(status_code=401, detail="Jeton d'administration invalide")
+    if not registry.reload_async(request.version, load_artifacts=executor.kind == "thread"):
+        raise HTTPException(status_code=409, detail="Un chargement est déjà en cours")
+    logging.info(f"Rechargement du pipeline demandé : {request.version or 'version courante'}")
+    return {"status": "loading", "requested": request.version, "active": registry.version}
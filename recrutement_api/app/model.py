@@ -1,32 +1,117 @@
 from pathlib import Path
 import joblib
+import os
 import pandas as pd
-from typing import Tuple, List, Any
+from typing import Tuple, List, Any, Dict, Optional
+
+from app.forecast import forecast_horizon
+from app.registry import ModelRegistry
 
 # Chemin absolu vers le dossier contenant preprocessor.pkl, features.txt et pipeline_complete.pkl
 MODEL_DIR = Path("model")
+ARTIFACT_NAMES = ["pipeline_complete.pkl", "features.txt"]
 
-def load_pipeline_and_features() -> Tuple[Any, List[str]]:
+def load_pipeline_and_features(model_dir: Path = MODEL_DIR) -> Tuple[Any, List[str]]:
     """
     Charge :
       - pipeline_complete.pkl : pipeline complet (preprocessor + modèle)
       - features.txt          : liste des colonnes brutes attendues
     """
-    pipeline = joblib.load(MODEL_DIR / "pipeline_complete.pkl")
-    with open(MODEL_DIR / "features.txt", encoding="utf-8") as f:
+    pipeline = joblib.load(model_dir / "pipeline_complete.pkl")
+    with open(model_dir / "features.txt", encoding="utf-8") as f:
         features = [line.strip() for line in f if line.strip()]
     return pipeline, features
 
-def predict_postes(
+def predict_postes_raw(
     input_df: pd.DataFrame,
     pipeline: Any,
     features: List[str]
-) -> int:
+) -> List[float]:
     """
     1) Sélectionne et réordonne les colonnes brutes selon features.txt
-    2) Applique le pipeline (OHE + scaling + modèle)
-    3) Renvoie la prédiction comme int
+    2) Applique le pipeline (OHE + scaling + modèle) en un seul appel pour toutes les lignes
+    3) Renvoie les prédictions brutes (float), dans l'ordre des lignes
     """
     X = input_df[features]
     y_pred = pipeline.predict(X)
-    return int(round(y_pred[0]))
+    return [float(y) for y in y_pred]
+
+def predict_postes(
+    input_df: pd.DataFrame,
+    pipeline: Any,
+    features: List[str]
+) -> int:
+    """
+    Prédiction de la première ligne, arrondie en int.
+    """
+    return int(round(predict_postes_raw(input_df, pipeline, features)[0]))
+
+
+def known_departments(pipeline: Any) -> List[str]:
+    """Départements vus à l'entraînement (catégories de l'encodeur de la colonne 'department'), si trouvables."""
+    steps = getattr(pipeline, "steps", None) or [(None, pipeline)]
+    for _, step in steps:
+        for _, transformer, columns in getattr(step, "transformers_", []):
+            if isinstance(columns, (list, tuple)) and "department" in columns:
+                encoder = transformer.steps[-1][1] if hasattr(transformer, "steps") else transformer
+                categories = getattr(encoder, "categories_", None)
+                if categories is not None:
+                    return [str(c) for c in categories[list(columns).index("department")]]
+    return []
+
+def warmup_artifacts(artifacts: Tuple[Any, List[str]]) -> None:
+    """Inférence de chauffe (une ligne neutre) avant la mise en service d'une version."""
+    pipeline, features = artifacts
+    departments = known_departments(pipeline)
+    row = {name: 0.0 for name in features}
+    row.update(annee=2024, quarter_num=1, department=departments[0] if departments else "IT")
+    predict_postes_raw(pd.DataFrame([row]), pipeline, features)
+
+def describe_artifacts(model_dir: Path) -> List[str]:
+    """Liste des features du pipeline (manifest d'une version publiée)."""
+    with open(model_dir / "features.txt", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+# Registre des versions du pipeline (MODEL_REGISTRY_DIR, disposition historique par défaut).
+# Artefacts du processus courant : chargés au démarrage de l'API (exécuteur 'thread')
+# ou par l'initializer de chaque worker (exécuteur 'process')
+registry = ModelRegistry(Path(os.getenv("MODEL_REGISTRY_DIR", str(MODEL_DIR))), ARTIFACT_NAMES,
+                         loader=load_pipeline_and_features, warmup=warmup_artifacts)
+
+def load_artifacts(version: Optional[str] = None):
+    """Charge (ou recharge) une version du pipeline dans le processus courant."""
+    return registry.load(version)
+
+def check_loaded(version: str) -> str:
+    """Prédiction de test dans un worker 'process' : la version attendue doit y être chargée."""
+    active = registry.active
+    if active is None or active.version != version or active.artifacts is None:
+        raise RuntimeError(f"Version {version} non chargée dans le worker")
+    warmup_artifacts(active.artifacts)
+    return version
+
+def _active_artifacts() -> Tuple[Any, List[str]]:
+    active = registry.active  # une seule lecture : un rechargement concurrent n'affecte pas ce lot
+    if active is None or active.artifacts is None:
+        raise RuntimeError("Pipeline non chargé")
+    return active.artifacts
+
+def predict_records_raw(records: List[dict]) -> List[float]:
+    """Prédictions brutes (float) de chaque ligne, en un seul pipeline.predict."""
+    pipeline, features = _active_artifacts()
+    if not records:
+        return []
+    return predict_postes_raw(pd.DataFrame(records), pipeline, features)
+
+def predict_records(records: List[dict]) -> List[int]:
+    """Prédit le besoin (arrondi) de chaque ligne (exécuté dans le pool d'inférence)."""
+    return [int(round(y)) for y in predict_records_raw(records)]
+
+def forecast_records(histories: List[Dict[str, Any]], horizon: int, projection: str) -> List[List[Dict[str, Any]]]:
+    """Prévision récursive multi-horizon (exécutée dans le pool d'inférence)."""
+    pipeline, features = _active_artifacts()
+    return forecast_horizon(
+        histories, horizon, projection,
+        lambda df: predict_postes_raw(df, pipeline, features),
+    )
@@ -0,0 +1,285 @@
+# Module commun (app/registry.py) : copie identique dans risk_api, recrutement_api.
+# Chaque image Docker est construite depuis le dossier de son service : toute modification
+# doit être reportée dans chaque copie.
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+MANIFEST_NAME = "manifest.json"
+CURRENT_NAME = "CURRENT"
+VERSIONS_DIR = "versions"
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+class RegistryError(Exception):
+    """Version introuvable, artefact manquant ou empreinte invalide."""
+
+
+def file_checksum(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_version(paths: Sequence[Path]) -> str:
+    """Empreinte (SHA-256 tronqué) du contenu des artefacts : version de la disposition historique."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(file_checksum(path).encode("ascii"))
+    return digest.hexdigest()[:16]
+
+
+@dataclass
+class ActiveModel:
+    version: str
+    path: Path
+    manifest: Dict[str, Any]
+    artifacts: Any = None          # None si les artefacts sont chargés par les workers (exécuteur 'process')
+    loaded_at: float = field(default_factory=time.time)
+    load_seconds: float = 0.0
+    warmup_seconds: float = 0.0
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "path": str(self.path),
+            "loaded_at": datetime.fromtimestamp(self.loaded_at, timezone.utc).isoformat(),
+            "load_seconds": round(self.load_seconds, 3),
+            "warmup_seconds": round(self.warmup_seconds, 3),
+            "features": self.manifest.get("features"),
+            "metrics": self.manifest.get("metrics"),
+        }
+
+
+class ModelRegistry:
+    """
+    Registre de modèles versionnés :
+      <root>/versions/<version>/   artefacts + manifest.json (empreintes, features, métriques)
+      <root>/CURRENT               version active (MODEL_VERSION l'épingle si défini)
+    Sans dossier versions/, la disposition historique (artefacts directement dans <root>) est
+    utilisée, avec pour version l'empreinte de leur contenu.
+
+    load() vérifie les empreintes, charge (loader), exécute le warm-up et les préparations
+    (before_swap) puis remplace le modèle actif en une seule affectation : les requêtes en
+    cours gardent leur référence à l'ancien.
+    """
+
+    def __init__(self, root: Path, artifact_names: Sequence[str],
+                 loader: Callable[[Path], Any], warmup: Optional[Callable[[Any], None]] = None):
+        self.root = Path(root)
+        self.artifact_names = list(artifact_names)
+        self.loader = loader
+        self.warmup = warmup
+        self._active: Optional[ActiveModel] = None
+        self._lock = threading.Lock()
+        self._preparers: List[Callable[[ActiveModel], None]] = []
+        self._listeners: List[Callable[[ActiveModel], None]] = []
+        self.status = "idle"          # idle | loading | failed
+        self.last_error: Optional[str] = None
+        self.reloads = 0
+
+    @property
+    def active(self) -> Optional[ActiveModel]:
+        return self._active
+
+    @property
+    def version(self) -> Optional[str]:
+        active = self._active
+        return active.version if active is not None else None
+
+    def before_swap(self, preparer: Callable[[ActiveModel], None]) -> None:
+        """
+        Appelé avant le remplacement du modèle actif (ex. démarrage et warm-up des workers) :
+        une exception annule le remplacement, la version précédente reste active.
+        """
+        self._preparers.append(preparer)
+
+    def on_swap(self, listener: Callable[[ActiveModel], None]) -> None:
+        """Appelé après chaque remplacement du modèle actif (cache, pool de workers...)."""
+        self._listeners.append(listener)
+
+    # ---------------------------
+    # Résolution / vérification
+    # ---------------------------
+    def list_versions(self) -> List[str]:
+        versions_dir = self.root / VERSIONS_DIR
+        if not versions_dir.is_dir():
+            return []
+        return sorted(p.name for p in versions_dir.iterdir() if (p / MANIFEST_NAME).is_file())
+
+    def current_version(self) -> Optional[str]:
+        pinned = os.getenv("MODEL_VERSION")
+        if pinned:
+            return pinned
+        current = self.root / CURRENT_NAME
+        if current.is_file():
+            return current.read_text(encoding="utf-8").strip() or None
+        versions = self.list_versions()
+        return versions[-1] if versions else None
+
+    def resolve(self, version: Optional[str] = None):
+        """Retourne (version, dossier, manifest) de la version demandée (ou courante)."""
+        version = version or self.current_version()
+        if version is None:
+            # Disposition historique : artefacts directement dans <root>
+            paths = [self.root / name for name in self.artifact_names]
+            missing = [str(p) for p in paths if not p.is_file()]
+            if missing:
+                raise RegistryError(f"Artefacts introuvables : {missing}")
+            return content_version(paths), self.root, {}
+        if not VERSION_PATTERN.match(version):
+            raise RegistryError(f"Nom de version invalide : {version}")
+        path = self.root / VERSIONS_DIR / version
+        manifest_path = path / MANIFEST_NAME
+        if not manifest_path.is_file():
+            raise RegistryError(f"Version inconnue : {version}")
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        self.verify(path, manifest)
+        return version, path, manifest
+
+    def verify(self, path: Path, manifest: Dict[str, Any]) -> None:
+        files = manifest.get("files") or {}
+        for name in self.artifact_names:
+            if name not in files:
+                raise RegistryError(f"{name} absent du manifest de {path}")
+        for name, checksum in files.items():
+            artifact = path / name
+            if not artifact.is_file():
+                raise RegistryError(f"Artefact manquant : {artifact}")
+            if file_checksum(artifact) != checksum:
+                raise RegistryError(f"Empreinte invalide : {artifact}")
+
+    # ---------------------------
+    # Chargement / remplacement
+    # ---------------------------
+    def load(self, version: Optional[str] = None, load_artifacts: bool = True) -> ActiveModel:
+        """
+        Charge la version (vérification, chargement, warm-up) puis la rend active.
+        load_artifacts=False : seule la vérification est faite (workers 'process').
+        """
+        with self._lock:
+            self.status = "loading"
+            try:
+                resolved, path, manifest = self.resolve(version)
+                started = time.perf_counter()
+                artifacts = self.loader(path) if load_artifacts else None
+                loaded = time.perf_counter()
+                if artifacts is not None and self.warmup is not None:
+                    self.warmup(artifacts)
+                done = time.perf_counter()
+                active = ActiveModel(resolved, path, manifest, artifacts,
+                                     load_seconds=loaded - started, warmup_seconds=done - loaded)
+                for preparer in self._preparers:
+                    preparer(active)
+            except Exception as e:
+                self.status = "failed"
+                self.last_error = str(e)
+                raise
+            previous = self._active
+            self._active = active   # remplacement atomique
+            self.status = "idle"
+            self.last_error = None
+            if previous is not None:
+                self.reloads += 1
+        logging.info(f"Modèle {active.version} actif (chargement {active.load_seconds:.2f}s, "
+                     f"warm-up {active.warmup_seconds:.2f}s)")
+        for listener in self._listeners:
+            listener(active)
+        return active
+
+    def reload_async(self, version: Optional[str] = None, load_artifacts: bool = True) -> bool:
+        """Recharge en arrière-plan ; False si un chargement est déjà en cours."""
+        if self.status == "loading":
+            return False
+
+        def _run():
+            try:
+                self.load(version, load_artifacts=load_artifacts)
+            except Exception as e:
+                logging.error(f"Rechargement du modèle ({version or 'courant'}) échoué, version "
+                              f"{self.version} conservée : {e}")
+
+        self.status = "loading"
+        threading.Thread(target=_run, name="model-reload", daemon=True).start()
+        return True
+
+    def stats(self) -> dict:
+        active = self._active
+        return {
+            "active": active.describe() if active is not None else None,
+            "current": self.current_version(),
+            "available": self.list_versions(),
+            "status": self.status,
+            "last_error": self.last_error,
+            "reloads": self.reloads,
+        }
+
+
+def publish(root: Path, source: Path, version: str, artifact_names: Sequence[str],
+            features: Optional[List[str]] = None, metrics: Optional[Dict[str, Any]] = None,
+            activate: bool = False) -> Path:
+    """
+    Publie des artefacts entraînés dans <root>/versions/<version>/ avec leur manifest.
+    Le dossier est écrit à côté puis renommé : une version visible est toujours complète.
+    """
+    if not VERSION_PATTERN.match(version):
+        raise RegistryError(f"Nom de version invalide : {version}")
+    target = Path(root) / VERSIONS_DIR / version
+    if target.exists():
+        raise RegistryError(f"La version {version} existe déjà")
+    staging = target.with_name(f".{version}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    files = {}
+    for name in artifact_names:
+        shutil.copy2(Path(source) / name, staging / name)
+        files[name] = file_checksum(staging / name)
+    manifest = {
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "files": files,
+        "features": features or [],
+        "metrics": metrics or {},
+    }
+    (staging / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(staging, target)
+    if activate:
+        current = Path(root) / CURRENT_NAME
+        tmp = current.with_name(CURRENT_NAME + ".tmp")
+        tmp.write_text(version, encoding="utf-8")
+        os.replace(tmp, current)
+    return target
+
+
+def main(artifact_names: Sequence[str], default_root: str = "model",
+         describe: Optional[Callable[[Path], List[str]]] = None) -> None:
+    """CLI de publication : python -m app.registry <source> <version> [--metrics m.json] [--activate]."""
+    parser = argparse.ArgumentParser(description="Publie une version de modèle dans le registre")
+    parser.add_argument("source", help="dossier contenant les artefacts entraînés")
+    parser.add_argument("version", help="nom de la version (ex. 2025-06-01)")
+    parser.add_argument("--root", default=default_root)
+    parser.add_argument("--metrics", help="fichier JSON des métriques d'entraînement")
+    parser.add_argument("--activate", action="store_true", help="écrit CURRENT (rechargement via /admin/reload)")
+    args = parser.parse_args()
+    metrics = json.loads(Path(args.metrics).read_text(encoding="utf-8")) if args.metrics else {}
+    features = describe(Path(args.source)) if describe else []
+    target = publish(Path(args.root), Path(args.source), args.version, artifact_names,
+                     features=features, metrics=metrics, activate=args.activate)
+    print(f"Version publiée : {target}")
+
+
+if __name__ == "__main__":
+    from app.model import ARTIFACT_NAMES, describe_artifacts
+    main(ARTIFACT_NAMES, describe=describe_artifacts)
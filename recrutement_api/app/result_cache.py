@@ -0,0 +1,158 @@
+# Module commun (app/result_cache.py) : copie identique dans risk_api, recrutement_api.
+# Chaque image Docker est construite depuis le dossier de son service : toute modification
+# doit être reportée dans chaque copie.
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List, Optional
+
+_MISS = object()
+
+
+def payload_hash(row: dict) -> str:
+    """Empreinte SHA-256 d'un payload validé (JSON canonique : clés triées, sans espaces)."""
+    raw = json.dumps(row, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _approx_size(value: Any) -> int:
+    """Taille approximative en octets (conteneurs parcourus récursivement)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_approx_size(v) for v in value)
+    return size
+
+
+class ResultCache:
+    """
+    Cache de résultats de prédiction, indexé par (version du modèle, empreinte du payload) :
+      - LRU borné à max_items entrées (OrderedDict)
+      - TTL : une entrée plus vieille que ttl secondes est ignorée (0 = sans expiration)
+    Un changement de version (artefact modifié / rechargé) vide le cache.
+    """
+
+    def __init__(self, max_items: int = 10000, ttl: float = 3600.0):
+        self.max_items = max(int(max_items), 0)
+        self.ttl = max(float(ttl), 0.0)
+        self.version: Optional[str] = None
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()  # clé -> (expiration, résultat, taille)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_items > 0
+
+    def set_version(self, version: Optional[str]) -> None:
+        """Associe le cache à une version de modèle ; vide le cache si elle change."""
+        with self._lock:
+            if version != self.version:
+                if self._items:
+                    self.invalidations += 1
+                self._items.clear()
+                self._bytes = 0
+                self.version = version
+
+    def key(self, row: dict) -> str:
+        return f"{self.version}:{payload_hash(row)}"
+
+    # ---------------------------
+    # Accès unitaire
+    # ---------------------------
+    def get(self, key: str) -> Any:
+        """Retourne le résultat en cache ou _MISS."""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and self.ttl and entry[0] < time.monotonic():
+                self._drop(key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return _MISS
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, result: Any) -> None:
+        if not self.enabled:
+            return
+        size = _approx_size(key) + _approx_size(result)
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = (time.monotonic() + self.ttl, result, size)
+            self._bytes += size
+            while len(self._items) > self.max_items:
+                self._drop(next(iter(self._items)))
+                self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        # appelé avec le verrou
+        self._bytes -= self._items.pop(key)[2]
+
+    # ---------------------------
+    # Accès par lot
+    # ---------------------------
+    async def resolve(self, rows: List[dict], compute: Callable[[List[dict]], Awaitable[List[Any]]]) -> List[Any]:
+        """
+        Résultats des lignes (même ordre) : seules les lignes absentes du cache
+        (dédoublonnées par empreinte) sont passées à compute, puis mises en cache.
+        """
+        if not self.enabled:
+            return await compute(rows)
+        keys = [self.key(row) for row in rows]
+        results = [self.get(k) for k in keys]
+        missing = OrderedDict()
+        for row, k, result in zip(rows, keys, results):
+            if result is _MISS and k not in missing:
+                missing[k] = row
+        if missing:
+            computed = dict(zip(missing.keys(), await compute(list(missing.values()))))
+            for k, result in computed.items():
+                self.put(k, result)
+            results = [computed[k] if r is _MISS else r for k, r in zip(keys, results)]
+        return results
+
+    # ---------------------------
+    # Statistiques
+    # ---------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "model_version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "items": len(self._items),
+                "max_items": self.max_items,
+                "ttl_seconds": self.ttl,
+                "memory_bytes": self._bytes,
+            }
+
+
+def result_cache_from_env() -> ResultCache:
+    """
+    Configuration par variables d'environnement :
+      RESULT_CACHE_SIZE (entrées, 0 = désactivé), RESULT_CACHE_TTL (secondes, 0 = sans expiration).
+    """
+    return ResultCache(
+        max_items=int(os.getenv("RESULT_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("RESULT_CACHE_TTL", "3600")),
+    )
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Literal, Optional
 
 class PredictionRequest(BaseModel):
     # 1. Saison et année
@@ -47,3 +48,69 @@ class PredictionRequest(BaseModel):
     turnover_month_pct_lag_2:     float
     turnover_month_pct_lag_3:     float
     turnover_month_pct_lag_4:     float
+
+
+# Pour /predict/batch : plusieurs départements × trimestres en un seul appel au pipeline
+class BatchForecastRequest(BaseModel):
+    rows: List[PredictionRequest]
+    include_raw: bool = False           # renvoyer aussi la prédiction brute (float)
+
+class BatchForecastItem(BaseModel):
+    index: int                          # position de la ligne dans la requête
+    key: str                            # "<department>|<annee>-Q<quarter_num>"
+    department: str
+    annee: int
+    quarter_num: int
+    prediction: int
+    raw_prediction: Optional[float] = None
+
+class BatchForecastResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())  # champ model_version
+    results: List[BatchForecastItem]
+    n_predicted: int
+    model_version: Optional[str] = None  # version du pipeline ayant produit les prédictions
+
+
+# Pour /forecast/horizon : prévision récursive Q+1..Q+N à partir de l'historique brut
+class QuarterObservation(BaseModel):
+    annee: int
+    quarter_num: int = Field(ge=1, le=4)
+    departs_confirmes: float
+    candidats_en_cours: float
+    postes_ouverts_actuels: float
+    effectif_actuel: float
+    turnover_month_pct: float
+
+class DepartmentHistory(BaseModel):
+    department: str
+    # Trimestres récents (jusqu'à 5 utiles : Q et Q-1..Q-4), dans n'importe quel ordre
+    history: List[QuarterObservation] = Field(min_length=1)
+
+class HorizonForecastRequest(BaseModel):
+    departments: List[DepartmentHistory]
+    horizon: int = Field(default=4, ge=1, le=12)
+    # Projection des métriques de base pour les trimestres futurs
+    projection: Literal["last", "rolling_mean"] = "rolling_mean"
+    include_raw: bool = False
+
+class HorizonStep(BaseModel):
+    step: int                           # 1..horizon
+    annee: int                          # trimestre prévu
+    quarter_num: int
+    prediction: int
+    raw_prediction: Optional[float] = None
+
+class DepartmentForecast(BaseModel):
+    department: str
+    forecast: List[HorizonStep]
+
+class HorizonForecastResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())  # champ model_version
+    results: List[DepartmentForecast]
+    horizon: int
+    model_version: Optional[str] = None
+
+
+# Administration du registre de modèles
+class ReloadRequest(BaseModel):
+    version: Optional[str] = None       # None : version courante du registre (CURRENT / MODEL_VERSION)
@@ -0,0 +1,221 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class UnsupportedPipeline(Exception):
+    """Le pipeline contient une étape que l'encodeur compilé ne sait pas reproduire."""
+
+
+def _compile_step(step, columns: List[str]) -> Tuple[Callable[[Dict[str, np.ndarray]], np.ndarray], int]:
+    """
+    Compile un transformeur sklearn ajusté en une fonction colonnes -> matrice NumPy.
+    Retourne (fonction, nombre de colonnes en sortie).
+    """
+    name = type(step).__name__
+
+    if step == "passthrough":
+        return (lambda cols: np.column_stack([cols[c].astype(np.float64) for c in columns])), len(columns)
+
+    if name == "Pipeline":
+        # Transformeurs chaînés : le premier lit les colonnes, les suivants la matrice.
+        # Les imputers sont des identités ici (entrées validées, jamais de valeur manquante).
+        inner = [s for _, s in step.steps if s != "passthrough" and type(s).__name__ != "SimpleImputer"]
+        if not inner:
+            return _compile_step("passthrough", columns)
+        first, width = _compile_step(inner[0], columns)
+        matrix_steps = inner[1:]
+        for s in matrix_steps:
+            if type(s).__name__ not in ("StandardScaler", "MinMaxScaler"):
+                raise UnsupportedPipeline(f"Étape imbriquée non supportée : {type(s).__name__}")
+        compiled = [_compile_matrix_step(s) for s in matrix_steps]
+
+        def run(cols):
+            X = first(cols)
+            for f in compiled:
+                X = f(X)
+            return X
+        return run, width
+
+    if name == "SimpleImputer":
+        # Les entrées validées par EmployeeFeatures n'ont jamais de valeur manquante : identité
+        return _compile_step("passthrough", columns)
+
+    if name == "OneHotEncoder":
+        if getattr(step, "drop_idx_", None) is not None:
+            raise UnsupportedPipeline("OneHotEncoder(drop=...) non supporté")
+        ignore_unknown = step.handle_unknown in ("ignore", "infrequent_if_exist")
+        vocabularies = [{v: i for i, v in enumerate(cats)} for cats in step.categories_]
+        offsets = np.cumsum([0] + [len(c) for c in step.categories_])
+        width = int(offsets[-1])
+
+        def run(cols):
+            n = len(cols[columns[0]])
+            X = np.zeros((n, width), dtype=np.float64)
+            rows = np.arange(n)
+            for j, (col, vocab) in enumerate(zip(columns, vocabularies)):
+                idx = np.fromiter((vocab.get(v, -1) for v in cols[col]), dtype=np.int64, count=n)
+                known = idx >= 0
+                if not known.all() and not ignore_unknown:
+                    unknown = sorted({str(v) for v, k in zip(cols[col], known) if not k})
+                    raise ValueError(f"Catégorie(s) inconnue(s) pour {col} : {unknown}")
+                X[rows[known], offsets[j] + idx[known]] = 1.0
+            return X
+        return run, width
+
+    if name == "OrdinalEncoder":
+        use_unknown = step.handle_unknown == "use_encoded_value"
+        unknown_value = float(getattr(step, "unknown_value", np.nan) if use_unknown else np.nan)
+        vocabularies = [{v: float(i) for i, v in enumerate(cats)} for cats in step.categories_]
+
+        def run(cols):
+            out = []
+            for col, vocab in zip(columns, vocabularies):
+                values = [vocab.get(v) for v in cols[col]]
+                if not use_unknown and any(v is None for v in values):
+                    raise ValueError(f"Catégorie inconnue pour {col}")
+                out.append([unknown_value if v is None else v for v in values])
+            return np.asarray(out, dtype=np.float64).T
+        return run, len(columns)
+
+    if name in ("StandardScaler", "MinMaxScaler"):
+        passthrough, width = _compile_step("passthrough", columns)
+        scale = _compile_matrix_step(step)
+        return (lambda cols: scale(passthrough(cols))), width
+
+    raise UnsupportedPipeline(f"Transformeur non supporté : {name}")
+
+
+def _compile_matrix_step(step) -> Callable[[np.ndarray], np.ndarray]:
+    name = type(step).__name__
+    if name == "StandardScaler":
+        mean = step.mean_ if step.mean_ is not None else 0.0
+        scale = step.scale_ if step.scale_ is not None else 1.0
+        return lambda X: (X - mean) / scale
+    if name == "MinMaxScaler":
+        return lambda X: X * step.scale_ + step.min_
+    raise UnsupportedPipeline(f"Transformeur non supporté : {name}")
+
+
+class CompiledFeatureEncoder:
+    """
+    Encodeur compilé au démarrage à partir du pipeline ajusté :
+    colonnes attendues, vocabulaires catégoriels et paramètres de scaling sont lus une fois,
+    puis les dicts validés (EmployeeFeatures.dict()) sont convertis directement en matrice NumPy,
+    sans DataFrame ni renommage de colonnes. Le modèle final est ensuite appelé sur cette matrice.
+    """
+
+    def __init__(self, feature_names: List[str], blocks: List[Tuple[Callable, int]],
+                 post_steps: List[Any], estimator: Any, sparse_output: bool):
+        self.feature_names = feature_names
+        self.blocks = blocks
+        self.post_steps = post_steps
+        self.estimator = estimator
+        self.sparse_output = sparse_output
+        self.n_outputs = sum(width for _, width in blocks)
+
+    @classmethod
+    def compile(cls, model) -> "CompiledFeatureEncoder":
+        """Lève UnsupportedPipeline si la structure du pipeline n'est pas reproductible."""
+        steps = getattr(model, "steps", None)
+        if not steps or type(steps[0][1]).__name__ != "ColumnTransformer":
+            raise UnsupportedPipeline("Le modèle n'est pas un Pipeline commençant par un ColumnTransformer")
+        ct = steps[0][1]
+        feature_names = [str(c) for c in getattr(ct, "feature_names_in_", [])]
+        if not feature_names:
+            raise UnsupportedPipeline("feature_names_in_ absent du ColumnTransformer")
+
+        blocks = []
+        for _name, trans, cols in ct.transformers_:
+            if trans == "drop":
+                continue
+            cols = [feature_names[c] if isinstance(c, (int, np.integer)) else str(c) for c in np.atleast_1d(cols)]
+            if not cols:
+                continue
+            blocks.append(_compile_step(trans, cols))
+
+        # Étapes intermédiaires : samplers (SMOTE...) ignorés à la prédiction, transformeurs appliqués
+        post_steps = []
+        for _name, step in steps[1:-1]:
+            if step == "passthrough" or step is None or hasattr(step, "fit_resample"):
+                continue
+            post_steps.append(step)
+
+        return cls(feature_names, blocks, post_steps, steps[-1][1], bool(getattr(ct, "sparse_output_", False)))
+
+    def transform(self, records: List[dict]):
+        """Liste de dicts (noms de colonnes normalisés) -> matrice d'entrée du modèle final."""
+        cols = {name: np.asarray([r[name] for r in records], dtype=object) for name in self.feature_names}
+        X = np.hstack([run(cols) for run, _ in self.blocks]) if self.blocks else np.empty((len(records), 0))
+        if self.sparse_output:
+            from scipy import sparse
+            X = sparse.csr_matrix(X)
+        for step in self.post_steps:
+            X = step.transform(X)
+        return X
+
+    def predict(self, records: List[dict]) -> np.ndarray:
+        return self.estimator.predict(self.transform(records))
+
+
+def check_parity(encoder: CompiledFeatureEncoder, sample_records: List[dict],
+                 dataframe_predict: Callable[[List[dict]], np.ndarray]) -> bool:
+    """Compare les prédictions compilées à celles du chemin DataFrame sur des lignes d'exemple."""
+    try:
+        compiled = np.asarray(encoder.predict(sample_records))
+        reference = np.asarray(dataframe_predict(sample_records))
+    except Exception as e:
+        logging.warning(f"Parité de l'encodeur compilé impossible à vérifier : {e}")
+        return False
+    ok = compiled.shape == reference.shape and bool((compiled == reference).all())
+    if not ok:
+        logging.warning(f"Encodeur compilé : {int((compiled != reference).sum())} prédiction(s) divergente(s)")
+    return ok
+
+
+def fitted_categories(model) -> Dict[str, List[Any]]:
+    """
+    Catégories apprises par les encodeurs (OneHotEncoder, OrdinalEncoder) du ColumnTransformer
+    d'un pipeline ajusté : {colonne: [valeurs]}. Vide si le modèle n'a pas cette structure.
+    """
+    steps = getattr(model, "steps", None)
+    ct = steps[0][1] if steps else None
+    feature_names = [str(c) for c in getattr(ct, "feature_names_in_", [])]
+    categories: Dict[str, List[Any]] = {}
+    for _name, trans, cols in getattr(ct, "transformers_", []):
+        if trans in ("drop", "passthrough"):
+            continue
+        cols = [feature_names[c] if isinstance(c, (int, np.integer)) else str(c) for c in np.atleast_1d(cols)]
+        inner = [s for _, s in trans.steps] if type(trans).__name__ == "Pipeline" else [trans]
+        for step in inner:
+            for col, cats in zip(cols, getattr(step, "categories_", [])):
+                # valeurs NumPy -> Python, catégorie manquante (NaN) ignorée
+                values = [v.item() if hasattr(v, "item") else v for v in cats]
+                categories[col] = [v for v in values if v == v]
+    return categories
+
+
+def sample_records(schema, categories: Optional[Dict[str, List[Any]]] = None, n: int = 64) -> List[dict]:
+    """
+    Lignes d'exemple couvrant toutes les valeurs des champs Literal du schéma pydantic et,
+    pour les autres champs, les catégories fournies (ex. fitted_categories(model)) ;
+    utilisées pour le contrôle de parité et le warm-up au démarrage.
+    """
+    from typing import get_args
+
+    categories = categories or {}
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(n):
+        row = {}
+        for name, field in schema.model_fields.items():
+            choices = list(get_args(field.annotation)) or categories.get(name)
+            if choices:
+                row[name] = choices[i % len(choices)]
+            elif field.annotation is int:
+                row[name] = int(rng.integers(0, 60 if name != "monthly_income" else 15000))
+            else:
+                row[name] = "Technology"
+        rows.append(row)
+    return rows
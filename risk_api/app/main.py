@@ -1,23 +1,77 @@
-from fastapi import FastAPI, HTTPException, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
-from typing import Dict
-import pandas as pd
+from functools import partial
+from pydantic import ValidationError
+from typing import Dict, Optional
 import logging
+import multiprocessing
+import os
+import secrets
 
-from app.model import load_model_and_encoder, predict_risk_level
-from app.schemas import EmployeeFeatures
+from app.batcher import batcher_from_env
+from app.executor import ExecutorSaturated, executor_from_env
+from app.model import check_loaded, load_artifacts, predict_records, registry
+from app.registry import RegistryError
+from app.result_cache import result_cache_from_env
+from app.schemas import EmployeeFeatures, BatchPredictionRequest, BatchPredictionResponse, ReloadRequest
 
-#  Initialisation de l'application FastAPI
-app = FastAPI(title="Employee Attrition Prediction API")
+#  Pool d'inférence borné (le code pandas / XGBoost est bloquant)
+executor = executor_from_env(initializer=load_artifacts)
+
+#  Coalescence opt-in des requêtes /predict concurrentes (MICROBATCH_ENABLED=1)
+batcher = batcher_from_env(predict_records, executor.run)
 
-#  Variables globales (chargées au démarrage)
-model = None
-label_encoder = None
+#  Cache des résultats (empreinte du payload validé + version du modèle), RESULT_CACHE_SIZE=0 pour désactiver
+result_cache = result_cache_from_env()
 
 #  Configuration du logger
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+#  Workers 'process' d'une nouvelle version : démarrés et testés (chargement + prédiction de test)
+#  avant le remplacement ; un échec annule le remplacement, la version précédente reste servie.
+#  No-op hors du processus principal (l'initializer des workers appelle lui aussi registry.load).
+def prepare_model_swap(active):
+    if executor.kind != "process" or multiprocessing.parent_process() is not None:
+        return
+    executor.stage(initializer=partial(load_artifacts, active.version), check=partial(check_loaded, active.version))
+
+#  Chaque nouvelle version active : cache vidé, pool préparé mis en service
+def on_model_swap(active):
+    if multiprocessing.parent_process() is not None:
+        return
+    result_cache.set_version(active.version)
+    executor.promote()
+
+registry.before_swap(prepare_model_swap)
+registry.on_swap(on_model_swap)
+
+#  Chargement du modèle au démarrage de l'app, arrêt du pool à la fin
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        # En mode 'process', le processus principal vérifie la version, les workers la chargent
+        registry.load(load_artifacts=executor.kind == "thread")
+        logging.info(f"Modèle et encodeur prêts (version {registry.version}).")
+    except (FileNotFoundError, RegistryError) as e:
+        logging.critical(f" Erreur de chargement du modèle ou encodeur : {str(e)}")
+        raise RuntimeError(f"Erreur de chargement : {str(e)}")
+    executor.start()
+    yield
+    executor.shutdown()
+
+#  Initialisation de l'application FastAPI
+app = FastAPI(title="Employee Attrition Prediction API", lifespan=lifespan)
+
+#  Version du modèle actif sur chaque réponse
+@app.middleware("http")
+async def model_version_header(request: Request, call_next):
+    response = await call_next(request)
+    if registry.version:
+        response.headers["X-Model-Version"] = registry.version
+    return response
+
 #  Gestion personnalisée des erreurs de validation (422 Unprocessable Entity)
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -36,28 +90,105 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"detail": exc.errors()},
     )
 
-# Chargement du modèle au démarrage de l'app
-@app.on_event("startup")
-async def startup_event():
-    global model, label_encoder
-    try:
-        model, label_encoder = load_model_and_encoder()
-        logging.info("Modèle et encodeur chargés avec succès.")
-    except FileNotFoundError as e:
-        logging.critical(f" Erreur de chargement du modèle ou encodeur : {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erreur de chargement : {str(e)}")
+#  File d'inférence pleine : 503 + Retry-After plutôt qu'une latence qui s'effondre
+@app.exception_handler(ExecutorSaturated)
+async def saturated_exception_handler(request: Request, exc: ExecutorSaturated):
+    logging.warning(f"Service saturé, requête rejetée : {request.url}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 # Route de prédiction principale
 @app.post("/predict", response_model=Dict[str, str])
 async def predict(employee: EmployeeFeatures):
     """
         Reçoit un JSON conforme à EmployeeFeatures,
-        renvoie {'prediction': 'Low'|'Medium'|'High'}.
+        renvoie {'prediction': 'Low'|'Medium'|'High', 'model_version': ...}.
         """
+    version = registry.version
+    async def compute(rows):
+        if batcher is not None:
+            return [await batcher.submit(rows[0])]
+        return await executor.run(predict_records, rows)
+
     try:
-        input_df = pd.DataFrame([employee.dict()])
-        risk_level = predict_risk_level(input_df, model, label_encoder)
-        return {"prediction": risk_level}
+        risk_level = (await result_cache.resolve([employee.dict()], compute))[0]
+        return {"prediction": risk_level, "model_version": version}
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         logging.error(f" Erreur de prédiction : {str(e)}")
         raise HTTPException(status_code=400, detail=f"Erreur de prédiction : {str(e)}")
+
+# Route de prédiction par lot
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch(request: BatchPredictionRequest):
+    """
+        Reçoit {'employees': [ ... ]} (chaque élément conforme à EmployeeFeatures),
+        valide chaque ligne séparément puis prédit toutes les lignes valides
+        avec un seul model.predict (lignes déjà en cache exclues). Les résultats sont renvoyés dans l'ordre
+        de la requête ; une ligne invalide porte ses erreurs au lieu d'une prédiction.
+        """
+    version = registry.version
+    results = [{"index": i, "prediction": None, "errors": None} for i in range(len(request.employees))]
+
+    # 1) Validation ligne par ligne
+    valid_idx, valid_rows = [], []
+    for i, row in enumerate(request.employees):
+        try:
+            valid_rows.append(EmployeeFeatures(**row).dict())
+            valid_idx.append(i)
+        except ValidationError as e:
+            results[i]["errors"] = e.errors(include_url=False, include_context=False)
+
+    # 2) Prédiction vectorisée des lignes valides
+    if valid_rows:
+        try:
+            risk_levels = await result_cache.resolve(valid_rows, lambda rows: executor.run(predict_records, rows))
+        except ExecutorSaturated:
+            raise
+        except Exception as e:
+            logging.error(f" Erreur de prédiction (lot de {len(valid_rows)}) : {str(e)}")
+            raise HTTPException(status_code=400, detail=f"Erreur de prédiction : {str(e)}")
+        for i, risk_level in zip(valid_idx, risk_levels):
+            results[i]["prediction"] = risk_level
+
+    n_errors = len(results) - len(valid_rows)
+    if n_errors:
+        logging.warning(f"Lot de {len(results)} lignes : {n_errors} ligne(s) invalide(s) ignorée(s)")
+    return {"results": results, "n_predicted": len(valid_rows), "n_errors": n_errors, "model_version": version}
+
+# État du pool d'inférence
+@app.get("/metrics/executor")
+async def executor_metrics():
+    return executor.stats()
+
+# Distribution des tailles de lots de la coalescence
+@app.get("/metrics/batching")
+async def batching_metrics():
+    return batcher.stats() if batcher is not None else {"enabled": False}
+
+# Cache des résultats : taux de succès, mémoire, version du modèle
+@app.get("/metrics/cache")
+async def cache_metrics():
+    return result_cache.stats()
+
+# Registre de modèles : version active, versions disponibles, état du dernier chargement
+@app.get("/admin/model")
+async def model_info():
+    return registry.stats()
+
+# Rechargement à chaud (ADMIN_TOKEN requis) : chargement + warm-up en arrière-plan, puis remplacement atomique
+@app.post("/admin/reload", status_code=202)
+async def reload_model(request: ReloadRequest, x_admin_token: Optional[str] = Header(default=None)):
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=403, detail="Rechargement désactivé (ADMIN_TOKEN non défini)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, token):
+        raise HTTPException(status_code=401, detail="Jeton d'administration invalide")
+    if not registry.reload_async(request.version, load_artifacts=executor.kind == "thread"):
+        raise HTTPException(status_code=409, detail="Un chargement est déjà en cours")
+    logging.info(f"Rechargement du modèle demandé : {request.version or 'version courante'}")
+    return {"status": "loading", "requested": request.version, "active": registry.version}
@@ -1,27 +1,118 @@
 import joblib
+import logging
+import os
 from pathlib import Path
+from typing import List, Optional
 import pandas as pd
 
+from app.features import (
+    CompiledFeatureEncoder, UnsupportedPipeline, check_parity, fitted_categories, sample_records,
+)
+from app.registry import ModelRegistry
+from app.schemas import EmployeeFeatures
+
 
 # Configuration
 MODEL_DIR = Path("model")
 MODEL_PATH = MODEL_DIR / "final_model.pkl"
 LABEL_ENCODER_PATH = MODEL_DIR / "label_encoder.pkl"
+ARTIFACT_NAMES = [MODEL_PATH.name, LABEL_ENCODER_PATH.name]
 
-def load_model_and_encoder():
+def load_model_and_encoder(model_dir: Path = MODEL_DIR):
     """Charge le modèle XGBoost et le LabelEncoder."""
+    model_path = model_dir / MODEL_PATH.name
+    label_encoder_path = model_dir / LABEL_ENCODER_PATH.name
     try:
-        model = joblib.load(MODEL_PATH)
-        label_encoder = joblib.load(LABEL_ENCODER_PATH)
+        model = joblib.load(model_path)
+        label_encoder = joblib.load(label_encoder_path)
         return model, label_encoder
     except FileNotFoundError as e:
-        raise FileNotFoundError(f"Modèle ou encodeur non trouvé à {MODEL_PATH} ou {LABEL_ENCODER_PATH}")
+        raise FileNotFoundError(f"Modèle ou encodeur non trouvé à {model_path} ou {label_encoder_path}")
 
-def predict_risk_level(input_data: pd.DataFrame, model, label_encoder):
-    """Prédit le Risk_Level pour les données d'entrée."""
+def predict_risk_levels(input_data: pd.DataFrame, model, label_encoder) -> List[str]:
+    """Prédit le Risk_Level de chaque ligne en un seul appel vectorisé (même ordre que l'entrée)."""
+    if input_data.empty:
+        return []
     # Normalisation des noms de colonnes
     input_data.columns = input_data.columns.str.lower().str.replace(" ", "_").str.replace("-", "_")
-    # Prédiction
-    pred = model.predict(input_data)[0]
-    risk_level = label_encoder.inverse_transform([pred])[0]
-    return risk_level
+    # Prédiction : un seul model.predict et un seul inverse_transform pour tout le lot
+    preds = model.predict(input_data)
+    return [str(level) for level in label_encoder.inverse_transform(preds)]
+
+def predict_risk_level(input_data: pd.DataFrame, model, label_encoder):
+    """Prédit le Risk_Level pour les données d'entrée."""
+    return predict_risk_levels(input_data, model, label_encoder)[0]
+
+
+def compile_feature_encoder(model):
+    """
+    Compile l'encodeur de features à partir du pipeline ajusté (COMPILED_FEATURES=1 par défaut)
+    et vérifie la parité avec le chemin DataFrame ; retourne None si non supporté ou divergent.
+    """
+    if os.getenv("COMPILED_FEATURES", "1") != "1":
+        return None
+    try:
+        encoder = CompiledFeatureEncoder.compile(model)
+    except UnsupportedPipeline as e:
+        logging.info(f"Encodeur compilé désactivé, chemin DataFrame utilisé : {e}")
+        return None
+    missing = set(encoder.feature_names) - set(EmployeeFeatures.model_fields)
+    if missing:
+        logging.warning(f"Encodeur compilé désactivé, colonnes absentes du schéma : {sorted(missing)}")
+        return None
+    samples = sample_records(EmployeeFeatures, categories=fitted_categories(model))
+    if not check_parity(encoder, samples, lambda rows: model.predict(pd.DataFrame(rows))):
+        logging.warning("Encodeur compilé désactivé : parité non vérifiée avec le chemin DataFrame")
+        return None
+    logging.info(f"Encodeur compilé actif : {len(encoder.feature_names)} colonnes -> {encoder.n_outputs} features")
+    return encoder
+
+def load_bundle(model_dir: Path) -> dict:
+    """Artefacts d'une version : modèle, LabelEncoder et encodeur compilé (ou None)."""
+    model, label_encoder = load_model_and_encoder(model_dir)
+    return {"model": model, "label_encoder": label_encoder, "encoder": compile_feature_encoder(model)}
+
+def predict_with(bundle: dict, records: List[dict]) -> List[str]:
+    """Prédit le Risk_Level des lignes avec les artefacts d'une version donnée."""
+    if not records:
+        return []
+    label_encoder = bundle["label_encoder"]
+    if bundle["encoder"] is not None:
+        preds = bundle["encoder"].predict(records)
+        return [str(level) for level in label_encoder.inverse_transform(preds)]
+    return predict_risk_levels(pd.DataFrame(records), bundle["model"], label_encoder)
+
+def warmup_bundle(bundle: dict) -> None:
+    """Inférence de chauffe sur le chemin effectivement utilisé, avant la mise en service."""
+    predict_with(bundle, sample_records(EmployeeFeatures, categories=fitted_categories(bundle["model"]), n=8))
+
+def describe_artifacts(model_dir: Path) -> List[str]:
+    """Liste des features du modèle (manifest d'une version publiée)."""
+    model, _ = load_model_and_encoder(model_dir)
+    return [str(c) for c in getattr(model, "feature_names_in_", [])]
+
+
+# Registre des versions du modèle (MODEL_REGISTRY_DIR, disposition historique par défaut).
+# Artefacts du processus courant : chargés au démarrage de l'API (exécuteur 'thread')
+# ou par l'initializer de chaque worker (exécuteur 'process')
+registry = ModelRegistry(Path(os.getenv("MODEL_REGISTRY_DIR", str(MODEL_DIR))), ARTIFACT_NAMES,
+                         loader=load_bundle, warmup=warmup_bundle)
+
+def load_artifacts(version: Optional[str] = None):
+    """Charge (ou recharge) une version du modèle dans le processus courant."""
+    return registry.load(version)
+
+def check_loaded(version: str) -> str:
+    """Prédiction de test dans un worker 'process' : la version attendue doit y être chargée."""
+    active = registry.active
+    if active is None or active.version != version or active.artifacts is None:
+        raise RuntimeError(f"Version {version} non chargée dans le worker")
+    warmup_bundle(active.artifacts)
+    return version
+
+def predict_records(records: List[dict]) -> List[str]:
+    """Prédit le Risk_Level d'une liste de dicts validés (exécuté dans le pool d'inférence)."""
+    active = registry.active  # une seule lecture : un rechargement concurrent n'affecte pas ce lot
+    if active is None or active.artifacts is None:
+        raise RuntimeError("Modèle non chargé")
+    return predict_with(active.artifacts, records)
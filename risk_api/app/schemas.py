@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Literal
+from pydantic import BaseModel, ConfigDict
+from typing import Any, Dict, List, Literal, Optional
 
 class EmployeeFeatures(BaseModel):
     age: int
@@ -23,3 +23,26 @@ class EmployeeFeatures(BaseModel):
     work_life_balance: Literal["Poor", "Fair", "Good", "Excellent"]
     job_satisfaction: Literal["Low", "Medium", "High", "Very High"]
     performance_rating: Literal["Low", "Below Average", "Average", "High"]
+
+
+# Pour /predict/batch : les lignes sont validées une par une dans la route,
+# afin qu'une ligne invalide ne fasse pas échouer tout le lot.
+class BatchPredictionRequest(BaseModel):
+    employees: List[Dict[str, Any]]
+
+class BatchPredictionItem(BaseModel):
+    index: int                          # position de la ligne dans la requête
+    prediction: Optional[str] = None    # 'Low' | 'Medium' | 'High' si la ligne est valide
+    errors: Optional[List[Dict[str, Any]]] = None  # erreurs de validation de la ligne
+
+class BatchPredictionResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())  # champ model_version
+    results: List[BatchPredictionItem]  # même ordre que la requête
+    n_predicted: int
+    n_errors: int
+    model_version: Optional[str] = None  # version du modèle ayant produit les prédictions
+
+
+# Administration du registre de modèles
+class ReloadRequest(BaseModel):
+    version: Optional[str] = None       # None : version courante du registre (CURRENT / MODEL_VERSION)